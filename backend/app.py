@@ -1,16 +1,41 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from mangum import Mangum
 
 from src.core.config import settings
+from src.api.middleware import RequestMetricsMiddleware
 from src.api.routes.analyze import router as analyze_router
+from src.services.ai_services import start_model_loading
+from src.services.email_reader import imap_pool
+from src.services.job_queue import job_queue
+from src.services.reply_dispatcher import shutdown_reply_pool
+from src.services.mailbox_watcher import mailbox_watcher
+from src.services.inference_executor import shutdown_executors
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Carrega os modelos conforme settings.MODEL_LOADING
+    start_model_loading()
+    # Retoma jobs em lote aceitos antes do último desligamento
+    job_queue.resume()
+    yield
+    # Para o monitoramento IMAP e os jobs antes dos executores
+    mailbox_watcher.stop()
+    job_queue.stop()
+    shutdown_reply_pool()
+    # Encerra os pools de inferência e I/O de forma limpa
+    shutdown_executors(wait=True)
+    # Fecha as conexões IMAP mantidas no pool
+    imap_pool.close_all()
 
 # Criar app FastAPI
 app = FastAPI(
     title=settings.APP_NAME,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # CORS para frontend
@@ -22,6 +47,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Contagem e latência das requisições por endpoint (servidas pelo /stats)
+app.add_middleware(RequestMetricsMiddleware)
+
 # Incluir rotas
 app.include_router(analyze_router, prefix=settings.API_V1_STR)
 
@@ -0,0 +1,195 @@
+"""
+Compara os backends de inferência (fp32, int8, onnx) em um conjunto fixo de
+emails rotulados: acurácia, paridade com o fp32, latência e memória (RSS).
+
+Uso (a partir de backend/):
+    python -m scripts.backend_eval --backends fp32 int8 onnx
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import statistics
+import time
+from typing import Dict, List
+
+DEFAULT_EVAL_SET = os.path.join(os.path.dirname(__file__), "..", "src", "data", "eval_emails.jsonl")
+
+
+def load_eval_set(path: str) -> List[Dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _rss_mb() -> Dict[str, float]:
+    """
+    RSS atual e pico do processo em MB (Linux via /proc, senão getrusage).
+    """
+    current = peak = None
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    current = int(line.split()[1]) / 1024
+                elif line.startswith("VmHWM:"):
+                    peak = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if peak is None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {"rss_mb": round(current or peak, 1), "peak_rss_mb": round(peak, 1)}
+
+
+def _latency_summary(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "mean_ms": round(statistics.mean(ordered) * 1000, 1),
+        "p50_ms": round(ordered[len(ordered) // 2] * 1000, 1),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 1)
+    }
+
+
+def evaluate_backend(backend: str, eval_path: str, generate: bool = True) -> Dict:
+    """
+    Carrega os modelos com o backend informado e mede acurácia, latência e RSS.
+    Deve rodar em um processo próprio para que o RSS reflita só este backend.
+    """
+    # Importações aqui para que o processo pai não carregue torch/transformers
+    from src.services import ai_services
+    from src.services.inference_backends import load_pipeline
+
+    examples = load_eval_set(eval_path)
+    report = {"backend": backend, "memory": {"baseline": _rss_mb()}}
+
+    started = time.perf_counter()
+    classifier = load_pipeline("zero-shot-classification", ai_services.CLASSIFIER_MODEL_NAME, backend)
+    report["load_time_seconds"] = {"classifier": round(time.perf_counter() - started, 2)}
+
+    generator = None
+    if generate:
+        started = time.perf_counter()
+        generator = load_pipeline("text2text-generation", ai_services.GENERATOR_MODEL_NAME, backend)
+        report["load_time_seconds"]["generator"] = round(time.perf_counter() - started, 2)
+    report["memory"]["after_load"] = _rss_mb()
+
+    # Aquecimento fora da medição
+    ai_services.classify_batch_scores([examples[0]["text"]], model=classifier)
+
+    predictions, latencies = [], []
+    for example in examples:
+        started = time.perf_counter()
+        scores = ai_services.classify_batch_scores([example["text"]], model=classifier)[0]
+        latencies.append(time.perf_counter() - started)
+        predictions.append(scores)
+
+    correct = sum(
+        1 for example, scores in zip(examples, predictions)
+        if max(scores, key=scores.get) == example["label"]
+    )
+    report["classification"] = {
+        "accuracy": round(correct / len(examples), 3),
+        "latency": _latency_summary(latencies),
+        "scores": predictions
+    }
+
+    if generator is not None:
+        outputs, latencies = [], []
+        for example in examples:
+            prompt = ai_services._style_prompt(example["text"], example["label"], "padrao")
+            started = time.perf_counter()
+            output = generator(prompt, max_length=128, num_beams=4)[0]["generated_text"]
+            latencies.append(time.perf_counter() - started)
+            outputs.append(output)
+        report["generation"] = {"latency": _latency_summary(latencies), "outputs": outputs}
+
+    report["memory"]["after_inference"] = _rss_mb()
+    return report
+
+
+def compare_to_reference(reference: Dict, candidate: Dict) -> Dict:
+    """
+    Paridade do candidato com o fp32: concordância de categoria, diferença de
+    pontuação e proporção de respostas geradas idênticas.
+    """
+    ref_scores = reference["classification"]["scores"]
+    cand_scores = candidate["classification"]["scores"]
+    agreement = sum(
+        1 for a, b in zip(ref_scores, cand_scores)
+        if max(a, key=a.get) == max(b, key=b.get)
+    )
+    diffs = [abs(a["produtivo"] - b["produtivo"]) for a, b in zip(ref_scores, cand_scores)]
+    parity = {
+        "label_agreement": round(agreement / len(ref_scores), 3),
+        "mean_abs_score_diff": round(statistics.mean(diffs), 4),
+        "max_abs_score_diff": round(max(diffs), 4)
+    }
+    if "generation" in reference and "generation" in candidate:
+        same = sum(
+            1 for a, b in zip(reference["generation"]["outputs"], candidate["generation"]["outputs"])
+            if a.strip() == b.strip()
+        )
+        parity["generation_exact_match"] = round(same / len(reference["generation"]["outputs"]), 3)
+    return parity
+
+
+def run(backends: List[str], eval_path: str, generate: bool = True) -> List[Dict]:
+    """
+    Avalia cada backend em um processo novo e calcula a paridade com o fp32.
+    """
+    context = multiprocessing.get_context("spawn")
+    reports = []
+    for backend in backends:
+        with context.Pool(1) as pool:
+            try:
+                reports.append(pool.apply(evaluate_backend, (backend, eval_path, generate)))
+            except Exception as e:
+                reports.append({"backend": backend, "error": str(e)})
+
+    reference = next((r for r in reports if r.get("backend") == "fp32" and "error" not in r), None)
+    for report in reports:
+        if reference is not None and report is not reference and "error" not in report:
+            report["parity_vs_fp32"] = compare_to_reference(reference, report)
+    return reports
+
+
+def _print_table(reports: List[Dict]):
+    print(f"{'backend':<8} {'acc':>6} {'agree':>6} {'cls p50':>9} {'gen p50':>9} {'rss MB':>8} {'peak MB':>8}")
+    for report in reports:
+        if "error" in report:
+            print(f"{report['backend']:<8} erro: {report['error']}")
+            continue
+        parity = report.get("parity_vs_fp32", {})
+        generation = report.get("generation", {}).get("latency", {})
+        memory = report["memory"]["after_inference"]
+        print(
+            f"{report['backend']:<8} {report['classification']['accuracy']:>6} "
+            f"{parity.get('label_agreement', '-'):>6} "
+            f"{report['classification']['latency']['p50_ms']:>7}ms "
+            f"{generation.get('p50_ms', '-'):>7}ms "
+            f"{memory['rss_mb']:>8} {memory['peak_rss_mb']:>8}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara backends de inferência (acurácia, latência e RSS).")
+    parser.add_argument("--backends", nargs="+", default=["fp32", "int8"])
+    parser.add_argument("--eval-set", default=DEFAULT_EVAL_SET)
+    parser.add_argument("--skip-generation", action="store_true")
+    parser.add_argument("--output", help="Arquivo JSON para salvar o relatório completo")
+    args = parser.parse_args()
+
+    backends = args.backends
+    if "fp32" not in backends:
+        # A paridade é sempre medida contra o fp32
+        backends = ["fp32"] + backends
+
+    reports = run(backends, args.eval_set, generate=not args.skip_generation)
+    _print_table(reports)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
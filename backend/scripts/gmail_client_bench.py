@@ -0,0 +1,125 @@
+"""
+Mede o custo de montar o cliente Gmail antes (build() a cada chamada) e
+depois do cache de clientes, contra um servidor HTTP local que imita a API.
+
+Uso (a partir de backend/):
+    python -m scripts.gmail_client_bench --iterations 50
+"""
+import argparse
+import json
+import socket
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List
+
+
+class _FakeGmailHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 para que o cliente possa manter a conexão aberta
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # Cabeçalhos e corpo saem em escritas separadas; sem TCP_NODELAY o
+        # Nagle + ACK atrasado somaria ~40ms por resposta em conexões mantidas
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        body = json.dumps({"messages": [], "resultSizeEstimate": 0}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fake_gmail() -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeGmailHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.connections = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _summary(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "mean_ms": round(statistics.mean(ordered) * 1000, 3),
+        "p50_ms": round(ordered[len(ordered) // 2] * 1000, 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3)
+    }
+
+
+def _measure(server: ThreadingHTTPServer, make_service: Callable, iterations: int) -> Dict:
+    connections_before = server.connections
+    build_times, call_times = [], []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        service = make_service()
+        built = time.perf_counter()
+        service.users().messages().list(userId="me", maxResults=1).execute()
+        build_times.append(built - started)
+        call_times.append(time.perf_counter() - built)
+    return {
+        "build": _summary(build_times),
+        "request": _summary(call_times),
+        "connections_opened": server.connections - connections_before
+    }
+
+
+def run(iterations: int = 50) -> Dict:
+    from google.oauth2.credentials import Credentials
+    from googleapiclient.discovery import build
+
+    from src.core.config import settings
+    from src.services import gmail_oauth
+
+    server = start_fake_gmail()
+    endpoint = f"http://127.0.0.1:{server.server_address[1]}/"
+    settings.GMAIL_API_ENDPOINT = endpoint
+    token = "token-de-teste"
+
+    def uncached():
+        # Comportamento anterior: descoberta e transporte novos a cada chamada
+        creds = Credentials(token=token, scopes=gmail_oauth.SCOPES)
+        return build("gmail", "v1", credentials=creds, client_options={"api_endpoint": endpoint})
+
+    try:
+        report = {
+            "iterations": iterations,
+            "uncached": _measure(server, uncached, iterations),
+            "cached": _measure(server, lambda: gmail_oauth.get_gmail_service_with_token(token), iterations)
+        }
+    finally:
+        server.shutdown()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara a construção do cliente Gmail com e sem cache.")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--output", help="Arquivo JSON para salvar o relatório")
+    args = parser.parse_args()
+
+    report = run(args.iterations)
+    print(f"{'modo':<10} {'build p50':>11} {'build p95':>11} {'req p50':>10} {'conexões':>9}")
+    for mode in ("uncached", "cached"):
+        result = report[mode]
+        print(
+            f"{mode:<10} {result['build']['p50_ms']:>9}ms {result['build']['p95_ms']:>9}ms "
+            f"{result['request']['p50_ms']:>8}ms {result['connections_opened']:>9}"
+        )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
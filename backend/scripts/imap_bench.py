@@ -0,0 +1,291 @@
+"""
+Compara a leitura IMAP anterior (conexão nova e um FETCH BODY[] por email)
+com o fetch atual (pool de conexões, um FETCH para todos os UIDs e corpo
+parcial com BODY.PEEK) contra um servidor IMAP falso local.
+
+Uso (a partir de backend/):
+    python -m scripts.imap_bench --emails 10 --attachment-kb 1024 --latency-ms 5
+"""
+import argparse
+import email
+import json
+import re
+import select
+import socketserver
+import statistics
+import threading
+import time
+from email.mime.application import MIMEApplication
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Dict, List
+
+_FETCH_ITEM = re.compile(r'(BODY(?:\.PEEK)?)\[([^\]]*)\](?:<(\d+)\.(\d+)>)?|BODYSTRUCTURE|UID|FLAGS', re.IGNORECASE)
+
+
+class FakeIMAPServer(socketserver.ThreadingTCPServer):
+    """
+    Servidor IMAP4rev1 mínimo, suficiente para o IMAPClient: LOGIN, SELECT/
+    EXAMINE, UID SEARCH, UID FETCH (BODY[], BODY.PEEK parcial, HEADER.FIELDS,
+    BODYSTRUCTURE), IDLE, NOOP e LOGOUT. Todos os emails são tratados como não
+    lidos. latency simula o tempo de ida e volta de cada comando.
+    """
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, messages: Dict[int, bytes], latency: float = 0.0):
+        super().__init__(("127.0.0.1", 0), _IMAPHandler)
+        self.raw = messages
+        self.parsed = {uid: email.message_from_bytes(raw) for uid, raw in messages.items()}
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.commands = 0
+        self.bytes_sent = 0
+
+    def add_message(self, raw: bytes) -> int:
+        """
+        Entrega um email novo; conexões em IDLE recebem o EXISTS.
+        """
+        with self.lock:
+            uid = max(self.raw, default=0) + 1
+            self.raw[uid] = raw
+            self.parsed[uid] = email.message_from_bytes(raw)
+        return uid
+
+    def counters(self) -> Dict[str, int]:
+        with self.lock:
+            return {"connections": self.connections, "commands": self.commands, "bytes_sent": self.bytes_sent}
+
+
+class _IMAPHandler(socketserver.StreamRequestHandler):
+    # Respostas saem em várias escritas; sem isso o Nagle + ACK atrasado
+    # somaria ~40ms por comando
+    disable_nagle_algorithm = True
+
+    def send(self, data: bytes):
+        self.wfile.write(data)
+        with self.server.lock:
+            self.server.bytes_sent += len(data)
+
+    def handle(self):
+        with self.server.lock:
+            self.server.connections += 1
+        self.send(b"* OK [CAPABILITY IMAP4rev1 IDLE] IMAP falso pronto\r\n")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            tag, _, rest = line.decode().rstrip("\r\n").partition(" ")
+            command, _, args = rest.partition(" ")
+            command = command.upper()
+            if command == "UID":
+                sub, _, args = args.partition(" ")
+                command = "UID " + sub.upper()
+            with self.server.lock:
+                self.server.commands += 1
+            if self.server.latency:
+                time.sleep(self.server.latency)
+
+            if command == "CAPABILITY":
+                self.send(b"* CAPABILITY IMAP4rev1 IDLE\r\n")
+            elif command in ("SELECT", "EXAMINE"):
+                self.send(f"* {len(self.server.raw)} EXISTS\r\n* 0 RECENT\r\n* FLAGS (\\Seen)\r\n"
+                          f"* OK [UIDVALIDITY 1] UIDs\r\n"
+                          f"* OK [UIDNEXT {max(self.server.raw, default=0) + 1}] Próximo UID\r\n".encode())
+            elif command == "UID SEARCH":
+                self.send(("* SEARCH " + " ".join(str(uid) for uid in sorted(self.server.raw)) + "\r\n").encode())
+            elif command == "UID FETCH":
+                uid_set, _, items = args.partition(" ")
+                for uid in _parse_uid_set(uid_set):
+                    if uid in self.server.raw:
+                        self.send(self._fetch_response(uid, items))
+            elif command == "IDLE":
+                if not self._idle():
+                    return
+            elif command == "LOGOUT":
+                self.send(b"* BYE\r\n" + f"{tag} OK LOGOUT concluído\r\n".encode())
+                return
+            self.send(f"{tag} OK {command} concluído\r\n".encode())
+
+    def _idle(self) -> bool:
+        self.send(b"+ idling\r\n")
+        known = len(self.server.raw)
+        while True:
+            if len(self.server.raw) != known:
+                known = len(self.server.raw)
+                self.send(f"* {known} EXISTS\r\n".encode())
+            readable, _, _ = select.select([self.connection], [], [], 0.05)
+            if readable:
+                # DONE encerra o IDLE; conexão fechada encerra a sessão
+                return bool(self.rfile.readline())
+
+    def _fetch_response(self, uid: int, items: str) -> bytes:
+        raw, message = self.server.raw[uid], self.server.parsed[uid]
+        parts = [f"UID {uid}".encode()]
+        for match in _FETCH_ITEM.finditer(items):
+            name = match.group(0).upper()
+            if name == "BODYSTRUCTURE":
+                parts.append(b"BODYSTRUCTURE " + _bodystructure(message))
+            elif match.group(1):
+                section = match.group(2).upper()
+                data = _section(raw, message, section)
+                key = f"BODY[{match.group(2)}]"
+                if match.group(3) is not None:
+                    start, length = int(match.group(3)), int(match.group(4))
+                    data = data[start:start + length]
+                    key += f"<{start}>"
+                parts.append(f"{key} {{{len(data)}}}\r\n".encode() + data)
+        return f"* {uid} FETCH (".encode() + b" ".join(parts) + b")\r\n"
+
+
+def _parse_uid_set(uid_set: str) -> List[int]:
+    uids = []
+    for item in uid_set.split(","):
+        if ":" in item:
+            start, end = item.split(":")
+            uids.extend(range(int(start), int(end) + 1))
+        else:
+            uids.append(int(item))
+    return uids
+
+
+def _section(raw: bytes, message, section: str) -> bytes:
+    if section == "":
+        return raw
+    if section.startswith("HEADER.FIELDS"):
+        wanted = re.search(r"\((.*)\)", section).group(1).split()
+        lines = [f"{name.title()}: {message[name]}\r\n" for name in wanted if message[name] is not None]
+        return ("".join(lines) + "\r\n").encode()
+    part = message
+    for index in section.split("."):
+        part = part.get_payload()[int(index) - 1] if part.is_multipart() else part
+    return part.get_payload().encode("utf-8", errors="surrogateescape")
+
+
+def _quote(value: str) -> str:
+    return '"' + value.replace('"', '\\"') + '"'
+
+
+def _bodystructure(part) -> bytes:
+    if part.is_multipart():
+        children = b"".join(_bodystructure(child) for child in part.get_payload())
+        return b"(" + children + f" {_quote(part.get_content_subtype().upper())})".encode()
+    params = part.get_params()[1:] if part.get_params() else []
+    params_text = "(" + " ".join(f"{_quote(k.upper())} {_quote(v)}" for k, v in params) + ")" if params else "NIL"
+    payload = part.get_payload()
+    encoding = part.get("Content-Transfer-Encoding", "7BIT").upper()
+    fields = (f"{_quote(part.get_content_maintype().upper())} {_quote(part.get_content_subtype().upper())} "
+              f"{params_text} NIL NIL {_quote(encoding)} {len(payload)}")
+    if part.get_content_maintype() == "text":
+        fields += f" {payload.count(chr(10))}"
+    return f"({fields})".encode()
+
+
+def make_messages(count: int, attachment_kb: int, text_chars: int = 4000) -> Dict[int, bytes]:
+    """
+    Emails multipart com uma parte de texto (UTF-8 em base64) e um anexo binário.
+    """
+    messages = {}
+    for uid in range(1, count + 1):
+        message = MIMEMultipart()
+        message["Subject"] = f"Reunião do projeto {uid}"
+        message["From"] = f"Cliente {uid} <cliente{uid}@exemplo.com>"
+        body = (f"Olá, preciso do orçamento revisado para a reunião {uid}. " * (text_chars // 60 + 1))[:text_chars]
+        message.attach(MIMEText(body, "plain", "utf-8"))
+        if attachment_kb:
+            message.attach(MIMEApplication(bytes(attachment_kb * 1024), Name="anexo.bin"))
+        messages[uid] = message.as_bytes()
+    return messages
+
+
+def legacy_fetch_unread_emails(email_address, password, imap_server, max_emails, port):
+    """
+    Implementação anterior: conexão nova por chamada e um FETCH BODY[] por UID.
+    """
+    import imapclient
+    import pyzmail
+
+    server = imapclient.IMAPClient(imap_server, port=port, ssl=False)
+    server.login(email_address, password)
+    server.select_folder('INBOX')
+    messages = server.search(['UNSEEN'])
+    emails = []
+    for uid in messages[:max_emails]:
+        raw_message = server.fetch([uid], ['BODY[]'])[uid][b'BODY[]']
+        msg = pyzmail.PyzMessage.factory(raw_message)
+        subject = msg.get_subject()
+        from_ = msg.get_addresses('from')[0][1]
+        if msg.text_part:
+            body = msg.text_part.get_payload().decode(msg.text_part.charset)
+        elif msg.html_part:
+            body = msg.html_part.get_payload().decode(msg.html_part.charset)
+        else:
+            body = ""
+        emails.append({'subject': subject, 'from': from_, 'body': body})
+    server.logout()
+    return emails
+
+
+def _measure(server: FakeIMAPServer, fetch, iterations: int) -> Dict:
+    before = server.counters()
+    samples, result = [], None
+    for _ in range(iterations):
+        started = time.perf_counter()
+        result = fetch()
+        samples.append(time.perf_counter() - started)
+    after = server.counters()
+    ordered = sorted(samples)
+    return {
+        "mean_ms": round(statistics.mean(ordered) * 1000, 2),
+        "p50_ms": round(ordered[len(ordered) // 2] * 1000, 2),
+        **{f"{name}_per_poll": round((after[name] - before[name]) / iterations, 1) for name in after},
+        "emails": result
+    }
+
+
+def run(emails: int = 10, attachment_kb: int = 1024, latency_ms: float = 5.0, iterations: int = 5) -> Dict:
+    from src.services.email_reader import fetch_unread_emails, imap_pool
+
+    server = FakeIMAPServer(make_messages(emails, attachment_kb), latency_ms / 1000)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+    try:
+        legacy = _measure(server, lambda: legacy_fetch_unread_emails("user", "senha", "127.0.0.1", emails, port), iterations)
+        current = _measure(server, lambda: fetch_unread_emails("user", "senha", "127.0.0.1", emails, ssl=False, port=port), iterations)
+    finally:
+        imap_pool.close_all()
+        server.shutdown()
+
+    same = all(
+        a["subject"] == b["subject"] and a["from"] == b["from"] and a["body"].startswith(b["body"][:1000])
+        for a, b in zip(legacy["emails"], current["emails"])
+    )
+    for report in (legacy, current):
+        report.pop("emails")
+    return {"legacy": legacy, "current": current, "same_headers_and_body_prefix": same}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara o fetch IMAP anterior e o atual contra um servidor falso.")
+    parser.add_argument("--emails", type=int, default=10)
+    parser.add_argument("--attachment-kb", type=int, default=1024)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--output", help="Arquivo JSON para salvar o relatório")
+    args = parser.parse_args()
+
+    report = run(args.emails, args.attachment_kb, args.latency_ms, args.iterations)
+    print(f"{'modo':<8} {'p50':>10} {'comandos':>9} {'conexões':>9} {'bytes':>12}")
+    for mode in ("legacy", "current"):
+        result = report[mode]
+        print(f"{mode:<8} {result['p50_ms']:>8}ms {result['commands_per_poll']:>9} "
+              f"{result['connections_per_poll']:>9} {result['bytes_sent_per_poll']:>12}")
+    print(f"mesmos cabeçalhos e início do corpo: {report['same_headers_and_body_prefix']}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+Compara o envio sequencial anterior das respostas com o ReplyDispatcher
+contra um servidor HTTP local que imita o Gmail: limite de taxa (429),
+erros 503 e envios "perdidos" (aceitos, mas respondidos com 500).
+
+Uso (a partir de backend/):
+    python -m scripts.reply_dispatch_bench --replies 200 --rate 20 --error-rate 0.05 --lost-rate 0.02
+"""
+import argparse
+import base64
+import email
+import json
+import random
+import re
+import socket
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeGmailServer(ThreadingHTTPServer):
+    """
+    Imita users.getProfile, users.messages.send e users.messages.list (busca
+    por rfc822msgid). rate é o limite de envios por segundo (acima dele, 429
+    com Retry-After), error_rate a chance de 503 sem enviar e lost_rate a
+    chance de enviar e mesmo assim responder 500.
+    """
+    daemon_threads = True
+
+    def __init__(self, rate: float = 20.0, error_rate: float = 0.0, lost_rate: float = 0.0,
+                 latency: float = 0.02, seed: int = 0):
+        super().__init__(("127.0.0.1", 0), _FakeGmailHandler)
+        self.rate = rate
+        self.error_rate = error_rate
+        self.lost_rate = lost_rate
+        self.latency = latency
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.sent: List[Dict] = []
+        self.counters = {"send_requests": 0, "rate_limited": 0, "errors": 0, "lost": 0, "searches": 0}
+        self._tokens = rate
+        self._updated = time.monotonic()
+
+    @property
+    def endpoint(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/"
+
+    def take_token(self) -> bool:
+        with self.lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def reset(self):
+        with self.lock:
+            self.sent = []
+            self.counters = dict.fromkeys(self.counters, 0)
+
+    def report(self) -> Dict:
+        with self.lock:
+            message_ids = [message["message_id"] for message in self.sent]
+        return {
+            **self.counters,
+            "delivered": len(message_ids),
+            "unique_delivered": len(set(message_ids)),
+            "duplicates_delivered": len(message_ids) - len(set(message_ids))
+        }
+
+
+class _FakeGmailHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def _reply(self, status: int, payload: Dict, headers: Dict = None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status: int, reason: str, headers: Dict = None):
+        self._reply(status, {"error": {"code": status, "message": reason, "errors": [{"reason": reason}]}}, headers)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path.endswith("/profile"):
+            self._reply(200, {"emailAddress": "usuario@exemplo.com", "historyId": "1"})
+        elif url.path.endswith("/messages"):
+            server = self.server
+            query = parse_qs(url.query).get("q", [""])[0]
+            match = re.search(r"rfc822msgid:(\S+)", query)
+            with server.lock:
+                server.counters["searches"] += 1
+                found = [m for m in server.sent if match and m["message_id"] == match.group(1)]
+            self._reply(200, {"messages": [{"id": m["id"], "threadId": m["id"]} for m in found[:1]]})
+        else:
+            self._error(404, "notFound")
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not self.path.split("?")[0].endswith("/messages/send"):
+            self._error(404, "notFound")
+            return
+        time.sleep(server.latency)
+        with server.lock:
+            server.counters["send_requests"] += 1
+            roll = server.random.random()
+        if not server.take_token():
+            with server.lock:
+                server.counters["rate_limited"] += 1
+            self._error(429, "rateLimitExceeded", {"Retry-After": "1"})
+            return
+        if roll < server.error_rate:
+            with server.lock:
+                server.counters["errors"] += 1
+            self._error(503, "backendError")
+            return
+        raw = base64.urlsafe_b64decode(json.loads(body)["raw"])
+        message = email.message_from_bytes(raw)
+        with server.lock:
+            message_id = f"m{len(server.sent) + 1}"
+            # Sem Message-ID do cliente o Gmail gera um
+            server.sent.append({"id": message_id, "message_id": message["Message-ID"] or f"<{message_id}@gmail>",
+                                "to": message["to"]})
+            lost = roll < server.error_rate + server.lost_rate
+            if lost:
+                server.counters["lost"] += 1
+        if lost:
+            # Enviado, mas o cliente recebe erro: um retry ingênuo duplicaria
+            self._error(500, "backendError")
+            return
+        self._reply(200, {"id": message_id, "threadId": message_id, "labelIds": ["SENT"]})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_replies(count: int) -> List[Dict]:
+    return [
+        {"to_email": f"cliente{i}@exemplo.com", "subject": f"Pedido {i}",
+         "body": f"Olá, recebemos o seu pedido {i}.", "thread_id": f"t{i}"}
+        for i in range(count)
+    ]
+
+
+def legacy_send(access_token: str, replies: List[Dict]) -> List[Dict]:
+    """
+    Comportamento anterior: um envio por vez, sem retry.
+    """
+    from src.services.gmail_oauth import send_gmail_reply
+
+    results = []
+    for reply in replies:
+        try:
+            sent = send_gmail_reply(access_token, reply["to_email"], reply["subject"], reply["body"], reply.get("thread_id"))
+            results.append({"to": reply["to_email"], "status": "sent", "id": sent.get("id")})
+        except Exception as e:
+            results.append({"to": reply["to_email"], "status": "error", "error": str(e)})
+    return results
+
+
+def run(replies: int = 200, rate: float = 20.0, error_rate: float = 0.05, lost_rate: float = 0.02,
+        latency_ms: float = 20.0) -> Dict:
+    from src.core.config import settings
+    from src.services import reply_dispatcher
+
+    report = {}
+    server = FakeGmailServer(rate, error_rate, lost_rate, latency_ms / 1000)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    with tempfile.TemporaryDirectory() as directory:
+        settings.GMAIL_API_ENDPOINT = server.endpoint
+        settings.GMAIL_REPLY_LEDGER_PATH = f"{directory}/replies.db"
+        settings.GMAIL_REPLY_RATE_PER_SECOND = rate
+        settings.GMAIL_REPLY_BACKOFF_BASE_SECONDS = 0.05
+        batch = make_replies(replies)
+        try:
+            for mode in ("legacy", "dispatcher", "dispatcher_repeat"):
+                if mode != "dispatcher_repeat":
+                    server.reset()
+                started = time.perf_counter()
+                if mode == "legacy":
+                    results = legacy_send("token-de-teste", batch)
+                    summary = {"sent": sum(1 for r in results if r["status"] == "sent")}
+                    summary["error"] = len(results) - summary["sent"]
+                else:
+                    # O mesmo lote reenviado (ex.: retry do cliente) não deve duplicar nada
+                    results = list(reply_dispatcher.iter_dispatch_replies("token-de-teste", batch))
+                    summary = reply_dispatcher.summarize_dispatch(results, time.perf_counter() - started)
+                report[mode] = {
+                    "elapsed_seconds": round(time.perf_counter() - started, 3),
+                    "summary": summary,
+                    "server": server.report()
+                }
+        finally:
+            reply_dispatcher.shutdown_reply_pool()
+            server.shutdown()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara o envio sequencial e o dispatcher contra um Gmail falso.")
+    parser.add_argument("--replies", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=20.0, help="Envios por segundo aceitos pelo servidor")
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--lost-rate", type=float, default=0.02)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--output", help="Arquivo JSON para salvar o relatório")
+    args = parser.parse_args()
+
+    report = run(args.replies, args.rate, args.error_rate, args.lost_rate, args.latency_ms)
+    print(f"{'modo':<18} {'tempo':>8} {'enviadas':>9} {'erros':>6} {'incertas':>9} {'entregues':>10} {'duplicadas':>11}")
+    for mode, result in report.items():
+        print(f"{mode:<18} {result['elapsed_seconds']:>7}s {result['summary'].get('sent', 0):>9} "
+              f"{result['summary'].get('error', 0):>6} {result['summary'].get('unknown', 0):>9} "
+              f"{result['server']['unique_delivered']:>10} "
+              f"{result['server']['duplicates_delivered']:>11}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
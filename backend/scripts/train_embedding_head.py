@@ -0,0 +1,25 @@
+"""
+Treina a cabeça do classificador por embeddings a partir de um JSONL
+rotulado ({"text": ..., "label": ...}) e salva o artefato .npz usado em
+EMBEDDING_HEAD_PATH.
+
+Uso (a partir de backend/):
+    python -m scripts.train_embedding_head dados.jsonl --output cabeca.npz --head logistic
+"""
+import argparse
+
+from src.services.embedding_classifier import DEFAULT_ENCODER, HEADS, train
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Treina a cabeça do classificador por embeddings.")
+    parser.add_argument("data", help="JSONL com campos text e label")
+    parser.add_argument("--output", required=True, help="Caminho do artefato .npz")
+    parser.add_argument("--encoder", default=DEFAULT_ENCODER)
+    parser.add_argument("--head", choices=HEADS, default="centroid")
+    args = parser.parse_args()
+    train(args.data, args.output, args.encoder, args.head)
+
+
+if __name__ == "__main__":
+    main()
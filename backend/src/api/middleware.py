@@ -0,0 +1,42 @@
+import time
+
+from src.services.metrics import metrics
+
+
+class RequestMetricsMiddleware:
+    """
+    Middleware ASGI que conta as requisições por endpoint, método e status e
+    mede a latência de cada uma até o último byte da resposta (inclusive em
+    streaming). O endpoint é o caminho da rota (ex.: /api/v1/jobs/{job_id})
+    para que ids não multipliquem as séries; caminhos sem rota viram "other".
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.in_progress = 0
+        metrics.register_gauge(
+            "http_requests_in_progress", "Requisições HTTP em andamento.", lambda: self.in_progress
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not metrics.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        self.in_progress += 1
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.in_progress -= 1
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or "other"
+            metrics.observe_request(endpoint, scope["method"], status_code, time.perf_counter() - started)
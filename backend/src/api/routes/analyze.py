@@ -1,13 +1,55 @@
-from fastapi import APIRouter, FastAPI, UploadFile, File, Form, HTTPException, status, Body
+from fastapi import APIRouter, FastAPI, UploadFile, File, Form, Header, HTTPException, Query, status, Body, Depends, Request, Response
 from typing import Optional, List
-import PyPDF2
-import io
+import asyncio
+import hmac
 import logging
+import os
+import time
 from datetime import datetime
-from src.services.ai_services import classify_email, suggest_response
-from src.schemas.analysis import AnalysisResponse
-from src.services.email_reader import fetch_unread_emails
-from src.services.gmail_oauth import  fetch_latest_emails, send_gmail_reply
+from imapclient.exceptions import IMAPClientError, LoginError
+from src.services.ai_services import (
+    classify_email,
+    classify_email_cached,
+    generate_suggestion,
+    deadline_from_budget,
+    analyze,
+    analyze_emails,
+    classify_long_document,
+    get_batching_stats,
+    get_cache_stats,
+    get_cascade_stats,
+    get_generation_stats,
+    get_template_stats,
+    get_model_status,
+    start_background_loading
+)
+from src.core.config import settings
+from src.services.inference_executor import (
+    BoundedExecutor,
+    ExecutorQueueFull,
+    inference_executor,
+    io_executor,
+    pdf_executor
+)
+from src.schemas.analysis import AnalysisResponse, FullAnalysisResponse
+from src.api.streaming import stream_format, streaming_response
+from src.services.ingestion import UploadTooLarge, extract_pdf_text, read_jsonl_upload, read_text_upload, spool_upload
+from src.services.job_queue import JobQueueFull, job_queue
+from src.services.job_store import FINISHED_STATUSES
+from src.services.metrics import PROMETHEUS_CONTENT_TYPE, metrics
+from src.services.profiling import ProfilingDenied, RequestProfile, current_profile, finish_profile, start_profile
+from src.services.email_reader import fetch_unread_emails, iter_unread_emails, imap_pool
+from src.services.mailbox_watcher import WatcherLimitReached, mailbox_watcher
+from src.services.reply_dispatcher import iter_dispatch_replies, summarize_dispatch
+from src.services.gmail_oauth import (
+    analyze_parsed_email,
+    analyze_parsed_emails,
+    complete_sync,
+    fetch_latest_parsed_emails,
+    get_gmail_client_stats,
+    iter_latest_emails,
+    prepare_sync
+)
 
 # APIRouter funciona de forma muito similar a um Blueprint
 app = FastAPI()
@@ -17,6 +59,83 @@ router = APIRouter()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+async def _run_blocking(executor: BoundedExecutor, func, *args):
+    """
+    Executa uma função bloqueante no executor informado, convertendo fila
+    cheia e timeout em respostas HTTP.
+    """
+    profile = current_profile()
+    try:
+        if profile is not None:
+            return await profile.run(executor, func, *args, with_torch=executor is inference_executor)
+        return await executor.run(func, *args)
+    except ExecutorQueueFull:
+        logger.warning(f"Executor '{executor.name}' sem vagas para {func.__name__}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Servidor ocupado, tente novamente em instantes."
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Tempo limite de processamento excedido."
+        )
+
+async def _iterate_blocking(executor: BoundedExecutor, func, *args):
+    """
+    Versão em streaming de _run_blocking: consome o gerador bloqueante
+    func(*args) no executor, com as mesmas conversões de erro.
+    """
+    try:
+        async for item in executor.iterate(func, *args):
+            yield item
+    except ExecutorQueueFull:
+        logger.warning(f"Executor '{executor.name}' sem vagas para {func.__name__}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Servidor ocupado, tente novamente em instantes."
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Tempo limite de processamento excedido."
+        )
+
+def _request_deadline(latency_budget_ms: Optional[float], header_budget_ms: Optional[float]):
+    """
+    Prazo da requisição a partir do campo latency_budget_ms ou do cabeçalho
+    X-Latency-Budget-Ms (o campo tem precedência).
+    """
+    budget = latency_budget_ms if latency_budget_ms is not None else header_budget_ms
+    if budget is not None and budget <= 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="latency_budget_ms deve ser positivo."
+        )
+    return deadline_from_budget(budget)
+
+async def _request_profile(request: Request, x_profile_token: Optional[str] = Header(None)):
+    """
+    Ativa o profiling da requisição pelo cabeçalho X-Profile-Token (igual a
+    PROFILING_ADMIN_TOKEN) ou por amostragem, e grava os arquivos ao final.
+    """
+    try:
+        profile = start_profile(request.url.path, x_profile_token)
+    except ProfilingDenied as e:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
+    if profile is None:
+        yield None
+        return
+    try:
+        yield profile
+    finally:
+        finish_profile(profile)
+        try:
+            directory = await io_executor.run(profile.save)
+            logger.info(f"Profile {profile.id} ({profile.trigger}) gravado em {directory}")
+        except Exception as e:
+            logger.error(f"Falha ao gravar o profile {profile.id}: {str(e)}")
+
 @router.post(
     "/analyze",
     response_model=AnalysisResponse,
@@ -27,7 +146,12 @@ async def analyze_email_endpoint(
     text: Optional[str] = Form(None),
     file: Optional[UploadFile] = File(None),
     style: Optional[str] = Form("padrao"),
-    sender_name: Optional[str] = Form(None)
+    sender_name: Optional[str] = Form(None),
+    long_document: Optional[bool] = Form(None),
+    aggregation: Optional[str] = Form(None),
+    latency_budget_ms: Optional[float] = Form(None),
+    x_latency_budget_ms: Optional[float] = Header(None),
+    profile: Optional[RequestProfile] = Depends(_request_profile)
 ):
     """
     Endpoint de análise.
@@ -35,11 +159,18 @@ async def analyze_email_endpoint(
     - **file**: Arquivo (.txt ou .pdf) enviado.
     - **style**: Estilo da resposta (padrao, formal, informal, detalhada, objetiva).
     - **sender_name**: Nome do remetente para personalização.
+    - **long_document**: Classifica por janelas de tokens (padrão: ativo para PDFs).
+    - **aggregation**: Como combinar as janelas (max, mean ou weighted).
+    - **latency_budget_ms**: Orçamento de latência; a geração se adapta a ele
+      ou usa template (também aceito no cabeçalho X-Latency-Budget-Ms).
+    - Cabeçalho **X-Profile-Token**: perfila a requisição (token de administrador);
+      o id do profile volta em metadata.profile_id.
     """
-    start_time = datetime.now()
+    started = time.perf_counter()
+    deadline = _request_deadline(latency_budget_ms, x_latency_budget_ms)
     
     # Log da tentativa de análise
-    logger.info(f"Iniciando análise de email às {start_time}")
+    logger.info(f"Iniciando análise de email às {datetime.now()}")
     
     if not text and (not file or not file.filename):
         logger.warning("Tentativa de análise sem texto ou arquivo")
@@ -50,6 +181,7 @@ async def analyze_email_endpoint(
 
     email_text = ""
     file_info = None
+    ingestion_info = None
     
     try:
         if file and file.filename and file.filename.strip():
@@ -58,20 +190,16 @@ async def analyze_email_endpoint(
             logger.info(f"Processando arquivo: {filename}")
             
             if filename.endswith(".txt"):
-                contents = await file.read()
-                email_text = contents.decode('utf-8')
+                try:
+                    email_text, ingestion_info = await read_text_upload(
+                        file, settings.UPLOAD_MAX_BYTES, settings.UPLOAD_MAX_TEXT_CHARS, settings.UPLOAD_CHUNK_SIZE
+                    )
+                except ValueError as e:
+                    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
                 logger.info(f"Arquivo TXT lido com sucesso: {len(email_text)} caracteres")
                 
             elif filename.endswith(".pdf"):
-                try:
-                    contents = await file.read()
-                    pdf_buffer = io.BytesIO(contents)
-                    pdf_reader = PyPDF2.PdfReader(pdf_buffer)
-                    email_text = "".join(page.extract_text() for page in pdf_reader.pages)
-                    logger.info(f"PDF processado com sucesso: {len(pdf_reader.pages)} páginas, {len(email_text)} caracteres")
-                except Exception as e:
-                    logger.error(f"Erro ao processar PDF {filename}: {str(e)}")
-                    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Erro ao ler PDF: {e}")
+                email_text, ingestion_info = await _ingest_pdf(file, filename)
             else:
                 logger.warning(f"Formato de arquivo inválido: {filename}")
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Formato de arquivo inválido. Use .txt ou .pdf")
@@ -86,41 +214,172 @@ async def analyze_email_endpoint(
 
         # Realizar classificação e sugestão
         logger.info("Iniciando classificação com IA")
-        category = classify_email(email_text)
-        suggestion = suggest_response(email_text, category, style, sender_name)
+        long_document_info = None
+        if long_document is None:
+            long_document = bool(file_info and file_info["filename"].endswith(".pdf"))
+
+        if long_document:
+            try:
+                long_result = await _run_blocking(
+                    inference_executor, classify_long_document, email_text, aggregation
+                )
+            except ValueError as e:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+            category, category_cached = long_result["category"], long_result["cached"]
+            long_document_info = {
+                name: long_result[name]
+                for name in ("scores", "aggregation", "windows_total", "windows_scored", "early_exit", "evidence")
+            }
+        else:
+            category, category_cached = await _run_blocking(inference_executor, classify_email_cached, email_text)
+        suggestion = await _run_blocking(
+            inference_executor, generate_suggestion, email_text, category, style, sender_name, deadline
+        )
         
         # Calcular tempo de processamento
-        processing_time = (datetime.now() - start_time).total_seconds()
+        processing_time = time.perf_counter() - started
         
         logger.info(f"Email classificado como '{category}' em {processing_time:.2f}s")
         
         # Preparar resposta com informações adicionais
         response_data = {
             "category": category.capitalize(),
-            "suggestion": suggestion,
+            "suggestion": suggestion.text,
             "metadata": {
                 "processing_time_seconds": round(processing_time, 2),
                 "text_length": len(email_text),
                 "processed_at": datetime.now().isoformat(),
                 "file_info": file_info,
                 "style_used": style,
-                "sender_name": sender_name
+                "sender_name": sender_name,
+                "cache": {
+                    "category": category_cached,
+                    "suggestion": suggestion.cached
+                },
+                "generation_strategy": suggestion.strategy,
+                "latency_budget_ms": latency_budget_ms if latency_budget_ms is not None else x_latency_budget_ms,
+                "long_document": long_document_info,
+                "ingestion": ingestion_info,
+                "profile_id": profile.id if profile else None
             }
         }
         
         return AnalysisResponse(**response_data)
         
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
     except HTTPException:
         # Re-raise HTTP exceptions
         raise
     except Exception as e:
-        processing_time = (datetime.now() - start_time).total_seconds()
+        processing_time = time.perf_counter() - started
         logger.error(f"Erro inesperado na análise após {processing_time:.2f}s: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, 
             detail=f"Erro interno do servidor: {str(e)}"
         )
 
+async def _ingest_pdf(file: UploadFile, filename: str):
+    """
+    Copia o PDF em blocos para um arquivo temporário e extrai o texto no
+    pdf_executor, página a página, com limites de páginas e caracteres.
+    """
+    path, ingestion_info = await spool_upload(
+        file, settings.UPLOAD_MAX_BYTES, settings.UPLOAD_CHUNK_SIZE, suffix=".pdf"
+    )
+    try:
+        started = time.perf_counter()
+        try:
+            extracted = await _run_blocking(
+                pdf_executor, extract_pdf_text, path, settings.PDF_MAX_PAGES, settings.UPLOAD_MAX_TEXT_CHARS
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Erro ao processar PDF {filename}: {str(e)}")
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Erro ao ler PDF: {e}")
+        elapsed = time.perf_counter() - started
+        # Inclui a espera por um processo livre no pdf_executor
+        metrics.observe("pdf_extract", elapsed)
+        ingestion_info["timings_ms"]["extract"] = round(elapsed * 1000, 2)
+    finally:
+        os.unlink(path)
+
+    email_text = extracted.pop("text")
+    logger.info(
+        f"PDF processado com sucesso: {extracted['pages_read']}/{extracted['pages_total']} páginas, "
+        f"{len(email_text)} caracteres"
+    )
+    return email_text, {**ingestion_info, **extracted}
+
+@router.post(
+    "/analyze/full",
+    response_model=FullAnalysisResponse,
+    summary="Análise completa do email em uma única passada",
+    description="Retorna categoria, confiança, palavras-chave, urgência, tom e sugestão de resposta a partir de uma única chamada ao modelo."
+)
+async def full_analysis_endpoint(
+    text: str = Form(...),
+    style: Optional[str] = Form("padrao"),
+    sender_name: Optional[str] = Form(None),
+    generate: bool = Form(True),
+    min_confidence: Optional[float] = Form(None),
+    latency_budget_ms: Optional[float] = Form(None),
+    x_latency_budget_ms: Optional[float] = Header(None),
+    profile: Optional[RequestProfile] = Depends(_request_profile)
+):
+    """
+    Endpoint de análise completa.
+    - **text**: Texto do email.
+    - **style**: Estilo da resposta (padrao, formal, informal, detalhada, objetiva).
+    - **sender_name**: Nome do remetente para personalização.
+    - **generate**: Se falso, não gera sugestão de resposta.
+    - **min_confidence**: Confiança mínima para usar o gerador; abaixo dela é usado um template.
+    - **latency_budget_ms**: Orçamento de latência (ou cabeçalho X-Latency-Budget-Ms).
+    - Cabeçalho **X-Profile-Token**: perfila a requisição (ver /analyze).
+    """
+    started = time.perf_counter()
+    deadline = _request_deadline(latency_budget_ms, x_latency_budget_ms)
+
+    if not text.strip():
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Conteúdo do email está vazio.")
+
+    try:
+        result = await _run_blocking(inference_executor, analyze, text, style, sender_name, generate, min_confidence, deadline)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erro inesperado na análise completa: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro interno do servidor: {str(e)}"
+        )
+
+    processing_time = time.perf_counter() - started
+    logger.info(f"Análise completa: '{result['category']}' ({result['confidence']:.2f}) em {processing_time:.2f}s")
+
+    return FullAnalysisResponse(
+        category=result["category"].capitalize(),
+        confidence=result["confidence"],
+        scores=result["scores"],
+        keywords=result["keywords"],
+        urgency=result["urgency"],
+        tone=result["tone"],
+        suggestion=result["suggestion"],
+        metadata={
+            "processing_time_seconds": round(processing_time, 2),
+            "text_length": len(text),
+            "processed_at": datetime.now().isoformat(),
+            "classifier": result["classifier"],
+            "suggestion_source": result["suggestion_source"],
+            "generation_strategy": result["generation_strategy"],
+            "style_used": style,
+            "sender_name": sender_name,
+            "cache": result["cache"],
+            "profile_id": profile.id if profile else None
+        }
+    )
+
 @router.get("/categories", summary="Lista as categorias disponíveis")
 async def get_categories():
     """
@@ -147,95 +406,328 @@ async def get_categories():
 async def batch_analyze(
     emails: List[str],
     style: Optional[str] = Form("padrao"),
-    sender_name: Optional[str] = Form(None)
+    sender_name: Optional[str] = Form(None),
+    latency_budget_ms: Optional[float] = Form(None),
+    stream: Optional[str] = Form(None),
+    x_latency_budget_ms: Optional[float] = Header(None),
+    accept: Optional[str] = Header(None)
 ):
     """
     Analisa múltiplos emails de uma vez.
     - **emails**: Lista de textos de emails para analisar
     - **style**: Estilo da resposta (padrao, formal, informal, detalhada, objetiva)
     - **sender_name**: Nome do remetente para personalização
+    - **latency_budget_ms**: Orçamento de latência do lote inteiro (ou cabeçalho X-Latency-Budget-Ms)
+    - **stream**: ndjson ou sse para receber cada resultado assim que o seu
+      bloco de GENERATOR_BATCH_SIZE emails fica pronto (ou cabeçalho Accept)
     """
-    start_time = datetime.now()
+    started = time.perf_counter()
+    deadline = _request_deadline(latency_budget_ms, x_latency_budget_ms)
+    fmt = stream_format(stream, accept)
     logger.info(f"Iniciando análise em lote de {len(emails)} emails com estilo '{style}'")
     
-    if len(emails) > 50:  # Limite de segurança
+    if len(emails) > settings.BATCH_MAX_EMAILS:  # Limite de segurança
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Máximo de 50 emails por requisição."
+            detail=f"Máximo de {settings.BATCH_MAX_EMAILS} emails por requisição."
         )
-    
+
+    # Emails vazios são ignorados, como antes
+    indexed = [(i, email) for i, email in enumerate(emails) if email.strip()]
+
+    if fmt:
+        return await streaming_response(
+            _batch_events(indexed, len(emails), style, sender_name, deadline), fmt
+        )
+
     results = []
-    successful = 0
-    failed = 0
+    summary = _BatchSummary()
+    # Sem streaming, o lote inteiro vai de uma vez para o modelo
+    async for result in _batch_results(indexed, style, sender_name, deadline, chunk_size=len(indexed)):
+        summary.add(result)
+        results.append(result)
     
-    for i, email in enumerate(emails):
-        try:
-            if not email.strip():
-                continue
-                
-            category = classify_email(email)
-            suggestion = suggest_response(email, category, style, sender_name)
-            results.append({
-                "index": i,
-                "email_preview": email[:50] + "..." if len(email) > 50 else email,
-                "category": category.capitalize(),
-                "suggestion": suggestion,
-                "style": style,
-                "sender_name": sender_name,
-                "status": "success"
-            })
-            successful += 1
-            
-        except Exception as e:
-            logger.error(f"Erro ao analisar email {i}: {str(e)}")
-            results.append({
-                "index": i,
-                "email_preview": email[:50] + "..." if len(email) > 50 else email,
-                "error": str(e),
-                "status": "failed"
-            })
-            failed += 1
-    
-    processing_time = (datetime.now() - start_time).total_seconds()
-    logger.info(f"Análise em lote concluída: {successful} sucessos, {failed} falhas em {processing_time:.2f}s")
+    processing_time = time.perf_counter() - started
+    logger.info(f"Análise em lote concluída: {summary.successful} sucessos, {summary.failed} falhas em {processing_time:.2f}s")
     
     return {
         "results": results,
         "summary": {
             "total": len(emails),
-            "successful": successful,
-            "failed": failed,
+            "successful": summary.successful,
+            "failed": summary.failed,
             "processing_time_seconds": round(processing_time, 2),
             "style_used": style,
-            "sender_name": sender_name
+            "sender_name": sender_name,
+            "generation_strategies": summary.strategies
         }
     }
 
+class _BatchSummary:
+    """
+    Contadores do lote, acumulados resultado a resultado.
+    """
+
+    def __init__(self):
+        self.successful = 0
+        self.failed = 0
+        self.strategies = {}
+
+    def add(self, result: dict):
+        if result["status"] == "failed":
+            self.failed += 1
+            return
+        self.successful += 1
+        strategy = result["generation_strategy"]
+        self.strategies[strategy] = self.strategies.get(strategy, 0) + 1
+
+async def _batch_results(indexed, style, sender_name, deadline, chunk_size: int):
+    """
+    Classifica e gera as sugestões em blocos de chunk_size emails, entregando
+    os resultados de cada bloco assim que ficam prontos. Falhas ficam
+    isoladas por item.
+    """
+    for start in range(0, len(indexed), max(1, chunk_size)):
+        chunk = indexed[start:start + max(1, chunk_size)]
+        texts = [email for _, email in chunk]
+
+        # Classificação e geração em lote
+        analyzed = await _run_blocking(inference_executor, analyze_emails, texts, style, sender_name, deadline)
+
+        for (i, email), outcome in zip(chunk, analyzed):
+            result = {"index": i, "email_preview": email[:50] + "..." if len(email) > 50 else email}
+            if outcome["status"] == "failed":
+                logger.error(f"Erro ao analisar email {i}: {outcome['error']}")
+                yield {**result, **outcome}
+                continue
+            yield {**result, **outcome, "style": style, "sender_name": sender_name}
+
+async def _batch_events(indexed, total, style, sender_name, deadline):
+    started = time.perf_counter()
+    first_result = None
+    summary = _BatchSummary()
+    async for result in _batch_results(indexed, style, sender_name, deadline, settings.GENERATOR_BATCH_SIZE):
+        if first_result is None:
+            first_result = time.perf_counter() - started
+        summary.add(result)
+        yield "result", result
+    yield "summary", {
+        "total": total,
+        "successful": summary.successful,
+        "failed": summary.failed,
+        "processing_time_seconds": round(time.perf_counter() - started, 2),
+        "first_result_seconds": round(first_result, 3) if first_result is not None else None,
+        "style_used": style,
+        "sender_name": sender_name,
+        "generation_strategies": summary.strategies
+    }
+
+@router.post("/jobs", status_code=status.HTTP_202_ACCEPTED, summary="Cria um job de análise em lote")
+async def create_batch_job(
+    emails: List[str] = Form([]),
+    file: Optional[UploadFile] = File(None),
+    style: Optional[str] = Form("padrao"),
+    sender_name: Optional[str] = Form(None)
+):
+    """
+    Aceita um lote grande para processamento em segundo plano e retorna o
+    job_id na hora. O estado fica em SQLite e sobrevive a reinícios.
+    - **emails**: Textos dos emails (campo repetido)
+    - **file**: Arquivo .jsonl, uma linha por email: string JSON ou {"text": ..., "id": ...}
+    - **style**: Estilo da resposta (padrao, formal, informal, detalhada, objetiva)
+    - **sender_name**: Nome do remetente para personalização
+    """
+    if file and file.filename:
+        try:
+            items, skipped = await read_jsonl_upload(
+                file, settings.JOBS_MAX_UPLOAD_BYTES, settings.UPLOAD_CHUNK_SIZE, settings.JOBS_MAX_ITEMS
+            )
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    else:
+        # Emails vazios são ignorados, como no /batch-analyze
+        texts = emails
+        items = [(email, None) for email in texts if email.strip()]
+        skipped = len(texts) - len(items)
+        if len(items) > settings.JOBS_MAX_ITEMS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Máximo de {settings.JOBS_MAX_ITEMS} emails por job."
+            )
+
+    if not items:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Nenhum email foi enviado.")
+
+    try:
+        job = await _run_blocking(io_executor, job_queue.submit, items, style, sender_name)
+    except JobQueueFull as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "30"}
+        )
+    logger.info(f"Job {job['job_id']} aceito com {len(items)} emails")
+    return {"job": job, "skipped": skipped}
+
+async def _get_job_or_404(job_id: str) -> dict:
+    job = await _run_blocking(io_executor, job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job não encontrado.")
+    return job
+
+@router.get("/jobs/{job_id}", summary="Estado e progresso de um job")
+async def get_batch_job(job_id: str):
+    return {"job": await _get_job_or_404(job_id)}
+
+@router.get("/jobs/{job_id}/results", summary="Resultados parciais ou finais de um job")
+async def get_batch_job_results(job_id: str, cursor: int = 0, limit: int = 100):
+    """
+    Resultados na ordem em que ficaram prontos. Para buscar só os novos,
+    repita a chamada com o cursor retornado.
+    """
+    if not 1 <= limit <= 1000:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="limit deve estar entre 1 e 1000.")
+    job = await _get_job_or_404(job_id)
+    results, next_cursor = await _run_blocking(io_executor, job_queue.results, job_id, cursor, limit)
+    return {"job": job, "results": results, "cursor": next_cursor}
+
+@router.get("/jobs/{job_id}/events", summary="Acompanha um job em streaming")
+async def stream_batch_job(job_id: str, stream: Optional[str] = None, accept: Optional[str] = Header(None)):
+    """
+    Envia eventos "result" conforme os itens ficam prontos, "progress" quando
+    o contador muda e um "summary" final quando o job termina.
+    - **stream**: ndjson (padrão) ou sse (ou cabeçalho Accept)
+    """
+    fmt = stream_format(stream, accept) or "ndjson"
+    await _get_job_or_404(job_id)
+    return await streaming_response(_job_events(job_id), fmt)
+
+async def _job_events(job_id: str):
+    cursor = 0
+    last_processed = None
+    page = 500
+    while True:
+        job = await _run_blocking(io_executor, job_queue.get, job_id)
+        results, cursor = await _run_blocking(io_executor, job_queue.results, job_id, cursor, page)
+        for result in results:
+            yield "result", result
+        if job["processed"] != last_processed:
+            last_processed = job["processed"]
+            yield "progress", job
+        if len(results) == page:
+            continue
+        if job["status"] in FINISHED_STATUSES:
+            yield "summary", job
+            return
+        await asyncio.sleep(settings.JOBS_STREAM_POLL_SECONDS)
+
+@router.delete("/jobs/{job_id}", summary="Cancela um job")
+async def cancel_batch_job(job_id: str):
+    """
+    Cancela os itens ainda pendentes; os resultados já prontos continuam disponíveis.
+    """
+    await _get_job_or_404(job_id)
+    cancelled = await _run_blocking(io_executor, job_queue.cancel, job_id)
+    if not cancelled:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="O job já terminou.")
+    return {"job": await _get_job_or_404(job_id)}
+
 @router.get("/health", summary="Verifica a saúde da API")
 async def health_check():
     """
     Endpoint de verificação de saúde da API.
+    Responde sempre (liveness), mas indica 'degraded' se algum modelo falhou ao carregar.
     """
+    model_status = get_model_status()
+    failed = [name for name, model in model_status["models"].items() if model["state"] == "failed"]
     return {
-        "status": "ok",
+        "status": "degraded" if failed else "ok",
         "timestamp": datetime.now().isoformat(),
         "service": "Email Analysis API",
-        "version": "1.0.0"
+        "version": "1.0.0",
+        "models_ready": model_status["ready"],
+        "failed_models": failed
+    }
+
+@router.get("/ready", summary="Verifica se os modelos estão carregados e aquecidos")
+async def readiness_check(response: Response):
+    """
+    Endpoint de prontidão: retorna 503 até que todos os modelos estejam
+    carregados e aquecidos, para que o orquestrador só envie tráfego a
+    workers prontos. No modo lazy, a primeira consulta inicia a carga em
+    segundo plano (em vez de esperar a primeira requisição de inferência,
+    que nunca chegaria a um worker fora do balanceamento).
+    """
+    if settings.MODEL_LOADING == "lazy":
+        start_background_loading()
+    model_status = get_model_status()
+    if not model_status["ready"]:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {
+        "status": "ready" if model_status["ready"] else "not_ready",
+        "timestamp": datetime.now().isoformat(),
+        **model_status
     }
 
-@router.get("/stats", summary="Estatísticas da API")
-async def get_stats():
+@router.get("/stats", summary="Estatísticas e métricas da API")
+async def get_stats(
+    output_format: Optional[str] = Query(None, alias="format"),
+    accept: Optional[str] = Header(None)
+):
     """
-    Retorna estatísticas básicas da API (implementação futura).
+    Métricas do processo (latência por etapa e por endpoint, contadores e
+    medidores) e estatísticas de cada componente.
+    - **format**: json (padrão) ou prometheus (formato texto de exposição).
+      Sem format, um Accept com text/plain ou OpenMetrics (o que o
+      Prometheus envia) recebe o formato texto.
+    """
+    if output_format is None:
+        wants_text = accept and ("text/plain" in accept or "openmetrics" in accept)
+        output_format = "prometheus" if wants_text else "json"
+    if output_format not in ("json", "prometheus"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="format deve ser json ou prometheus."
+        )
+    # Medidores e estatísticas consultam SQLite e locks de outros componentes
+    if output_format == "prometheus":
+        text = await _run_blocking(io_executor, metrics.render_prometheus)
+        return Response(text, media_type=PROMETHEUS_CONTENT_TYPE)
+    return await _run_blocking(io_executor, _collect_stats)
+
+
+def _collect_stats() -> dict:
+    """
+    Monta a resposta JSON do /stats. Bloqueante: roda no executor de I/O.
     """
     return {
-        "message": "Estatísticas em desenvolvimento",
+        "metrics": metrics.snapshot(),
+        "classifier_batching": get_batching_stats(),
+        "cache": get_cache_stats(),
+        "cascade": get_cascade_stats(),
+        "generation": get_generation_stats(),
+        "templates": get_template_stats(),
+        "gmail_clients": get_gmail_client_stats(),
+        "imap_pool": imap_pool.stats(),
+        "mailbox_watcher": mailbox_watcher.stats(),
+        "jobs": job_queue.stats(),
+        "executors": {
+            "inference": inference_executor.stats(),
+            "io": io_executor.stats(),
+            "pdf": pdf_executor.stats()
+        },
         "available_endpoints": [
             "/analyze",
+            "/analyze/full",
             "/batch-analyze", 
             "/categories",
             "/health",
-            "/stats"
+            "/ready",
+            "/stats",
+            "/watch/accounts",
+            "/jobs"
         ]
     }
     
@@ -246,76 +738,284 @@ async def auto_analyze_emails(
     password: str = Form(...),
     imap_server: str = Form("imap.gmail.com"),
     max_emails: int = Form(5),
-    style: Optional[str] = Form("padrao")
+    style: Optional[str] = Form("padrao"),
+    latency_budget_ms: Optional[float] = Form(None),
+    stream: Optional[str] = Form(None),
+    x_latency_budget_ms: Optional[float] = Header(None),
+    accept: Optional[str] = Header(None)
 ):
     """
     Lê emails não lidos da caixa de entrada e analisa automaticamente.
     - **style**: Estilo da resposta (padrao, formal, informal, detalhada, objetiva)
+    - **latency_budget_ms**: Orçamento de latência da requisição inteira (ou cabeçalho X-Latency-Budget-Ms)
+    - **stream**: ndjson ou sse para receber cada email assim que é analisado,
+      seguido de um evento "summary" (ou cabeçalho Accept)
     """
+    deadline = _request_deadline(latency_budget_ms, x_latency_budget_ms)
+    fmt = stream_format(stream, accept)
     try:
-        emails = fetch_unread_emails(email_address, password, imap_server, max_emails)
+        if fmt:
+            return await streaming_response(
+                _auto_analyze_events(email_address, password, imap_server, max_emails, style, deadline), fmt
+            )
+        emails = await _run_blocking(io_executor, fetch_unread_emails, email_address, password, imap_server, max_emails)
         results = []
         for email in emails:
-            text = f"{email['subject']}\n\n{email['body']}"
-            category = classify_email(text)
-            suggestion = suggest_response(text, category, style)
-            results.append({
-                "subject": email['subject'],
-                "from": email['from'],
-                "category": category.capitalize(),
-                "suggestion": suggestion,
-                "style": style,
-                "body_preview": email['body'][:100] + "..." if len(email['body']) > 100 else email['body']
-            })
+            results.append(await _analyze_fetched_email(email, style, deadline))
         return {"results": results, "total": len(results), "style_used": style}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao ler emails: {str(e)}")
 
+async def _analyze_fetched_email(email: dict, style: str, deadline) -> dict:
+    text = f"{email['subject']}\n\n{email['body']}"
+    category = await _run_blocking(inference_executor, classify_email, text)
+    suggestion = await _run_blocking(
+        inference_executor, generate_suggestion, text, category, style, None, deadline
+    )
+    return {
+        "subject": email['subject'],
+        "from": email['from'],
+        "category": category.capitalize(),
+        "suggestion": suggestion.text,
+        "generation_strategy": suggestion.strategy,
+        "style": style,
+        "body_preview": email['body'][:100] + "..." if len(email['body']) > 100 else email['body']
+    }
+
+async def _auto_analyze_events(email_address, password, imap_server, max_emails, style, deadline):
+    """
+    Pipeline do modo streaming: os emails chegam do IMAP em blocos e cada um
+    é classificado e enviado assim que fica pronto; nada é acumulado.
+    """
+    started = time.perf_counter()
+    first_result = None
+    total = failed = 0
+    emails = _iterate_blocking(io_executor, iter_unread_emails, email_address, password, imap_server, max_emails)
+    async for email in emails:
+        index = total
+        total += 1
+        try:
+            result = await _analyze_fetched_email(email, style, deadline)
+        except HTTPException as e:
+            failed += 1
+            yield "error", {"index": index, "subject": email['subject'], "detail": e.detail, "status_code": e.status_code}
+            continue
+        if first_result is None:
+            first_result = time.perf_counter() - started
+        yield "result", {"index": index, **result}
+    yield "summary", {
+        "total": total,
+        "successful": total - failed,
+        "failed": failed,
+        "style_used": style,
+        "processing_time_seconds": round(time.perf_counter() - started, 2),
+        "first_result_seconds": round(first_result, 3) if first_result is not None else None
+    }
+
 @router.post("/gmail-auto-analyze")
 async def gmail_auto_analyze(
     access_token: str = Form(...),
     max_results: int = Form(10),
-    style: Optional[str] = Form("padrao")
+    style: Optional[str] = Form("padrao"),
+    incremental: bool = Form(False),
+    stream: Optional[str] = Form(None),
+    accept: Optional[str] = Header(None)
 ):
     """
     Recebe o token do Google e retorna os últimos emails da caixa de entrada,
     classificados como Produtivo ou Improdutivo.
     - **style**: Estilo da resposta (padrao, formal, informal, detalhada, objetiva)
+    - **incremental**: Busca e classifica só os emails novos desde a última chamada (historyId)
+    - **stream**: ndjson ou sse para receber cada email assim que é analisado,
+      seguido de um evento "summary" (ou cabeçalho Accept); não combina com incremental
     """
+    fmt = stream_format(stream, accept)
+    if fmt and incremental:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="O modo streaming não suporta a sincronização incremental."
+        )
     try:
-        emails = fetch_latest_emails(access_token, max_results)
-        return {"results": emails, "total": len(emails), "style_used": style}
+        if fmt:
+            return await streaming_response(_gmail_analyze_events(access_token, max_results, style), fmt)
+        # Rede e SQLite no executor de I/O; classificação e geração no de inferência
+        if incremental:
+            pending = await _run_blocking(io_executor, prepare_sync, access_token, max_results)
+            parsed = [message["parsed"] for message in pending.new_messages]
+            analyzed = await _run_blocking(inference_executor, analyze_parsed_emails, parsed)
+            emails, metadata = await _run_blocking(io_executor, complete_sync, pending, analyzed)
+        else:
+            parsed, metadata = await _run_blocking(io_executor, fetch_latest_parsed_emails, access_token, max_results)
+            emails = await _run_blocking(inference_executor, analyze_parsed_emails, parsed)
+        return {"results": emails, "total": len(emails), "style_used": style, "metadata": metadata}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao buscar emails: {str(e)}")
-    
-    
+
+async def _gmail_analyze_events(access_token, max_results, style):
+    started = time.perf_counter()
+    first_result = None
+    total = failed = 0
+    calls = {}
+    messages = _iterate_blocking(io_executor, iter_latest_emails, access_token, max_results, calls)
+    async for parsed in messages:
+        index = total
+        total += 1
+        try:
+            result = await _run_blocking(inference_executor, analyze_parsed_email, parsed)
+        except HTTPException as e:
+            failed += 1
+            yield "error", {"index": index, "subject": parsed['subject'], "detail": e.detail, "status_code": e.status_code}
+            continue
+        if first_result is None:
+            first_result = time.perf_counter() - started
+        yield "result", {"index": index, **result}
+    yield "summary", {
+        "total": total,
+        "successful": total - failed,
+        "failed": failed,
+        "style_used": style,
+        "processing_time_seconds": round(time.perf_counter() - started, 2),
+        "first_result_seconds": round(first_result, 3) if first_result is not None else None,
+        "metadata": dict(calls)
+    }
+
+@router.post("/watch/accounts", summary="Monitora uma caixa de entrada via IMAP IDLE")
+async def watch_account(
+    email_address: str = Form(...),
+    password: str = Form(...),
+    imap_server: str = Form("imap.gmail.com"),
+    style: Optional[str] = Form("padrao"),
+    backfill: Optional[int] = Form(None)
+):
+    """
+    Registra a conta para monitoramento contínuo: os emails novos são
+    classificados em segundo plano assim que chegam e ficam disponíveis em
+    /watch/accounts/{account_id}/emails, sem precisar chamar /auto-analyze.
+    - **backfill**: Quantos emails não lidos já existentes classificar ao registrar (padrão IMAP_WATCH_BACKFILL)
+
+    As credenciais são conferidas antes (401 se recusadas). A resposta traz
+    o watch_token, exigido no cabeçalho X-Watch-Token para ler os emails e
+    parar o monitoramento; ele não é mostrado de novo.
+    """
+    try:
+        account = await _run_blocking(io_executor, mailbox_watcher.register, email_address, password, imap_server, style, backfill)
+    except WatcherLimitReached as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except LoginError:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Login IMAP recusado.")
+    except (IMAPClientError, OSError) as e:
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=f"Erro ao conectar ao servidor IMAP: {str(e)}")
+    return {"account": account}
+
+def _authorize_watch(account_id: str, watch_token: Optional[str]):
+    """
+    Exige o watch_token da conta; conta desconhecida e token errado dão o
+    mesmo 404, para não revelar quais endereços são monitorados.
+    """
+    if not watch_token:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Cabeçalho X-Watch-Token ausente.")
+    if not mailbox_watcher.authorize(account_id, watch_token):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Conta não monitorada ou token inválido.")
+
+@router.get("/watch/accounts", summary="Lista as caixas monitoradas (administração)")
+async def list_watched_accounts(x_admin_token: Optional[str] = Header(None)):
+    """
+    Lista todas as contas monitoradas. Exige o cabeçalho X-Admin-Token igual
+    a IMAP_WATCH_ADMIN_TOKEN (sem ele configurado, a listagem fica desativada).
+    """
+    admin_token = settings.IMAP_WATCH_ADMIN_TOKEN
+    if not admin_token or not x_admin_token or not hmac.compare_digest(x_admin_token.encode(), admin_token.encode()):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Token de administrador inválido.")
+    return {"accounts": mailbox_watcher.accounts(), "stats": mailbox_watcher.stats()}
+
+@router.delete("/watch/accounts/{account_id}", summary="Para de monitorar uma caixa")
+async def unwatch_account(account_id: str, x_watch_token: Optional[str] = Header(None)):
+    _authorize_watch(account_id, x_watch_token)
+    if not mailbox_watcher.unregister(account_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Conta não monitorada ou token inválido.")
+    return {"account_id": account_id, "status": "stopped"}
+
+@router.get("/watch/accounts/{account_id}/emails", summary="Emails classificados de uma caixa monitorada")
+async def watched_account_emails(
+    account_id: str,
+    limit: int = 50,
+    since: Optional[float] = None,
+    category: Optional[str] = None,
+    x_watch_token: Optional[str] = Header(None)
+):
+    """
+    Retorna os emails já classificados da conta, do mais recente para o mais antigo.
+    - **since**: Só os classificados depois deste timestamp Unix (para consultas incrementais)
+    - **category**: Filtra por categoria (Produtivo ou Improdutivo)
+    - Cabeçalho **X-Watch-Token**: token devolvido no registro da conta
+    """
+    _authorize_watch(account_id, x_watch_token)
+    if not 1 <= limit <= settings.IMAP_WATCH_MAX_STORED:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"limit deve estar entre 1 e {settings.IMAP_WATCH_MAX_STORED}."
+        )
+    results = await _run_blocking(io_executor, mailbox_watcher.results, account_id, limit, since, category)
+    return {
+        "account": mailbox_watcher.account(account_id),
+        "results": results,
+        "total": len(results)
+    }
 
 @router.post("/gmail-auto-reply")
 async def gmail_auto_reply(
     access_token: str = Form(...),
-    replies: str = Form(...)
+    replies: str = Form(...),
+    stream: Optional[str] = Form(None),
+    accept: Optional[str] = Header(None)
 ):
     """
     Recebe o token e uma lista de respostas automáticas para enviar.
-    replies: JSON string [{"to_email", "subject", "body", "thread_id"}]
+    replies: JSON string [{"to_email", "subject", "body", "thread_id", "idempotency_key"}]
+
+    Os envios são concorrentes, limitados por conta e repetidos em erros
+    temporários; a mesma resposta não é enviada duas vezes enquanto a chave
+    vale (idempotency_key: GMAIL_REPLY_KEY_TTL_SECONDS; mesmo conteúdo sem
+    chave: GMAIL_REPLY_CONTENT_DEDUPE_SECONDS). Cada resultado traz
+    tentativas e latência.
+    - **stream**: ndjson ou sse para receber cada resultado assim que o envio termina (ou cabeçalho Accept)
     """
     import json
     try:
         replies_list = json.loads(replies)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Formato de replies inválido: {str(e)}")
+    if not isinstance(replies_list, list) or not all(isinstance(reply, dict) for reply in replies_list):
+        raise HTTPException(status_code=400, detail="Formato de replies inválido: esperada uma lista de objetos")
+    if len(replies_list) > settings.GMAIL_REPLY_MAX_PER_REQUEST:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Máximo de {settings.GMAIL_REPLY_MAX_PER_REQUEST} respostas por requisição."
+        )
+    fmt = stream_format(stream, accept)
+
+    try:
+        if fmt:
+            return await streaming_response(_reply_events(access_token, replies_list), fmt)
+        started = time.perf_counter()
+        results = [
+            result async for result in _iterate_blocking(io_executor, iter_dispatch_replies, access_token, replies_list)
+        ]
+        results.sort(key=lambda result: result["index"])
+        return {"results": results, "summary": summarize_dispatch(results, time.perf_counter() - started)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao enviar respostas: {str(e)}")
 
+async def _reply_events(access_token: str, replies_list: list):
+    started = time.perf_counter()
     results = []
-    for reply in replies_list:
-        try:
-            sent = send_gmail_reply(
-                access_token,
-                reply['to_email'],
-                reply['subject'],
-                reply['body'],
-                reply.get('thread_id')
-            )
-            results.append({"to": reply['to_email'], "status": "sent", "id": sent.get('id')})
-        except Exception as e:
-            results.append({"to": reply['to_email'], "status": "error", "error": str(e)})
-    return {"results": results}
\ No newline at end of file
+    async for result in _iterate_blocking(io_executor, iter_dispatch_replies, access_token, replies_list):
+        results.append(result)
+        yield "result", result
+    yield "summary", summarize_dispatch(results, time.perf_counter() - started)
@@ -0,0 +1,86 @@
+import json
+import logging
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+from fastapi.responses import StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+# Formatos de streaming aceitos e o content-type de cada um
+STREAM_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream"
+}
+
+# Um evento é um par (tipo, dados): "result", "error" ou "summary"
+Event = Tuple[str, Dict]
+
+
+def stream_format(requested: Optional[str], accept: Optional[str]) -> Optional[str]:
+    """
+    Formato de streaming da requisição: o campo stream (ndjson ou sse) tem
+    precedência sobre o cabeçalho Accept. Retorna None para a resposta JSON
+    completa de sempre.
+    """
+    if requested:
+        fmt = requested.strip().lower()
+        if fmt not in STREAM_FORMATS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"stream deve ser um de: {', '.join(STREAM_FORMATS)}."
+            )
+        return fmt
+    accepted = (accept or "").lower()
+    for fmt, media_type in STREAM_FORMATS.items():
+        if media_type in accepted:
+            return fmt
+    return None
+
+
+def encode_event(fmt: str, event_type: str, data: Dict) -> bytes:
+    """
+    NDJSON: uma linha JSON por evento, com o tipo no campo "type".
+    SSE: "event: <tipo>" seguido de "data: <json>".
+    """
+    if fmt == "sse":
+        return f"event: {event_type}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode()
+    return (json.dumps({"type": event_type, **data}, ensure_ascii=False) + "\n").encode()
+
+
+async def streaming_response(events: AsyncIterator[Event], fmt: str) -> StreamingResponse:
+    """
+    Envolve o pipeline de eventos em uma StreamingResponse.
+
+    O primeiro evento é aguardado antes de enviar os cabeçalhos: erros logo
+    na partida (login, fila cheia, token inválido) ainda viram o status HTTP
+    adequado. Depois disso, falhas viram um evento "error" final.
+    """
+    try:
+        first = await events.__anext__()
+    except StopAsyncIteration:
+        first = None
+    except BaseException:
+        await events.aclose()
+        raise
+
+    async def body():
+        try:
+            if first is not None:
+                yield encode_event(fmt, *first)
+                async for event_type, data in events:
+                    yield encode_event(fmt, event_type, data)
+        except HTTPException as e:
+            yield encode_event(fmt, "error", {"detail": e.detail, "status_code": e.status_code})
+        except Exception as e:
+            logger.error(f"Streaming interrompido: {str(e)}")
+            yield encode_event(fmt, "error", {"detail": str(e), "status_code": 500})
+        finally:
+            await events.aclose()
+
+    return StreamingResponse(
+        body(),
+        media_type=STREAM_FORMATS[fmt],
+        # Evita que proxies acumulem a resposta antes de repassar
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -8,4 +9,132 @@ class Settings(BaseSettings):
     API_V1_STR: str = "/api/v1"
     CORS_ORIGINS: list[str] = ["*"]  # Em produção, restrinja para o domínio do seu frontend
 
-settings = Settings()
\ No newline at end of file
+    # Carga dos modelos: eager (bloqueia o startup), background ou lazy (primeira inferência ou /ready)
+    MODEL_LOADING: str = "background"
+    MODEL_WARMUP: bool = True  # Inferência fictícia após a carga
+    INFERENCE_BACKEND: str = "fp32"  # fp32, int8 (quantização dinâmica) ou onnx
+
+    # Classificador: nli (zero-shot bart-large-mnli) ou embedding (encoder + cabeça)
+    CLASSIFIER_MODE: str = "nli"
+    EMBEDDING_HEAD_PATH: Optional[str] = None  # Artefato .npz gerado pelo treino
+
+    # Cascata: palavras-chave decidem sozinhas acima do limiar de confiança
+    CASCADE_ENABLED: bool = False
+    CASCADE_CONFIDENCE_THRESHOLD: float = 0.85
+
+    # Orçamento de tokens por modelo (corte início + fim do email)
+    CLASSIFIER_MAX_INPUT_TOKENS: int = 384
+    GENERATOR_MAX_INPUT_TOKENS: int = 384  # Prompt completo, incluindo as instruções
+
+    # Documentos longos: janelas de CLASSIFIER_MAX_INPUT_TOKENS tokens
+    LONG_DOCUMENT_OVERLAP_TOKENS: int = 64
+    LONG_DOCUMENT_MAX_WINDOWS: int = 64
+    LONG_DOCUMENT_AGGREGATION: str = "max"  # max, mean ou weighted
+    LONG_DOCUMENT_EARLY_EXIT_CONFIDENCE: float = 0.9
+
+    # Micro-batching do classificador zero-shot
+    CLASSIFIER_BATCHING_ENABLED: bool = True
+    CLASSIFIER_BATCH_MAX_SIZE: int = 8  # Tamanho máximo do lote enviado ao modelo
+    CLASSIFIER_BATCH_WAIT_MS: float = 10.0  # Janela de coleta de requisições concorrentes
+
+    # Análise em lote (/batch-analyze)
+    BATCH_MAX_EMAILS: int = 200  # Limite de emails por requisição
+    GENERATOR_BATCH_SIZE: int = 8  # Prompts por chamada ao gerador
+
+    # Geração com prazo: orçamento de latência por requisição (ms)
+    GENERATION_DEFAULT_BUDGET_MS: Optional[float] = None  # Sem prazo quando não informado
+    GENERATION_LATENCY_SAFETY: float = 1.2  # Folga aplicada à latência estimada
+
+    # Catálogo de templates de resposta (JSON recarregado quando o arquivo muda)
+    RESPONSE_TEMPLATES_PATH: Optional[str] = None  # Padrão: src/data/response_templates.json
+    TEMPLATE_SELECTION: str = "random"  # random ou hash (mesmo email, mesmo template)
+    TEMPLATE_RELOAD_CHECK_SECONDS: float = 2.0
+
+    # Cache de resultados (classificação e sugestão)
+    CACHE_ENABLED: bool = True
+    CACHE_MAX_ENTRIES: int = 2048
+    CACHE_TTL_SECONDS: float = 3600.0
+    CACHE_SQLITE_PATH: Optional[str] = None  # Ex.: "cache.db" para persistir entre reinícios
+
+    # Executor de inferência fora do event loop
+    INFERENCE_EXECUTOR_KIND: str = "thread"  # thread ou process (cada processo carrega os modelos ao iniciar)
+    INFERENCE_MAX_WORKERS: int = 2
+    INFERENCE_MAX_QUEUE: int = 32  # Tarefas aguardando além das em execução
+    INFERENCE_TIMEOUT_SECONDS: float = 60.0
+
+    # Gmail API
+    GMAIL_BATCH_SIZE: int = 50  # Requisições por batch HTTP (a API aceita até 100)
+    GMAIL_STREAM_CHUNK_SIZE: int = 10  # Mensagens por batch no modo streaming
+    GMAIL_CLIENT_CACHE_MAX_ENTRIES: int = 64  # Clientes (token x thread) mantidos em memória
+    GMAIL_CLIENT_CACHE_TTL_SECONDS: float = 600.0
+    GMAIL_HTTP_TIMEOUT_SECONDS: float = 30.0
+    GMAIL_API_ENDPOINT: Optional[str] = None  # Substitui https://gmail.googleapis.com/ (testes locais)
+    GMAIL_SYNC_DB_PATH: str = "gmail_sync.db"  # Cursor historyId e emails classificados por conta
+    GMAIL_SYNC_MAX_STORED: int = 500  # Emails mantidos por conta
+
+    # Envio de respostas (/gmail-auto-reply)
+    GMAIL_REPLY_CONCURRENCY: int = 4  # Envios simultâneos (pool compartilhado)
+    GMAIL_REPLY_RATE_PER_SECOND: float = 2.5  # Por conta: messages.send custa 100 das 250 unidades/s
+    GMAIL_REPLY_BURST: float = 5.0
+    GMAIL_REPLY_MAX_ATTEMPTS: int = 5
+    GMAIL_REPLY_BACKOFF_BASE_SECONDS: float = 0.5
+    GMAIL_REPLY_BACKOFF_MAX_SECONDS: float = 30.0
+    GMAIL_REPLY_MAX_PER_REQUEST: int = 500
+    GMAIL_REPLY_LEDGER_PATH: str = "gmail_replies.db"  # Chaves de idempotência das respostas enviadas
+    GMAIL_REPLY_CLAIM_TTL_SECONDS: float = 300.0  # Reserva de envio considerada abandonada depois disso
+    GMAIL_REPLY_KEY_TTL_SECONDS: float = 86400.0  # Validade de uma idempotency_key informada pelo cliente
+    GMAIL_REPLY_CONTENT_DEDUPE_SECONDS: float = 600.0  # Validade da chave derivada do conteúdo
+
+    # IMAP
+    IMAP_BODY_MAX_BYTES: int = 16384  # Bytes lidos da parte de texto de cada email
+    IMAP_POOL_SIZE: int = 2  # Conexões autenticadas ociosas mantidas por conta
+    IMAP_POOL_IDLE_SECONDS: float = 300.0
+    IMAP_TIMEOUT_SECONDS: float = 30.0
+    IMAP_STREAM_CHUNK_SIZE: int = 10  # UIDs por FETCH no modo streaming
+
+    # Monitoramento IMAP (IDLE)
+    IMAP_WATCH_DB_PATH: str = "mailbox_watch.db"
+    IMAP_WATCH_MAX_STORED: int = 500  # Emails classificados mantidos por conta
+    IMAP_WATCH_MAX_ACCOUNTS: int = 20
+    IMAP_WATCH_QUEUE_SIZE: int = 256  # Emails aguardando classificação
+    IMAP_WATCH_WORKERS: int = 1
+    IMAP_WATCH_BACKFILL: int = 10  # Não lidos já existentes classificados ao registrar
+    IMAP_IDLE_REFRESH_SECONDS: float = 540.0  # Renova o IDLE antes do limite de ~29min dos servidores
+    IMAP_WATCH_POLL_SECONDS: float = 60.0  # Servidores sem IDLE
+    IMAP_WATCH_MAX_BACKOFF_SECONDS: float = 60.0
+    IMAP_WATCH_ADMIN_TOKEN: Optional[str] = None  # Libera GET /watch/accounts (X-Admin-Token)
+
+    # Executor para IMAP/Gmail
+    IO_MAX_WORKERS: int = 8
+    IO_MAX_QUEUE: int = 64
+    IO_TIMEOUT_SECONDS: float = 120.0
+
+    # Upload de arquivos (/analyze)
+    UPLOAD_MAX_BYTES: int = 10 * 1024 * 1024
+    UPLOAD_CHUNK_SIZE: int = 64 * 1024
+    UPLOAD_MAX_TEXT_CHARS: int = 100_000  # Além disso as janelas do classificador já não alcançam
+    PDF_MAX_PAGES: int = 50
+    PDF_MAX_WORKERS: int = 2  # Processos de extração de PDF
+    PDF_MAX_QUEUE: int = 8
+    PDF_TIMEOUT_SECONDS: float = 30.0
+
+    # Jobs de análise em lote (fila em SQLite)
+    JOBS_DB_PATH: str = "jobs.db"
+    JOBS_WORKERS: int = 1
+    JOBS_MAX_ITEMS: int = 20000  # Itens por job
+    JOBS_MAX_PENDING_ITEMS: int = 100000  # Acima disso novos jobs são recusados
+    JOBS_MAX_UPLOAD_BYTES: int = 50 * 1024 * 1024  # Arquivo JSONL
+    JOBS_IDLE_POLL_SECONDS: float = 2.0
+    JOBS_STREAM_POLL_SECONDS: float = 0.5  # Intervalo do /jobs/{id}/events
+
+    # Métricas do /stats (histogramas por etapa, contadores e medidores)
+    METRICS_ENABLED: bool = True
+
+    # Profiling sob demanda (cabeçalho X-Profile-Token ou amostragem)
+    PROFILING_ADMIN_TOKEN: Optional[str] = None  # Sem token o cabeçalho é recusado
+    PROFILING_SAMPLE_RATE: float = 0.0  # Fração das requisições perfiladas sem cabeçalho
+    PROFILING_DIR: str = "profiles"
+    PROFILING_TORCH: bool = True  # Profiler de operadores do torch nas etapas de inferência
+    PROFILING_MAX_PROFILES: int = 100  # Os mais antigos são removidos
+
+settings = Settings()
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 
 class AnalysisResponse(BaseModel):
@@ -22,4 +22,36 @@ class AnalysisResponse(BaseModel):
                     "file_info": None
                 }
             }
-        }
\ No newline at end of file
+        }
+
+class FullAnalysisResponse(BaseModel):
+    """
+    Esquema de resposta da análise completa (categoria, insights e sugestão).
+    """
+    category: str
+    confidence: float
+    scores: Dict[str, float]
+    keywords: List[str]
+    urgency: str
+    tone: str
+    suggestion: Optional[str] = None
+    metadata: Optional[Dict[str, Any]] = None
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "category": "Produtivo",
+                "confidence": 0.91,
+                "scores": {"produtivo": 0.91, "improdutivo": 0.09},
+                "keywords": ["reunião", "projeto"],
+                "urgency": "alta",
+                "tone": "urgente",
+                "suggestion": "Prezado(a), recebemos sua solicitação e ela já está sendo analisada por nossa equipe.",
+                "metadata": {
+                    "processing_time_seconds": 0.84,
+                    "classifier": "model",
+                    "suggestion_source": "generator",
+                    "cache": {"category": False, "suggestion": False}
+                }
+            }
+        }
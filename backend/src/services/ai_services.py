@@ -1,204 +1,597 @@
-from transformers import pipeline
 import torch
+import json
 import os
-import random
-from typing import Dict
-
-print("Carregando o modelo de IA... Este processo pode levar alguns minutos na primeira execução.")
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, NamedTuple, Tuple, Union
+from src.core.config import settings
+from src.services import keyword_matcher, profiling
+from src.services.keyword_matcher import KeywordScore
+from src.services.metrics import metrics
+from src.services.batching import MicroBatcher
+from src.services.embedding_classifier import EmbeddingClassifier
+from src.services.inference_backends import load_pipeline
+from src.services.response_templates import DEFAULT_TEMPLATES_PATH, TemplateRegistry
+from src.services.result_cache import ResultCache, make_key, normalize_text
+from src.services.text_prep import count_tokens, prepare_for_model, split_windows
 
 # Detecta se há GPU disponível (para Hugging Face Spaces)
 device = 0 if torch.cuda.is_available() else -1
-print(f"Device set to use {'cuda' if device == 0 else 'cpu'} (Hugging Face environment)")
-
-try:
-    # Usa modelos Hugging Face recomendados
-    classifier = pipeline(
-        "zero-shot-classification", 
-        model="facebook/bart-large-mnli", 
-        device=device,
-        model_kwargs={"torch_dtype": torch.float32}
+
+# Modelos Hugging Face usados (também entram na versão das chaves do cache)
+CLASSIFIER_MODEL_NAME = "facebook/bart-large-mnli"
+GENERATOR_MODEL_NAME = "google/flan-t5-small"
+
+# Os modelos são carregados sob demanda (ver load_models) e não na importação
+classifier = None
+generator = None
+
+# Agendador que agrupa classificações de chamadores concorrentes
+classifier_batcher = None
+
+def _build_result_cache() -> ResultCache:
+    return ResultCache(
+        max_entries=settings.CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.CACHE_TTL_SECONDS,
+        sqlite_path=settings.CACHE_SQLITE_PATH,
+        enabled=settings.CACHE_ENABLED
     )
-    
-    generator = pipeline(
-        "text2text-generation", 
-        model="google/flan-t5-small",
-        device=device,
-        model_kwargs={"torch_dtype": torch.float32}
+
+def _build_template_registry() -> TemplateRegistry:
+    return TemplateRegistry(
+        path=settings.RESPONSE_TEMPLATES_PATH or DEFAULT_TEMPLATES_PATH,
+        selection=settings.TEMPLATE_SELECTION,
+        check_interval=settings.TEMPLATE_RELOAD_CHECK_SECONDS
     )
-    
-    print("Modelos carregados com sucesso!")
-except Exception as e:
-    print(f"Erro ao carregar os modelos de IA: {e}")
-    classifier = None
-    generator = None
+
+# Cache de classificações e sugestões endereçado pelo conteúdo do email
+result_cache = _build_result_cache()
+
+# Templates usados quando a geração não está disponível ou não cabe no prazo
+template_registry = _build_template_registry()
+
+_load_lock = threading.Lock()
+_load_started = False
+_model_status = {
+    name: {"state": "not_loaded", "backend": settings.INFERENCE_BACKEND, "load_time_seconds": None, "error": None}
+    for name in ("classifier", "generator")
+}
+_model_status["classifier"]["mode"] = settings.CLASSIFIER_MODE
+_warmup_status = {"state": "pending", "duration_seconds": None, "error": None}
+
+def _load_model(name: str, loader, description: str):
+    """
+    Carrega um modelo registrando estado e tempo de carga em _model_status.
+    """
+    status = _model_status[name]
+    status.update(state="loading", error=None)
+    started = time.perf_counter()
+    try:
+        loaded = loader()
+        status.update(state="loaded", load_time_seconds=round(time.perf_counter() - started, 2))
+        return loaded
+    except Exception as e:
+        print(f"Erro ao carregar o modelo {description}: {e}")
+        status.update(state="failed", load_time_seconds=round(time.perf_counter() - started, 2), error=str(e))
+        return None
+
+def _load_classifier():
+    """
+    Carrega o classificador conforme settings.CLASSIFIER_MODE: 'nli' (zero-shot
+    com bart-large-mnli) ou 'embedding' (encoder pequeno + cabeça treinada).
+    """
+    if settings.CLASSIFIER_MODE == "embedding":
+        return _load_model("classifier", _load_embedding_classifier, settings.EMBEDDING_HEAD_PATH or "embedding")
+    return _load_model(
+        "classifier",
+        lambda: load_pipeline("zero-shot-classification", CLASSIFIER_MODEL_NAME, settings.INFERENCE_BACKEND, device),
+        CLASSIFIER_MODEL_NAME
+    )
+
+def _load_embedding_classifier() -> EmbeddingClassifier:
+    if not settings.EMBEDDING_HEAD_PATH:
+        raise RuntimeError(
+            "CLASSIFIER_MODE=embedding requer EMBEDDING_HEAD_PATH "
+            "(treine com: python -m scripts.train_embedding_head)"
+        )
+    model = EmbeddingClassifier.load(settings.EMBEDDING_HEAD_PATH, device=device)
+    if set(model.head.labels) != set(CLASSIFIER_LABELS):
+        raise RuntimeError(f"Rótulos da cabeça {model.head.labels} diferem de {list(CLASSIFIER_LABELS)}")
+    return model
+
+def load_models(warmup_models: bool = None):
+    """
+    Carrega os modelos de IA uma única vez por processo e, opcionalmente,
+    executa o aquecimento. Chamadas concorrentes aguardam a primeira carga.
+    """
+    global classifier, generator, classifier_batcher, _load_started
+
+    with _load_lock:
+        if _load_started and _model_status["classifier"]["state"] != "loading":
+            return
+        _load_started = True
+
+        print("Carregando o modelo de IA... Este processo pode levar alguns minutos na primeira execução.")
+        print(f"Device set to use {'cuda' if device == 0 else 'cpu'} (Hugging Face environment)")
+
+        # Usa modelos Hugging Face recomendados
+        classifier = _load_classifier()
+        generator = _load_model(
+            "generator",
+            lambda: load_pipeline("text2text-generation", GENERATOR_MODEL_NAME, settings.INFERENCE_BACKEND, device),
+            GENERATOR_MODEL_NAME
+        )
+
+        if classifier is not None and settings.CLASSIFIER_BATCHING_ENABLED:
+            classifier_batcher = MicroBatcher(
+                classify_batch_scores,
+                max_batch_size=settings.CLASSIFIER_BATCH_MAX_SIZE,
+                max_wait_ms=settings.CLASSIFIER_BATCH_WAIT_MS,
+                name="classifier"
+            )
+
+        if classifier is not None and generator is not None:
+            print("Modelos carregados com sucesso!")
+
+    if warmup_models is None:
+        warmup_models = settings.MODEL_WARMUP
+    if warmup_models:
+        warmup()
+
+def warmup():
+    """
+    Executa uma classificação e uma geração fictícias para disparar as
+    alocações feitas apenas na primeira inferência.
+    """
+    _warmup_status.update(state="running", error=None)
+    started = time.perf_counter()
+    try:
+        if classifier is not None:
+            classify_batch(["Podemos marcar uma reunião amanhã para revisar o projeto?"])
+        if generator is not None:
+            generator("Gere uma resposta breve para: Obrigado pelo contato.", max_length=16)
+        _warmup_status.update(state="done", duration_seconds=round(time.perf_counter() - started, 2))
+    except Exception as e:
+        print(f"Erro no aquecimento dos modelos: {e}")
+        _warmup_status.update(state="failed", duration_seconds=round(time.perf_counter() - started, 2), error=str(e))
+
+def start_model_loading():
+    """
+    Inicia a carga dos modelos conforme settings.MODEL_LOADING:
+    'eager' bloqueia até terminar, 'background' carrega em uma thread e
+    'lazy' adia para a primeira requisição (ou o primeiro /ready).
+    """
+    mode = settings.MODEL_LOADING
+    if mode == "eager":
+        load_models()
+    elif mode == "background":
+        start_background_loading()
+
+def start_background_loading():
+    """
+    Carrega os modelos em uma thread, se nenhuma carga foi iniciada neste
+    processo. Usado pelo modo 'background' e pelo /ready no modo 'lazy'.
+    """
+    if _mark_loading():
+        threading.Thread(target=load_models, name="model-loader", daemon=True).start()
+
+def _mark_loading() -> bool:
+    # Marca os modelos como "carregando" antes da thread começar, para que
+    # as requisições usem o fallback em vez de disparar outra carga
+    global _load_started
+    with _load_lock:
+        if _load_started:
+            return False
+        _load_started = True
+        for status in _model_status.values():
+            status["state"] = "loading"
+        return True
+
+def init_worker_process():
+    """
+    Inicializador dos processos do executor de inferência (modo 'process').
+
+    Com fork, o processo herda o estado do pai como estava: no meio de uma
+    carga em segundo plano ficaria com _load_started=True e sem modelos (a
+    thread que os carregaria não existe aqui), e com _load_lock ou o
+    micro-batcher possivelmente travados. Refaz esse estado e carrega os
+    modelos antes da primeira tarefa; modelos já carregados no pai são
+    reaproveitados. O micro-batching fica desligado, pois cada processo
+    atende uma tarefa por vez.
+
+    O cache de resultados e o catálogo de templates também são recriados: a
+    conexão SQLite do pai não pode ser usada depois do fork e os locks deles
+    podem ter sido copiados travados.
+    """
+    global _load_lock, _load_started, classifier_batcher, result_cache, template_registry
+    _load_lock = threading.Lock()
+    classifier_batcher = None
+    result_cache = _build_result_cache()
+    template_registry = _build_template_registry()
+    settings.CLASSIFIER_BATCHING_ENABLED = False
+    if any(status["state"] in ("not_loaded", "loading") for status in _model_status.values()):
+        _load_started = False
+        for status in _model_status.values():
+            status.update(state="not_loaded", error=None)
+        load_models()
+
+def _ensure_models_loaded():
+    """
+    Carrega os modelos na primeira chamada se nenhuma carga foi iniciada neste
+    processo (modo 'lazy').
+    """
+    if not _load_started:
+        load_models()
+
+def get_model_status() -> Dict:
+    """
+    Retorna o estado de carga de cada modelo e do aquecimento.
+    """
+    models = {name: dict(status) for name, status in _model_status.items()}
+    loaded = all(status["state"] == "loaded" for status in models.values())
+    warm = _warmup_status["state"] == "done" or not settings.MODEL_WARMUP
+    return {
+        "ready": loaded and warm,
+        "loading_mode": settings.MODEL_LOADING,
+        "models": models,
+        "warmup": dict(_warmup_status)
+    }
 
 def classify_email(text: str) -> str:
     """
     Classifica o texto do email como 'produtivo' ou 'improdutivo' usando IA.
     Implementação melhorada para maior precisão na classificação.
     """
-    text_lower = text.lower()
-    
-    # Palavras-chave mais específicas e amplas para produtivo
-    productive_indicators = {
-        'trabalho_negocio': ['reunião', 'meeting', 'projeto', 'project', 'negócio', 'business', 'empresa', 'company', 'contrato', 'contract'],
-        'solicitacoes': ['pedido', 'solicitação', 'request', 'orçamento', 'budget', 'proposta', 'proposal', 'cotação'],
-        'urgencia': ['urgente', 'urgent', 'importante', 'important', 'prioridade', 'priority', 'deadline', 'prazo'],
-        'comercial': ['venda', 'sale', 'compra', 'buy', 'cliente', 'customer', 'fornecedor', 'supplier'],
-        'colaboracao': ['colaboração', 'partnership', 'parceria', 'trabalhar juntos', 'work together'],
-        'problemas': ['problema', 'issue', 'erro', 'error', 'bug', 'falha', 'failure', 'suporte', 'support'],
-        'documentos': ['documento', 'document', 'relatório', 'report', 'planilha', 'spreadsheet', 'arquivo', 'file']
-    }
-    
-    # Palavras-chave que indicam email improdutivo
-    unproductive_indicators = {
-        'pessoal': ['parabéns', 'congratulations', 'feliz aniversário', 'happy birthday', 'felicidades'],
-        'social': ['convite', 'invitation', 'festa', 'party', 'evento social', 'social event'],
-        'spam': ['promoção', 'promotion', 'desconto', 'discount', 'oferta especial', 'special offer', 'newsletter'],
-        'casual': ['como vai', 'how are you', 'oi', 'hi', 'olá', 'hello', 'tchau', 'bye'],
-        'agradecimento': ['obrigado', 'thank you', 'thanks', 'agradecimento']
-    }
-    
+    return classify_email_cached(text)[0]
+
+def classify_email_cached(text: str) -> Tuple[str, bool]:
+    """
+    Classifica o email consultando antes o cache de resultados.
+    Retorna a categoria e se ela veio do cache.
+    """
+    classification = classify_email_scored(text)
+    return classification.category, classification.cached
+
+class Classification(NamedTuple):
+    category: str
+    scores: Dict[str, float]
+    cached: bool
+    stage: str  # cache, keywords ou model
+
+def classify_email_scored(text: str, keyword_score: KeywordScore = None) -> Classification:
+    """
+    Classifica o email e retorna também a pontuação de cada categoria e a
+    etapa que decidiu (cache, palavras-chave ou modelo).
+
+    Sem modelo, as pontuações vêm do placar de palavras-chave. Com a cascata
+    ativa, o placar de palavras-chave decide sozinho quando sua confiança
+    passa de CASCADE_CONFIDENCE_THRESHOLD e só os casos ambíguos chegam ao
+    modelo. keyword_score pode ser informado para reaproveitar uma passada já
+    feita sobre o texto.
+    """
+    _ensure_models_loaded()
+    key = _classification_key(text)
+    found, value = result_cache.get("classify", key)
+    if found:
+        _record_classifications("cache", [value["category"]])
+        return Classification(value["category"], value["scores"], True, "cache")
+
     if not classifier:
-        # Contagem de indicadores produtivos
-        productive_score = 0
-        for category, keywords in productive_indicators.items():
-            matches = sum(1 for keyword in keywords if keyword in text_lower)
-            if category in ['urgencia', 'trabalho_negocio', 'solicitacoes']:
-                productive_score += matches * 2  # Peso maior para categorias importantes
-            else:
-                productive_score += matches
-        
-        # Contagem de indicadores improdutivos
-        unproductive_score = 0
-        for category, keywords in unproductive_indicators.items():
-            matches = sum(1 for keyword in keywords if keyword in text_lower)
-            if category == 'spam':
-                unproductive_score += matches * 2  # Peso maior para spam
-            else:
-                unproductive_score += matches
-        
-        # Análise adicional de contexto
-        if len(text.split()) < 5:  # Mensagens muito curtas tendem a ser improdutivas
-            unproductive_score += 1
-        
-        # Verifica se contém perguntas ou chamadas para ação (indicativo de produtivo)
-        if any(char in text for char in ['?', '!']) and productive_score > 0:
-            productive_score += 1
-        
-        # Decisão final
-        if productive_score > unproductive_score:
-            return "produtivo"
-        elif unproductive_score > productive_score:
-            return "improdutivo"
-        else:
-            # Em caso de empate, analisa o comprimento e estrutura
-            if len(text.split()) > 20:  # Emails longos tendem a ser mais produtivos
-                return "produtivo"
-            return "improdutivo"
-    
-    # Usando IA com prompts mais específicos
-    enhanced_text = f"""
-    Analise este email e determine se é PRODUTIVO ou IMPRODUTIVO.
-    
-    PRODUTIVO: Emails que requerem ação, resposta ou seguimento profissional. Incluem:
-    - Solicitações de trabalho, reuniões, projetos
-    - Questões comerciais, vendas, contratos
-    - Problemas técnicos que precisam de solução
-    - Pedidos, orçamentos, propostas
-    - Assuntos urgentes ou importantes
-    
-    IMPRODUTIVO: Emails que não requerem ação profissional imediata. Incluem:
-    - Mensagens pessoais, cumprimentos, felicitações
-    - Spam, newsletters, promoções
-    - Conversas casuais sem objetivo específico
-    - Agradecimentos simples
-    
-    Email para analisar: "{text}"
-    
-    Classifique como: PRODUTIVO ou IMPRODUTIVO
+        # Modo degradado: palavras-chave compiladas em um único padrão.
+        # Não vai para o cache para não sobreviver à carga do modelo.
+        score = keyword_score or keyword_matcher.score_text(text)
+        _record_classifications("fallback", [score.label])
+        return Classification(score.label, score.probabilities(), False, "keywords")
+
+    if settings.CASCADE_ENABLED:
+        score = keyword_score or keyword_matcher.score_text(text)
+        if score.confidence >= settings.CASCADE_CONFIDENCE_THRESHOLD:
+            _count_cascade("keywords")
+            _record_classifications("keywords", [score.label])
+            return Classification(score.label, score.probabilities(), False, "keywords")
+        _count_cascade("model")
+
+    # Perfilando, o modelo roda nesta thread para aparecer no profile
+    if classifier_batcher is not None and not profiling.active():
+        scores = classifier_batcher.run(text)
+    else:
+        scores = classify_batch_scores([text])[0]
+    category = _top_category(scores)
+    result_cache.set(key, {"category": category, "scores": scores})
+    _record_classifications("model", [category])
+    return Classification(category, scores, False, "model")
+
+_cascade_lock = threading.Lock()
+_cascade_counters = {"keywords": 0, "model": 0}
+
+def _count_cascade(stage: str, amount: int = 1):
+    with _cascade_lock:
+        _cascade_counters[stage] += amount
+
+def _record_classifications(source: str, categories: List[str]):
     """
-    
-    labels = ["PRODUTIVO", "IMPRODUTIVO"]
-    result = classifier(enhanced_text, candidate_labels=labels)
-    return result["labels"][0].lower()
+    Alimenta as métricas de origem da classificação e de distribuição das categorias.
+    """
+    if not categories:
+        return
+    metrics.inc("classifications_total", len(categories), source=source)
+    for category, count in Counter(categories).items():
+        metrics.inc("categories_total", count, category=category)
 
-def suggest_response(text: str, category: str, style: str = "padrao", sender_name: str = None) -> str:
+def _fallback_rates() -> Dict[str, float]:
     """
-    Gera uma sugestão de resposta personalizada para o email usando IA.
-    Focado apenas em emails produtivos e improdutivos.
-    
-    Args:
-        text: Conteúdo do email
-        category: Categoria do email (produtivo ou improdutivo)
-        style: Estilo da resposta (padrao, formal, informal, detalhada, objetiva)
-        sender_name: Nome do remetente para personalização
+    Fração das classificações feitas sem o modelo (modo degradado) e das
+    sugestões que saíram de template, sem contar acertos de cache.
     """
-    
-    # Templates de resposta organizados por categoria e estilo
-    templates = {
-        "produtivo": {
-            "padrao": [
-                f"{'Prezado(a) ' + sender_name if sender_name else 'Prezado(a)'}, recebemos sua solicitação e ela já está sendo analisada por nossa equipe. Agradecemos o contato e retornaremos em breve.",
-                f"{'Olá ' + sender_name if sender_name else 'Olá'}, sua mensagem foi recebida e encaminhada para o departamento responsável. Em breve você receberá um retorno.",
-                f"{'Prezado(a) ' + sender_name if sender_name else 'Prezado(a)'}, agradecemos seu contato. Sua solicitação está sendo processada e retornaremos com informações detalhadas."
-            ],
-            "formal": [
-                f"{'Prezado(a) Sr(a). ' + sender_name if sender_name else 'Prezado(a) Sr(a).'}, agradecemos seu contato. Sua solicitação está sendo processada pela equipe competente e retornaremos com informações em breve.",
-                f"{'Ilustríssimo(a) ' + sender_name if sender_name else 'Ilustríssimo(a)'}, recebemos sua demanda e ela está sendo tratada com a devida atenção por nossa equipe especializada.",
-                f"{'Prezado(a) Sr(a). ' + sender_name if sender_name else 'Prezado(a) Sr(a).'}, sua solicitação foi devidamente recebida e encontra-se em análise pelo departamento responsável."
-            ],
-            "informal": [
-                f"{'Oi ' + sender_name if sender_name else 'Oi'}! Recebemos sua mensagem e já estamos trabalhando nisso. Te atualizamos logo!",
-                f"{'E aí ' + sender_name if sender_name else 'E aí'}! Valeu pela mensagem. Já passei pro pessoal aqui e eles vão te responder rapidinho!",
-                f"{'Olá ' + sender_name if sender_name else 'Olá'}! Sua solicitação chegou aqui e já está sendo analisada. Em breve te mandamos um retorno!"
-            ],
-            "detalhada": [
-                f"{'Prezado(a) ' + sender_name if sender_name else 'Prezado(a)'}, muito obrigado pelo seu contato! Sua solicitação foi recebida e está sendo analisada detalhadamente por nossa equipe. Faremos uma avaliação completa e retornaremos com uma resposta abrangente dentro de 2-3 dias úteis. Caso surjam dúvidas durante o processo, entraremos em contato para esclarecimentos.",
-                f"{'Olá ' + sender_name if sender_name else 'Olá'}, agradecemos imensamente sua mensagem. Sua solicitação foi registrada e está sendo processada por nossa equipe especializada. Você receberá atualizações regulares sobre o andamento e uma resposta completa em breve. Estamos à disposição para qualquer esclarecimento adicional.",
-                f"{'Prezado(a) ' + sender_name if sender_name else 'Prezado(a)'}, recebemos sua importante solicitação e ela já está sendo tratada pela nossa equipe. Realizaremos uma análise completa e detalhada, considerando todos os aspectos mencionados. Retornaremos com informações precisas e próximos passos em até 48 horas."
-            ],
-            "objetiva": [
-                f"{'Recebido, ' + sender_name if sender_name else 'Recebido'}. Em análise. Retorno em breve.",
-                f"Solicitação registrada. Equipe notificada. Retorno em até 48h.",
-                f"{'OK, ' + sender_name if sender_name else 'OK'}. Processando. Aguarde retorno."
-            ]
-        },
-        "improdutivo": {
-            "padrao": [
-                f"{'Obrigado ' + sender_name if sender_name else 'Obrigado'} pelo seu contato. Sua mensagem foi recebida.",
-                f"{'Olá ' + sender_name if sender_name else 'Olá'}, agradecemos sua mensagem. Ela foi recebida e será considerada.",
-                f"{'Prezado(a) ' + sender_name if sender_name else 'Prezado(a)'}, agradecemos o contato. Sua mensagem foi devidamente recebida."
-            ],
-            "formal": [
-                f"{'Prezado(a) ' + sender_name if sender_name else 'Prezado(a)'}, agradecemos seu contato. Sua mensagem foi devidamente recebida e arquivada.",
-                f"{'Ilustríssimo(a) ' + sender_name if sender_name else 'Ilustríssimo(a)'}, recebemos sua correspondência. Agradecemos pela gentileza do contato.",
-                f"{'Prezado(a) Sr(a). ' + sender_name if sender_name else 'Prezado(a) Sr(a).'}, sua mensagem foi recebida. Agradecemos a cordialidade."
-            ],
-            "informal": [
-                f"{'Oi ' + sender_name if sender_name else 'Oi'}! Valeu pela mensagem! Foi legal receber seu contato.",
-                f"{'E aí ' + sender_name if sender_name else 'E aí'}! Obrigado por escrever. Recebemos sua mensagem!",
-                f"{'Olá ' + sender_name if sender_name else 'Olá'}! Que bacana receber sua mensagem. Valeu pelo contato!"
-            ],
-            "detalhada": [
-                f"{'Prezado(a) ' + sender_name if sender_name else 'Prezado(a)'}, muito obrigado pela sua mensagem. É sempre um prazer receber contatos como o seu. Sua mensagem foi recebida e, caso seja necessário algum retorno específico, entraremos em contato. Agradecemos pela gentileza e pelo tempo dedicado a nos escrever.",
-                f"{'Olá ' + sender_name if sender_name else 'Olá'}, agradecemos imensamente seu contato. É gratificante saber que você pensou em nós para compartilhar sua mensagem. Ela foi devidamente recebida e, se houver necessidade de acompanhamento, faremos contato. Mais uma vez, obrigado pela consideração.",
-                f"{'Caro(a) ' + sender_name if sender_name else 'Caro(a)'}, recebemos sua mensagem com muito apreço. Agradecemos por ter dedicado seu tempo para entrar em contato conosco. Sua correspondência foi registrada e, caso seja pertinente algum retorno, não hesitaremos em responder."
-            ],
-            "objetiva": [
-                f"{'Recebido, ' + sender_name if sender_name else 'Recebido'}. Obrigado.",
-                f"Mensagem registrada. Agradecemos o contato.",
-                f"{'OK, ' + sender_name if sender_name else 'OK'}. Mensagem recebida."
-            ]
+    rates = {}
+    classified = metrics.counter_values("classifications_total", "source")
+    total = sum(classified.values()) - classified.get("cache", 0)
+    if total:
+        rates["classification"] = round(classified.get("fallback", 0) / total, 4)
+    generated = metrics.counter_values("generations_total", "strategy")
+    total = sum(generated.values()) - generated.get("cache", 0)
+    if total:
+        rates["generation"] = round(generated.get("template", 0) / total, 4)
+    return rates
+
+metrics.register_gauge(
+    "model_fallback_rate", "Fração das classificações e sugestões que não usaram o modelo.",
+    _fallback_rates, label="stage"
+)
+metrics.register_gauge(
+    "classifier_batch_queue_depth", "Emails aguardando o micro-batcher do classificador.",
+    lambda: classifier_batcher.stats()["queue_depth"] if classifier_batcher is not None else 0
+)
+
+def get_cascade_stats() -> Dict:
+    """
+    Retorna quantos emails cada etapa da cascata decidiu e a fração que
+    chegou ao modelo caro.
+    """
+    with _cascade_lock:
+        counters = dict(_cascade_counters)
+    total = counters["keywords"] + counters["model"]
+    return {
+        "enabled": settings.CASCADE_ENABLED,
+        "threshold": settings.CASCADE_CONFIDENCE_THRESHOLD,
+        "decided_by_keywords": counters["keywords"],
+        "sent_to_model": counters["model"],
+        "model_fraction": round(counters["model"] / total, 3) if total else 0.0
+    }
+
+def _classification_key(text: str) -> str:
+    return make_key("classify", normalize_text(text), *_classifier_version())
+
+def _classifier_version() -> Tuple[str, ...]:
+    """
+    O que muda o resultado do classificador além do texto. Entra em todas
+    as chaves de classificação, para que trocar modo, backend, modelo (ou
+    artefato da cabeça), hipóteses ou orçamento de tokens não sirva
+    resultados do modelo anterior a partir do cache (inclusive o SQLite).
+    """
+    if settings.CLASSIFIER_MODE == "embedding":
+        path = settings.EMBEDDING_HEAD_PATH or ""
+        try:
+            model = f"{path}@{os.path.getmtime(path)}"
+        except OSError:
+            model = path
+    else:
+        model = CLASSIFIER_MODEL_NAME
+    return (
+        settings.CLASSIFIER_MODE,
+        settings.INFERENCE_BACKEND,
+        model,
+        CLASSIFIER_HYPOTHESIS_TEMPLATE,
+        _CLASSIFIER_LABELS_VERSION,
+        str(settings.CLASSIFIER_MAX_INPUT_TOKENS)
+    )
+
+def _top_category(scores: Dict[str, float]) -> str:
+    return max(scores, key=scores.get)
+
+# Hipóteses do NLI: o email entra sozinho como premissa e cada categoria vira
+# uma hipótese curta, sem repetir instruções a cada par premissa/hipótese
+CLASSIFIER_HYPOTHESIS_TEMPLATE = "Este email {}."
+CLASSIFIER_LABELS = {
+    "produtivo": "requer uma ação ou resposta profissional",
+    "improdutivo": "não requer nenhuma ação profissional"
+}
+_LABEL_TO_CATEGORY = {label: category for category, label in CLASSIFIER_LABELS.items()}
+_CLASSIFIER_LABELS_VERSION = json.dumps(CLASSIFIER_LABELS, sort_keys=True, ensure_ascii=False)
+
+def _prepare_classifier_input(text: str, model=None) -> str:
+    """
+    Aplica o orçamento de tokens do classificador (início + fim do email).
+    """
+    return prepare_for_model(
+        (model or classifier).tokenizer, text, settings.CLASSIFIER_MAX_INPUT_TOKENS, "classificador"
+    ).text
+
+def classify_batch_scores(texts: List[str], model=None) -> List[Dict[str, float]]:
+    """
+    Classifica vários emails em uma única chamada ao modelo (lote com padding)
+    e retorna a pontuação de cada categoria por email.
+    model permite usar outro pipeline (ex.: na comparação entre backends).
+    """
+    model = model or classifier
+    with metrics.timer("classification"):
+        with profiling.trace("classifier_prepare_inputs"):
+            inputs = [_prepare_classifier_input(text, model) for text in texts]
+        with profiling.trace("classifier_forward"):
+            if isinstance(model, EmbeddingClassifier):
+                # Encoder + cabeça linear: o lote inteiro em uma multiplicação de matrizes
+                return model.predict_scores(inputs)
+            results = model(
+                inputs,
+                candidate_labels=list(CLASSIFIER_LABELS.values()),
+                hypothesis_template=CLASSIFIER_HYPOTHESIS_TEMPLATE,
+                batch_size=len(inputs)
+            )
+    # Com uma única entrada o pipeline retorna um dict em vez de lista
+    if isinstance(results, dict):
+        results = [results]
+    return [
+        {_LABEL_TO_CATEGORY[label]: round(float(score), 4) for label, score in zip(result["labels"], result["scores"])}
+        for result in results
+    ]
+
+def classify_batch(texts: List[str]) -> List[str]:
+    """
+    Classifica vários emails em uma única chamada ao modelo (lote com padding).
+    """
+    return [_top_category(scores) for scores in classify_batch_scores(texts)]
+
+def classify_long_document(text: str, aggregation: str = None, early_exit_confidence: float = None) -> Dict:
+    """
+    Classifica documentos longos (ex.: PDFs de várias páginas) por janelas.
+
+    O texto é dividido em janelas de tokens sobrepostas, classificadas em lotes.
+    As pontuações são combinadas (max, mean ou weighted, que dá mais peso às
+    primeiras janelas) e a classificação para assim que a confiança combinada
+    atingir early_exit_confidence, sem pontuar o restante do documento.
+    """
+    aggregation = aggregation or settings.LONG_DOCUMENT_AGGREGATION
+    if aggregation not in _AGGREGATIONS:
+        raise ValueError(f"Agregação inválida: {aggregation} (use {', '.join(_AGGREGATIONS)})")
+    if early_exit_confidence is None:
+        early_exit_confidence = settings.LONG_DOCUMENT_EARLY_EXIT_CONFIDENCE
+
+    _ensure_models_loaded()
+    key = make_key(
+        "classify_long", normalize_text(text), aggregation, str(early_exit_confidence),
+        str(settings.LONG_DOCUMENT_OVERLAP_TOKENS), str(settings.LONG_DOCUMENT_MAX_WINDOWS),
+        *_classifier_version()
+    )
+    found, value = result_cache.get("classify_long", key)
+    if found:
+        _record_classifications("cache", [value["category"]])
+        return {**value, "cached": True}
+
+    if not classifier:
+        score = keyword_matcher.score_text(text)
+        _record_classifications("fallback", [score.label])
+        return {
+            "category": score.label,
+            "scores": score.probabilities(),
+            "aggregation": aggregation,
+            "windows_total": 0,
+            "windows_scored": 0,
+            "early_exit": False,
+            "evidence": [],
+            "cached": False
         }
+
+    windows = split_windows(
+        classifier.tokenizer,
+        text,
+        settings.CLASSIFIER_MAX_INPUT_TOKENS,
+        settings.LONG_DOCUMENT_OVERLAP_TOKENS,
+        settings.LONG_DOCUMENT_MAX_WINDOWS
+    )
+
+    window_scores: List[Dict[str, float]] = []
+    early_exit = False
+    batch_size = max(1, settings.CLASSIFIER_BATCH_MAX_SIZE)
+    for start in range(0, len(windows), batch_size):
+        chunk = windows[start:start + batch_size]
+        window_scores.extend(classify_batch_scores([window.text for window in chunk]))
+        combined = _AGGREGATIONS[aggregation](window_scores)
+        if len(window_scores) < len(windows) and max(combined.values()) >= early_exit_confidence:
+            early_exit = True
+            break
+
+    combined = _AGGREGATIONS[aggregation](window_scores)
+    result = {
+        "category": _top_category(combined),
+        "scores": combined,
+        "aggregation": aggregation,
+        "windows_total": len(windows),
+        "windows_scored": len(window_scores),
+        "early_exit": early_exit,
+        "evidence": [
+            {
+                "window": window.index,
+                "start_token": window.start_token,
+                "end_token": window.end_token,
+                "category": _top_category(scores),
+                "scores": scores,
+                "preview": window.text[:80]
+            }
+            for window, scores in zip(windows, window_scores)
+        ]
     }
-    
-    # Se não há modelo de IA, usa templates
-    if not generator:
-        category_templates = templates.get(category.lower(), templates["improdutivo"])
-        style_templates = category_templates.get(style, category_templates["padrao"])
-        return random.choice(style_templates)
-    
+    result_cache.set(key, result)
+    _record_classifications("model", [result["category"]])
+    return {**result, "cached": False}
+
+def _normalize_scores(totals: Dict[str, float]) -> Dict[str, float]:
+    total = sum(totals.values()) or 1.0
+    return {category: round(value / total, 4) for category, value in totals.items()}
+
+def _aggregate_max(window_scores: List[Dict[str, float]]) -> Dict[str, float]:
+    # A janela mais enfática de cada categoria decide
+    return _normalize_scores({
+        category: max(scores[category] for scores in window_scores)
+        for category in CLASSIFIER_LABELS
+    })
+
+def _aggregate_mean(window_scores: List[Dict[str, float]]) -> Dict[str, float]:
+    return _normalize_scores({
+        category: sum(scores[category] for scores in window_scores) / len(window_scores)
+        for category in CLASSIFIER_LABELS
+    })
+
+def _aggregate_weighted(window_scores: List[Dict[str, float]]) -> Dict[str, float]:
+    # O pedido costuma estar no início do documento: peso 1/(1 + posição)
+    weights = [1.0 / (1 + i) for i in range(len(window_scores))]
+    return _normalize_scores({
+        category: sum(w * scores[category] for w, scores in zip(weights, window_scores))
+        for category in CLASSIFIER_LABELS
+    })
+
+_AGGREGATIONS = {
+    "max": _aggregate_max,
+    "mean": _aggregate_mean,
+    "weighted": _aggregate_weighted
+}
+
+def get_batching_stats() -> Dict:
+    """
+    Retorna as métricas do micro-batching (tamanho de lote e espera na fila).
+    """
+    if classifier_batcher is None:
+        return {"enabled": False}
+    return {"enabled": True, **classifier_batcher.stats()}
+
+def get_cache_stats() -> Dict:
+    """
+    Retorna os contadores de acertos e falhas do cache de resultados.
+    """
+    return result_cache.stats()
+
+def _template_response(category: str, style: str, sender_name: str = None, text: str = None) -> str:
+    """
+    Escolhe um template de resposta para a categoria e o estilo informados.
+    O texto do email é usado na seleção determinística (TEMPLATE_SELECTION=hash).
+    """
+    return template_registry.render(category, style, {"sender_name": sender_name}, seed=text)
+
+def get_template_stats() -> Dict:
+    return template_registry.stats()
+
+def _build_generation_prompt(text: str, category: str, style: str, sender_name: str = None) -> str:
+    """
+    Monta o prompt do gerador para a categoria e o estilo informados, cortando
+    o email para que o prompt inteiro caiba no orçamento de tokens do gerador.
+    """
+    if generator is not None and settings.GENERATOR_MAX_INPUT_TOKENS > 0:
+        overhead = count_tokens(generator.tokenizer, _style_prompt("", category, style, sender_name))
+        budget = max(16, settings.GENERATOR_MAX_INPUT_TOKENS - overhead)
+        text = prepare_for_model(generator.tokenizer, text, budget, "gerador").text
+    return _style_prompt(text, category, style, sender_name)
+
+def _style_prompt(text: str, category: str, style: str, sender_name: str = None) -> str:
     # Prompts específicos para produtivo e improdutivo
     if category.lower() == "produtivo":
         if style == "formal":
@@ -226,59 +619,469 @@ def suggest_response(text: str, category: str, style: str = "padrao", sender_nam
     if sender_name:
         prompt += f' Inclua o nome "{sender_name}" na resposta de forma natural.'
 
+    return prompt
+
+class DecodingStrategy(NamedTuple):
+    name: str
+    kwargs: Dict  # Argumentos repassados ao pipeline de geração
+    prior_ms: float  # Estimativa de latência por email antes da primeira medição
+
+# Estratégias de decodificação, da melhor qualidade para a mais rápida. A
+# primeira é a configuração original e a única cujo resultado entra no cache.
+DECODING_STRATEGIES = [
+    DecodingStrategy("beam4", {"max_length": 128, "num_beams": 4, "temperature": 0.7}, 2500.0),
+    DecodingStrategy("beam2", {"max_length": 96, "num_beams": 2}, 1200.0),
+    DecodingStrategy("greedy", {"max_length": 64, "num_beams": 1, "do_sample": False}, 500.0)
+]
+_CACHED_STRATEGY_VERSION = f"{DECODING_STRATEGIES[0].name}:{json.dumps(DECODING_STRATEGIES[0].kwargs, sort_keys=True)}"
+
+# Latência observada por email (média móvel exponencial) de cada estratégia
+_decoding_lock = threading.Lock()
+_decoding_latency_ms = {strategy.name: strategy.prior_ms for strategy in DECODING_STRATEGIES}
+_decoding_counts = {name: 0 for name in [s.name for s in DECODING_STRATEGIES] + ["template", "cache"]}
+_LATENCY_EMA_ALPHA = 0.2
+
+class Suggestion(NamedTuple):
+    text: str
+    strategy: str  # Nome da estratégia, "template" ou "cache"
+    cached: bool
+
+def deadline_from_budget(latency_budget_ms: float = None) -> Union[float, None]:
+    """
+    Converte um orçamento de latência (ms) em um prazo absoluto no relógio
+    monotônico. Sem orçamento explícito usa GENERATION_DEFAULT_BUDGET_MS.
+    """
+    if latency_budget_ms is None:
+        latency_budget_ms = settings.GENERATION_DEFAULT_BUDGET_MS
+    if latency_budget_ms is None:
+        return None
+    return time.monotonic() + max(0.0, latency_budget_ms) / 1000
+
+def choose_decoding_strategy(deadline: float = None, items: int = 1) -> Union[DecodingStrategy, None]:
+    """
+    Escolhe a melhor estratégia cuja latência estimada para items emails
+    cabe no tempo que resta até o prazo. Retorna None se nenhuma couber
+    (o chamador deve responder com template).
+    """
+    if deadline is None:
+        return DECODING_STRATEGIES[0]
+    remaining_ms = (deadline - time.monotonic()) * 1000
+    with _decoding_lock:
+        estimates = dict(_decoding_latency_ms)
+    for strategy in DECODING_STRATEGIES:
+        if estimates[strategy.name] * items * settings.GENERATION_LATENCY_SAFETY <= remaining_ms:
+            return strategy
+    return None
+
+def _record_decoding(strategy: str, elapsed_ms: float = None, items: int = 1, produced: int = None):
+    # items: tamanho da chamada (latência por item); produced: sugestões que
+    # ficaram com esta estratégia, quando parte do lote caiu para o template
+    produced = items if produced is None else produced
+    metrics.inc("generations_total", produced, strategy=strategy)
+    with _decoding_lock:
+        _decoding_counts[strategy] += produced
+        if elapsed_ms is not None:
+            per_item = elapsed_ms / max(1, items)
+            previous = _decoding_latency_ms[strategy]
+            _decoding_latency_ms[strategy] = previous + _LATENCY_EMA_ALPHA * (per_item - previous)
+
+def get_generation_stats() -> Dict:
+    """
+    Latência estimada por estratégia de decodificação e quantas sugestões
+    saíram de cada uma.
+    """
+    with _decoding_lock:
+        return {
+            "estimated_latency_ms": {name: round(ms, 1) for name, ms in _decoding_latency_ms.items()},
+            "counts": dict(_decoding_counts),
+            "default_budget_ms": settings.GENERATION_DEFAULT_BUDGET_MS
+        }
+
+def suggest_response(text: str, category: str, style: str = "padrao", sender_name: str = None) -> str:
+    """
+    Gera uma sugestão de resposta personalizada para o email usando IA.
+    Focado apenas em emails produtivos e improdutivos.
+    
+    Args:
+        text: Conteúdo do email
+        category: Categoria do email (produtivo ou improdutivo)
+        style: Estilo da resposta (padrao, formal, informal, detalhada, objetiva)
+        sender_name: Nome do remetente para personalização
+    """
+    return generate_suggestion(text, category, style, sender_name).text
+
+def suggest_response_cached(
+    text: str,
+    category: str,
+    style: str = "padrao",
+    sender_name: str = None
+) -> Tuple[str, bool]:
+    """
+    Gera a sugestão consultando antes o cache de resultados.
+    Retorna a sugestão e se ela veio do cache.
+    """
+    suggestion = generate_suggestion(text, category, style, sender_name)
+    return suggestion.text, suggestion.cached
+
+def generate_suggestion(
+    text: str,
+    category: str,
+    style: str = "padrao",
+    sender_name: str = None,
+    deadline: float = None
+) -> Suggestion:
+    """
+    Gera a sugestão respeitando um prazo opcional (ver deadline_from_budget).
+
+    A estratégia de decodificação é escolhida pela latência estimada; se nem
+    a mais rápida couber no tempo restante, responde com o template.
+    """
+    _ensure_models_loaded()
+    key = _suggestion_key(text, category, style, sender_name)
+    found, suggestion = result_cache.get("suggest", key)
+    if found:
+        _record_decoding("cache")
+        return Suggestion(suggestion, "cache", True)
+
+    strategy = choose_decoding_strategy(deadline) if generator else None
+    if strategy is None:
+        _record_decoding("template")
+        return Suggestion(_template_response(category, style, sender_name, text), "template", False)
+
+    started = time.perf_counter()
+    suggestion, from_model = _suggest_response_uncached(text, category, style, sender_name, strategy)
+    if not from_model:
+        _record_decoding("template")
+        return Suggestion(suggestion, "template", False)
+
+    _record_decoding(strategy.name, (time.perf_counter() - started) * 1000)
+    if strategy is DECODING_STRATEGIES[0]:
+        result_cache.set(key, suggestion)
+    return Suggestion(suggestion, strategy.name, False)
+
+def _suggestion_key(text: str, category: str, style: str, sender_name: str = None) -> str:
+    return make_key("suggest", normalize_text(text), category.lower(), style, sender_name, *_generator_version())
+
+def _generator_version() -> Tuple[str, ...]:
+    """
+    Modelo, backend, orçamento de tokens e a estratégia cujo resultado vai
+    para o cache (sempre a primeira de DECODING_STRATEGIES).
+    """
+    return (
+        GENERATOR_MODEL_NAME,
+        settings.INFERENCE_BACKEND,
+        str(settings.GENERATOR_MAX_INPUT_TOKENS),
+        _CACHED_STRATEGY_VERSION
+    )
+
+def _suggest_response_uncached(
+    text: str,
+    category: str,
+    style: str,
+    sender_name: str = None,
+    strategy: DecodingStrategy = None
+) -> Tuple[str, bool]:
+    """
+    Retorna a sugestão e se ela foi gerada pelo modelo (True) ou veio de um template.
+    """
+    # Se não há modelo de IA, usa templates
+    if not generator:
+        return _template_response(category, style, sender_name, text), False
+    
+    with profiling.trace("generation_prompt"):
+        prompt = _build_generation_prompt(text, category, style, sender_name)
+    strategy = strategy or DECODING_STRATEGIES[0]
+
     try:
-        response = generator(prompt, max_length=128, num_beams=4, temperature=0.7)
+        with metrics.timer("generation"), profiling.trace(f"generation_{strategy.name}"):
+            response = generator(prompt, **strategy.kwargs)
         generated_text = response[0]["generated_text"]
         
         # Se a resposta gerada for muito curta, use template como fallback
         if len(generated_text.strip()) < 15:
-            category_templates = templates.get(category.lower(), templates["improdutivo"])
-            style_templates = category_templates.get(style, category_templates["padrao"])
-            return random.choice(style_templates)
+            return _template_response(category, style, sender_name, text), False
         
-        return generated_text
+        return generated_text, True
     except Exception as e:
         # Fallback para templates em caso de erro
-        category_templates = templates.get(category.lower(), templates["improdutivo"])
-        style_templates = category_templates.get(style, category_templates["padrao"])
-        return random.choice(style_templates)
+        return _template_response(category, style, sender_name, text), False
 
-def get_email_insights(text: str) -> Dict:
+def classify_emails(texts: List[str]) -> List[Union[str, Exception]]:
     """
-    Retorna insights sobre o email focado nas categorias produtivo/improdutivo.
+    Classifica uma lista de emails em lotes do tamanho configurado.
+
+    Se um lote falhar, os emails dele são classificados individualmente para
+    que um email problemático não derrube os demais. Itens que falharem
+    retornam a exceção no lugar da categoria.
     """
-    category = classify_email(text)
-    
-    insights = {
-        "categoria": category,
-        "confianca": "alta",
-        "palavras_chave": [],
-        "tom": "neutro",
-        "urgencia": "normal"
+    _ensure_models_loaded()
+    if not classifier:
+        labels = keyword_matcher.classify_batch(texts)
+        _record_classifications("fallback", labels)
+        return labels
+
+    results: List[Union[str, Exception]] = [None] * len(texts)
+    keys = [_classification_key(text) for text in texts]
+    missing = []
+    for i, key in enumerate(keys):
+        found, value = result_cache.get("classify", key)
+        if found:
+            results[i] = value["category"]
+        else:
+            missing.append(i)
+    _record_classifications("cache", [result for result in results if result is not None])
+
+    if settings.CASCADE_ENABLED and missing:
+        # Cascata vetorizada: casos óbvios são decididos pelas palavras-chave
+        labels, confidences = keyword_matcher.classify_batch_with_confidence([texts[i] for i in missing])
+        ambiguous = []
+        for i, label, confidence in zip(missing, labels, confidences.tolist()):
+            if confidence >= settings.CASCADE_CONFIDENCE_THRESHOLD:
+                results[i] = label
+            else:
+                ambiguous.append(i)
+        _count_cascade("keywords", len(missing) - len(ambiguous))
+        _count_cascade("model", len(ambiguous))
+        _record_classifications("keywords", [results[i] for i in missing if results[i] is not None])
+        missing = ambiguous
+
+    batch_size = max(1, settings.CLASSIFIER_BATCH_MAX_SIZE)
+    for start in range(0, len(missing), batch_size):
+        chunk = missing[start:start + batch_size]
+        try:
+            outcomes = classify_batch_scores([texts[i] for i in chunk])
+        except Exception as e:
+            print(f"Erro ao classificar lote de {len(chunk)} emails, tentando individualmente: {e}")
+            outcomes = [_isolated(lambda t: classify_batch_scores([t])[0], texts[i]) for i in chunk]
+        for i, scores in zip(chunk, outcomes):
+            if isinstance(scores, Exception):
+                results[i] = scores
+                continue
+            results[i] = _top_category(scores)
+            result_cache.set(keys[i], {"category": results[i], "scores": scores})
+        _record_classifications("model", [results[i] for i in chunk if isinstance(results[i], str)])
+    return results
+
+def suggest_responses(
+    texts: List[str],
+    categories: List[str],
+    style: str = "padrao",
+    sender_name: str = None,
+    deadline: float = None
+) -> List[Union[Suggestion, Exception]]:
+    """
+    Gera sugestões para vários emails agrupando os prompts por categoria e
+    estilo em chamadas em lote ao gerador.
+
+    Com prazo, cada lote usa a melhor estratégia que ainda cabe no tempo
+    restante; os lotes que não cabem recebem templates.
+    """
+    _ensure_models_loaded()
+    if not generator:
+        _record_decoding("template", items=len(categories))
+        return [
+            Suggestion(_template_response(category, style, sender_name, text), "template", False)
+            for text, category in zip(texts, categories)
+        ]
+
+    results: List[Union[Suggestion, Exception]] = [None] * len(texts)
+    keys = [_suggestion_key(text, category, style, sender_name) for text, category in zip(texts, categories)]
+
+    # Agrupa os índices por (categoria, estilo) para que prompts parecidos
+    # sejam gerados juntos; itens já em cache não entram nos grupos
+    groups: Dict[tuple, List[int]] = {}
+    for i, category in enumerate(categories):
+        found, suggestion = result_cache.get("suggest", keys[i])
+        if found:
+            _record_decoding("cache")
+            results[i] = Suggestion(suggestion, "cache", True)
+        else:
+            groups.setdefault((category.lower(), style), []).append(i)
+
+    batch_size = max(1, settings.GENERATOR_BATCH_SIZE)
+    for (category, group_style), indices in groups.items():
+        for start in range(0, len(indices), batch_size):
+            chunk = indices[start:start + batch_size]
+            strategy = choose_decoding_strategy(deadline, items=len(chunk))
+            if strategy is None:
+                _record_decoding("template", items=len(chunk))
+                for i in chunk:
+                    results[i] = Suggestion(_template_response(category, group_style, sender_name, texts[i]), "template", False)
+                continue
+
+            with profiling.trace("generation_prompt"):
+                prompts = [_build_generation_prompt(texts[i], category, group_style, sender_name) for i in chunk]
+            started = time.perf_counter()
+            try:
+                with metrics.timer("generation"), profiling.trace(f"generation_{strategy.name}"):
+                    outputs = generator(prompts, batch_size=len(prompts), **strategy.kwargs)
+            except Exception as e:
+                print(f"Erro ao gerar lote de {len(chunk)} respostas, tentando individualmente: {e}")
+                for i in chunk:
+                    results[i] = _isolated(generate_suggestion, texts[i], categories[i], style, sender_name, deadline)
+                continue
+            elapsed_ms = (time.perf_counter() - started) * 1000
+
+            fallbacks = 0
+            for i, output in zip(chunk, outputs):
+                # Dependendo da versão o pipeline retorna dict ou lista com um dict
+                if isinstance(output, list):
+                    output = output[0]
+                generated_text = output["generated_text"]
+                if len(generated_text.strip()) < 15:
+                    results[i] = Suggestion(_template_response(category, group_style, sender_name, texts[i]), "template", False)
+                    fallbacks += 1
+                    continue
+                if strategy is DECODING_STRATEGIES[0]:
+                    result_cache.set(keys[i], generated_text)
+                results[i] = Suggestion(generated_text, strategy.name, False)
+            _record_decoding(strategy.name, elapsed_ms, items=len(chunk), produced=len(chunk) - fallbacks)
+            if fallbacks:
+                _record_decoding("template", items=fallbacks)
+    return results
+
+def analyze_emails(
+    texts: List[str],
+    style: Union[str, List[str]] = "padrao",
+    sender_name: str = None,
+    deadline: float = None
+) -> List[Dict]:
+    """
+    Classifica os emails em lote e gera as sugestões dos que foram
+    classificados (usado pelo /batch-analyze, pelos jobs em lote e pelo
+    monitoramento IMAP). style pode ser um estilo por email; as sugestões
+    são geradas em um lote por estilo.
+
+    Retorna, na ordem de texts, {"category", "suggestion",
+    "generation_strategy", "status": "success"} ou, se o email falhou,
+    {"error", "status": "failed"}.
+    """
+    styles = [style] * len(texts) if isinstance(style, str) else list(style)
+    categories = classify_emails(texts)
+
+    suggestions: Dict[int, Union[Suggestion, Exception]] = {}
+    by_style: Dict[str, List[int]] = {}
+    for i, category in enumerate(categories):
+        if not isinstance(category, Exception):
+            by_style.setdefault(styles[i], []).append(i)
+    for group_style, indexes in by_style.items():
+        generated = suggest_responses(
+            [texts[i] for i in indexes], [categories[i] for i in indexes], group_style, sender_name, deadline
+        )
+        suggestions.update(zip(indexes, generated))
+
+    results = []
+    for i, category in enumerate(categories):
+        outcome = suggestions.get(i, category)
+        if isinstance(outcome, Exception):
+            results.append({"error": str(outcome), "status": "failed"})
+        else:
+            results.append({
+                "category": category.capitalize(),
+                "suggestion": outcome.text,
+                "generation_strategy": outcome.strategy,
+                "status": "success"
+            })
+    return results
+
+def _isolated(func, *args):
+    """
+    Executa func e devolve a exceção em vez de propagá-la.
+    """
+    try:
+        return func(*args)
+    except Exception as e:
+        return e
+
+def analyze(
+    text: str,
+    style: str = "padrao",
+    sender_name: str = None,
+    generate: bool = True,
+    min_confidence: float = None,
+    deadline: float = None
+) -> Dict:
+    """
+    Análise completa do email a partir de um único trabalho compartilhado:
+    uma normalização, uma passada de palavras-chave e uma chamada ao modelo.
+
+    Retorna categoria, confiança, pontuações por categoria, palavras-chave,
+    urgência, tom e sugestão de resposta. Se min_confidence for informado e a
+    confiança ficar abaixo dele, a geração é pulada e um template é usado.
+    O prazo (deadline) escolhe a estratégia de decodificação da sugestão.
+    """
+    keyword_score = keyword_matcher.score_text(text)
+    category, scores, category_cached, stage = classify_email_scored(text, keyword_score)
+    confidence = scores.get(category, 0.0)
+
+    found = keyword_matcher.insight_keywords(keyword_score.matches)
+    result = {
+        "category": category,
+        "confidence": confidence,
+        "scores": scores,
+        "classifier": stage,
+        "keywords": found["palavras_produtivo"] if category == "produtivo" else found["palavras_improdutivo"],
+        "urgency": _urgency(found),
+        "tone": _tone(found),
+        "suggestion": None,
+        "suggestion_source": None,
+        "generation_strategy": None,
+        "cache": {"category": category_cached, "suggestion": False}
     }
-    
-    # Análise de palavras-chave para produtivo
-    if category == "produtivo":
-        productive_words = ['urgente', 'importante', 'prazo', 'reunião', 'projeto', 'contrato', 'negócio', 'proposta']
-        insights["palavras_chave"] = [word for word in productive_words if word in text.lower()]
-    else:
-        casual_words = ['obrigado', 'parabéns', 'feliz', 'convite', 'pessoal']
-        insights["palavras_chave"] = [word for word in casual_words if word in text.lower()]
-    
+
+    if not generate:
+        return result
+
+    if min_confidence is not None and confidence < min_confidence:
+        # Baixa confiança: evita o custo da geração e responde com template
+        result["suggestion"] = _template_response(category, style, sender_name, text)
+        result["suggestion_source"] = "template"
+        result["generation_strategy"] = "template"
+        return result
+
+    suggestion = generate_suggestion(text, category, style, sender_name, deadline)
+    result["suggestion"] = suggestion.text
+    result["suggestion_source"] = "template" if suggestion.strategy == "template" else "generator"
+    result["generation_strategy"] = suggestion.strategy
+    result["cache"]["suggestion"] = suggestion.cached
+    return result
+
+def _urgency(found: Dict[str, List[str]]) -> str:
     # Análise de urgência
-    if any(word in text.lower() for word in ['urgente', 'imediato', 'asap', 'prioritário']):
-        insights["urgencia"] = "alta"
-    elif any(word in text.lower() for word in ['quando possível', 'sem pressa', 'qualquer hora']):
-        insights["urgencia"] = "baixa"
-    
+    if found["urgencia_alta"]:
+        return "alta"
+    if found["urgencia_baixa"]:
+        return "baixa"
+    return "normal"
+
+def _tone(found: Dict[str, List[str]]) -> str:
     # Análise de tom
-    if any(word in text.lower() for word in ['por favor', 'obrigado', 'agradeço', 'grato']):
-        insights["tom"] = "cordial"
-    elif any(word in text.lower() for word in ['urgente', 'imediato', 'rápido']):
-        insights["tom"] = "urgente"
-    elif any(word in text.lower() for word in ['problema', 'erro', 'falha']):
-        insights["tom"] = "preocupado"
-    elif any(word in text.lower() for word in ['parabéns', 'feliz', 'excelente']):
-        insights["tom"] = "positivo"
-    
-    return insights
\ No newline at end of file
+    if found["tom_cordial"]:
+        return "cordial"
+    if found["tom_urgente"]:
+        return "urgente"
+    if found["tom_preocupado"]:
+        return "preocupado"
+    if found["tom_positivo"]:
+        return "positivo"
+    return "neutro"
+
+def get_email_insights(text: str) -> Dict:
+    """
+    Retorna insights sobre o email focado nas categorias produtivo/improdutivo.
+    """
+    analysis = analyze(text, generate=False)
+    return {
+        "categoria": analysis["category"],
+        "confianca": _confidence_label(analysis["confidence"]),
+        "palavras_chave": analysis["keywords"],
+        "tom": analysis["tone"],
+        "urgencia": analysis["urgency"]
+    }
+
+def _confidence_label(confidence: float) -> str:
+    if confidence >= 0.75:
+        return "alta"
+    if confidence >= 0.55:
+        return "média"
+    return "baixa"
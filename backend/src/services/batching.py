@@ -0,0 +1,163 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Agrupa requisições concorrentes em lotes dinâmicos.
+
+    Cada chamador envia um item e recebe um Future. Uma thread de fundo coleta
+    os itens durante uma janela curta (max_wait_ms) ou até atingir max_batch_size,
+    executa process_batch uma única vez com o lote inteiro e devolve a cada
+    chamador o seu resultado.
+    """
+
+    def __init__(
+        self,
+        process_batch: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 10.0,
+        name: str = "batcher"
+    ):
+        self.process_batch = process_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.name = name
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+        self._closed = False
+
+        # Métricas para ajustar o equilíbrio latência/throughput
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._max_batch = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._batch_time_total = 0.0
+
+    def submit(self, item: Any) -> Future:
+        """
+        Enfileira um item para o próximo lote e retorna o Future do resultado.
+        """
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError(f"{self.name}: agendador encerrado")
+            self._ensure_worker()
+            self._queue.append((item, future, time.perf_counter()))
+            self._cond.notify()
+        return future
+
+    def run(self, item: Any, timeout: Optional[float] = None) -> Any:
+        """
+        Atalho síncrono: envia o item e aguarda o resultado.
+        """
+        return self.submit(item).result(timeout=timeout)
+
+    def shutdown(self, wait: bool = True):
+        """
+        Encerra a thread de fundo após processar o que já está na fila.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            worker = self._worker
+        if wait and worker is not None:
+            worker.join()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Retorna tamanho médio/máximo dos lotes e tempo de espera na fila.
+        """
+        with self._stats_lock:
+            batches = self._batches
+            return {
+                "name": self.name,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": round(self.max_wait * 1000, 2),
+                "batches": batches,
+                "items": self._items,
+                "avg_batch_size": round(self._items / batches, 2) if batches else 0.0,
+                "largest_batch": self._max_batch,
+                "avg_queue_wait_ms": round(self._wait_total / self._items * 1000, 2) if self._items else 0.0,
+                "max_queue_wait_ms": round(self._wait_max * 1000, 2),
+                "avg_batch_time_ms": round(self._batch_time_total / batches * 1000, 2) if batches else 0.0,
+                "queue_depth": len(self._queue)
+            }
+
+    def _ensure_worker(self):
+        # Chamado com self._cond adquirido
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._loop, name=f"{self.name}-worker", daemon=True)
+            self._worker.start()
+
+    def _collect(self) -> List[tuple]:
+        """
+        Aguarda o primeiro item e então coleta outros até a janela fechar
+        ou o lote encher.
+        """
+        with self._cond:
+            while not self._queue and not self._closed:
+                self._cond.wait()
+            if not self._queue:
+                return []
+
+            deadline = time.perf_counter() + self.max_wait
+            while len(self._queue) < self.max_batch_size and not self._closed:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch = []
+            while self._queue and len(batch) < self.max_batch_size:
+                batch.append(self._queue.popleft())
+            return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            if not batch:
+                return
+
+            started = time.perf_counter()
+            waits = [started - enqueued for _, _, enqueued in batch]
+            items = [item for item, _, _ in batch]
+            futures = [future for _, future, _ in batch]
+
+            try:
+                results = self.process_batch(items)
+                if len(results) != len(items):
+                    raise RuntimeError(
+                        f"{self.name}: lote retornou {len(results)} resultados para {len(items)} itens"
+                    )
+                for future, result in zip(futures, results):
+                    future.set_result(result)
+            except Exception as e:
+                logger.error(f"{self.name}: erro ao processar lote de {len(items)} itens: {e}")
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+
+            elapsed = time.perf_counter() - started
+            with self._stats_lock:
+                self._batches += 1
+                self._items += len(items)
+                self._max_batch = max(self._max_batch, len(items))
+                self._wait_total += sum(waits)
+                self._wait_max = max(self._wait_max, max(waits))
+                self._batch_time_total += elapsed
+
+            logger.debug(
+                f"{self.name}: lote de {len(items)} itens em {elapsed * 1000:.1f}ms "
+                f"(espera máx. {max(waits) * 1000:.1f}ms)"
+            )
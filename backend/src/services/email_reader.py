@@ -1,16 +1,42 @@
 import imapclient
-import pyzmail
-import os
+import base64
+import binascii
+import codecs
+import hashlib
+import logging
+import quopri
+import threading
+import time
+from contextlib import contextmanager
+from email import policy
+from email.parser import BytesHeaderParser
+from typing import Dict, List, Optional, Tuple
+from src.core.config import settings
+from src.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Cabeçalhos lidos de cada email; o corpo vem à parte, limitado em bytes
+_HEADER_FIELDS = b'BODY[HEADER.FIELDS (SUBJECT FROM)]'
+_HEADER_FETCH = 'BODY.PEEK[HEADER.FIELDS (SUBJECT FROM)]'
 
 def fetch_unread_emails(
-    email_address: str, 
-    password: str, 
-    imap_server: str = 'imap.gmail.com', 
-    max_emails: int = 5
+    email_address: str,
+    password: str,
+    imap_server: str = 'imap.gmail.com',
+    max_emails: int = 5,
+    ssl: bool = True,
+    port: Optional[int] = None
 ):
     """
     Lê os últimos emails não lidos da caixa de entrada do usuário via IMAP.
 
+    Os emails selecionados são buscados em um único FETCH (cabeçalhos e
+    estrutura) seguido de um FETCH por seção de texto com BODY.PEEK parcial:
+    os emails continuam não lidos, anexos nunca são baixados e cada corpo é
+    limitado a IMAP_BODY_MAX_BYTES. As conexões autenticadas ficam em um
+    pool por conta e são reaproveitadas entre requisições.
+
     Parâmetros:
         email_address (str): Endereço de email do usuário.
         password (str): Senha ou app password do email.
@@ -20,35 +46,264 @@ def fetch_unread_emails(
     Retorna:
         List[dict]: Lista de dicionários com informações dos emails:
             {
+                'uid': UID do email na caixa de entrada,
                 'subject': Assunto do email,
                 'from': Remetente,
                 'body': Corpo do email (texto ou HTML)
             }
     """
-    # Conecta ao servidor IMAP usando SSL
-    server = imapclient.IMAPClient(imap_server, ssl=True)
-    server.login(email_address, password)
-    server.select_folder('INBOX')
+    for attempt in range(2):
+        try:
+            with imap_pool.connection(email_address, password, imap_server, ssl, port) as server:
+                return _fetch_unread(server, max_emails)
+        except imapclient.exceptions.LoginError:
+            raise
+        except (imapclient.exceptions.IMAPClientError, OSError) as e:
+            # Conexão do pool derrubada pelo servidor: tenta uma vez com uma nova
+            if attempt:
+                raise
+            logger.warning(f"Conexão IMAP com {imap_server} falhou ({e}), tentando novamente")
+
+def iter_unread_emails(
+    email_address: str,
+    password: str,
+    imap_server: str = 'imap.gmail.com',
+    max_emails: int = 5,
+    chunk_size: Optional[int] = None,
+    ssl: bool = True,
+    port: Optional[int] = None
+):
+    """
+    Versão em streaming de fetch_unread_emails: os UIDs são buscados em
+    blocos de chunk_size (padrão IMAP_STREAM_CHUNK_SIZE) e cada email é
+    entregue assim que o seu bloco chega, sem esperar a caixa inteira.
+    """
+    chunk_size = max(1, chunk_size or settings.IMAP_STREAM_CHUNK_SIZE)
+    delivered = False
+    for attempt in range(2):
+        try:
+            with imap_pool.connection(email_address, password, imap_server, ssl, port) as server:
+                uids = _search_unread(server, max_emails)
+                for start in range(0, len(uids), chunk_size):
+                    for email in fetch_uids(server, uids[start:start + chunk_size]):
+                        delivered = True
+                        yield email
+            return
+        except imapclient.exceptions.LoginError:
+            raise
+        except (imapclient.exceptions.IMAPClientError, OSError) as e:
+            # Só repete se nada foi entregue ainda, para não duplicar emails
+            if attempt or delivered:
+                raise
+            logger.warning(f"Conexão IMAP com {imap_server} falhou ({e}), tentando novamente")
+
+def _fetch_unread(server: imapclient.IMAPClient, max_emails: int) -> List[Dict]:
+    return fetch_uids(server, _search_unread(server, max_emails))
+
+def _search_unread(server: imapclient.IMAPClient, max_emails: int) -> List[int]:
+    # Somente leitura (EXAMINE): nada é marcado como lido
+    server.select_folder('INBOX', readonly=True)
+
+    # Busca mensagens não lidas (limitado por max_emails)
+    return server.search(['UNSEEN'])[:max_emails]
+
+def fetch_uids(server: imapclient.IMAPClient, uids: List[int]) -> List[Dict]:
+    if not uids:
+        return []
+    with metrics.timer("imap_fetch"):
+        return _fetch_uids(server, uids)
+
+def _fetch_uids(server: imapclient.IMAPClient, uids: List[int]) -> List[Dict]:
+    # Um único FETCH com cabeçalhos e estrutura de todos os emails
+    summary = server.fetch(uids, [_HEADER_FETCH, 'BODYSTRUCTURE'])
+
+    # Seção de texto de cada email; emails com a mesma seção vão no mesmo FETCH
+    parts = {}
+    by_section: Dict[str, List[int]] = {}
+    for uid in uids:
+        data = summary.get(uid)
+        if data is None:
+            continue
+        part = _find_text_part(data[b'BODYSTRUCTURE'])
+        if part is not None:
+            parts[uid] = part
+            by_section.setdefault(part[0], []).append(uid)
+
+    limit = max(1, settings.IMAP_BODY_MAX_BYTES)
+    bodies = {}
+    for section, section_uids in by_section.items():
+        response = server.fetch(section_uids, [f'BODY.PEEK[{section}]<0.{limit}>'])
+        key = f'BODY[{section}]<0>'.encode()
+        for uid in section_uids:
+            _, charset, encoding = parts[uid]
+            bodies[uid] = _decode_partial(response.get(uid, {}).get(key) or b'', encoding, charset)
 
-    # Busca mensagens não lidas
-    messages = server.search(['UNSEEN'])
     emails = []
+    for uid in uids:
+        data = summary.get(uid)
+        if data is None:
+            continue
+        headers = BytesHeaderParser(policy=policy.default).parsebytes(data.get(_HEADER_FIELDS) or b'')
+        from_header = headers['from']
+        addresses = from_header.addresses if from_header is not None else ()
+        from_ = addresses[0].addr_spec if addresses else ''
+        emails.append({'uid': uid, 'subject': str(headers['subject'] or ''), 'from': from_, 'body': bodies.get(uid, '')})
+    return emails
+
+def _find_text_part(structure) -> Optional[Tuple[str, str, str]]:
+    """
+    Procura no BODYSTRUCTURE a parte de texto a ler (prioriza texto, depois
+    HTML). Retorna (seção, charset, transfer-encoding) ou None.
+    """
+    leaves = list(_walk_structure(structure, ''))
+    for wanted in (b'PLAIN', b'HTML'):
+        for section, leaf in leaves:
+            if _upper(leaf[0]) == b'TEXT' and _upper(leaf[1]) == wanted:
+                params = leaf[2] or ()
+                charset = 'utf-8'
+                for name, value in zip(params[::2], params[1::2]):
+                    if _upper(name) == b'CHARSET' and value:
+                        charset = value.decode('ascii', errors='ignore') or charset
+                encoding = (leaf[5] or b'7BIT').decode('ascii', errors='ignore').upper()
+                return section, charset, encoding
+    return None
+
+def _walk_structure(structure, prefix: str):
+    if structure.is_multipart:
+        for index, part in enumerate(structure[0], start=1):
+            yield from _walk_structure(part, f'{prefix}{index}.')
+    else:
+        # Mensagens sem partes têm apenas a seção 1
+        yield (prefix.rstrip('.') or '1'), structure
+
+def _upper(value) -> bytes:
+    return value.upper() if isinstance(value, bytes) else b''
+
+def _decode_partial(data: bytes, encoding: str, charset: str) -> str:
+    """
+    Decodifica um corpo possivelmente cortado no meio: descarta o bloco
+    base64 ou a sequência quoted-printable incompleta e o último caractere
+    multibyte incompleto.
+    """
+    if encoding == 'BASE64':
+        compact = b''.join(data.split())
+        try:
+            data = base64.b64decode(compact[:len(compact) - len(compact) % 4])
+        except binascii.Error:
+            data = b''
+    elif encoding == 'QUOTED-PRINTABLE':
+        cut = data.rfind(b'=', max(0, len(data) - 2))
+        if cut != -1:
+            data = data[:cut]
+        data = quopri.decodestring(data)
+    try:
+        decoder = codecs.getincrementaldecoder(charset)(errors='replace')
+    except LookupError:
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    return decoder.decode(data, final=False)
+
+
+class IMAPConnectionPool:
+    """
+    Pool pequeno de conexões IMAP autenticadas por conta (servidor, usuário,
+    senha). Conexões ociosas há mais de idle_seconds são descartadas.
+    """
+
+    def __init__(self, max_per_account: int = 2, idle_seconds: float = 300.0, timeout: float = 30.0):
+        self.max_per_account = max_per_account
+        self.idle_seconds = idle_seconds
+        self.timeout = timeout
+        self._idle: Dict[str, List[Tuple[float, imapclient.IMAPClient]]] = {}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    @contextmanager
+    def connection(self, email_address: str, password: str, imap_server: str, ssl: bool = True, port: Optional[int] = None):
+        key = hashlib.sha256(f'{imap_server}\x00{port}\x00{ssl}\x00{email_address}\x00{password}'.encode()).hexdigest()
+        server = self._checkout(key)
+        if server is None:
+            server = imapclient.IMAPClient(imap_server, port=port, ssl=ssl, timeout=self.timeout)
+            try:
+                server.login(email_address, password)
+            except Exception:
+                _close(server)
+                raise
+            with self._lock:
+                self.created += 1
+        try:
+            yield server
+        except GeneratorExit:
+            # Gerador encerrado pelo consumidor entre dois emails: a conexão
+            # está ociosa e pode voltar ao pool
+            self._checkin(key, server)
+            raise
+        except Exception:
+            # Estado da conexão desconhecido depois de um erro; as ociosas da
+            # mesma conta provavelmente caíram junto
+            _close(server)
+            self._discard(key)
+            raise
+        self._checkin(key, server)
+
+    def _checkout(self, key: str) -> Optional[imapclient.IMAPClient]:
+        now = time.monotonic()
+        expired = []
+        server = None
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                since, candidate = idle.pop()
+                if now - since > self.idle_seconds:
+                    expired.append(candidate)
+                    continue
+                server = candidate
+                self.reused += 1
+                break
+        for candidate in expired:
+            _close(candidate)
+        return server
+
+    def _checkin(self, key: str, server: imapclient.IMAPClient):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_per_account:
+                idle.append((time.monotonic(), server))
+                return
+        _close(server)
+
+    def _discard(self, key: str):
+        with self._lock:
+            idle = self._idle.pop(key, [])
+        for _, server in idle:
+            _close(server)
+
+    def close_all(self):
+        with self._lock:
+            connections = [server for idle in self._idle.values() for _, server in idle]
+            self._idle.clear()
+        for server in connections:
+            _close(server)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "accounts": len(self._idle),
+                "idle_connections": sum(len(idle) for idle in self._idle.values()),
+                "created": self.created,
+                "reused": self.reused
+            }
+
+
+def _close(server: imapclient.IMAPClient):
+    try:
+        server.logout()
+    except Exception:
+        pass
+
 
-    # Itera sobre os UIDs das mensagens não lidas (limitado por max_emails)
-    for uid in messages[:max_emails]:
-        raw_message = server.fetch([uid], ['BODY[]'])[uid][b'BODY[]']
-        msg = pyzmail.PyzMessage.factory(raw_message)
-        subject = msg.get_subject()
-        from_ = msg.get_addresses('from')[0][1]
-        # Tenta extrair o corpo do email (prioriza texto, depois HTML)
-        if msg.text_part:
-            body = msg.text_part.get_payload().decode(msg.text_part.charset)
-        elif msg.html_part:
-            body = msg.html_part.get_payload().decode(msg.html_part.charset)
-        else:
-            body = ""
-        emails.append({'subject': subject, 'from': from_, 'body': body})
-
-    # Encerra a conexão com o servidor
-    server.logout()
-    return emails
\ No newline at end of file
+imap_pool = IMAPConnectionPool(
+    max_per_account=settings.IMAP_POOL_SIZE,
+    idle_seconds=settings.IMAP_POOL_IDLE_SECONDS,
+    timeout=settings.IMAP_TIMEOUT_SECONDS
+)
@@ -0,0 +1,177 @@
+"""
+Classificador rápido por embeddings: um encoder de sentenças pequeno gera os
+vetores e uma cabeça leve (centroides por cosseno ou regressão logística)
+pontua o lote inteiro com NumPy.
+
+Treino da cabeça a partir de um JSONL rotulado: scripts/train_embedding_head.py.
+"""
+import json
+from typing import Dict, List, Tuple
+
+import numpy as np
+import torch
+from transformers import AutoModel, AutoTokenizer
+
+DEFAULT_ENCODER = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+HEADS = ("centroid", "logistic")
+
+
+class SentenceEncoder:
+    """
+    Gera embeddings normalizados (média dos tokens) em lotes.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_ENCODER, device: int = -1, batch_size: int = 32):
+        self.model_name = model_name
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name)
+        self.model.eval()
+        self.device = torch.device("cuda", device) if device >= 0 else torch.device("cpu")
+        self.model.to(self.device)
+        self.batch_size = batch_size
+        self.max_length = min(getattr(self.tokenizer, "model_max_length", 512), 512)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = self.tokenizer(
+                texts[start:start + self.batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="pt"
+            ).to(self.device)
+            with torch.no_grad():
+                hidden = self.model(**batch).last_hidden_state
+            mask = batch["attention_mask"].unsqueeze(-1).type_as(hidden)
+            pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+            vectors.append(pooled.cpu().numpy())
+        embeddings = np.concatenate(vectors, axis=0).astype(np.float32)
+        return _l2_normalize(embeddings)
+
+
+def _l2_normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+class ClassifierHead:
+    """
+    Cabeça linear sobre os embeddings: pontuações = softmax(X @ W + b).
+
+    Os centroides viram W (um centroide normalizado por coluna, escalado por
+    uma temperatura) e a regressão logística aprende W e b diretamente, então
+    as duas cabeças são aplicadas com a mesma multiplicação de matrizes.
+    """
+
+    def __init__(self, labels: List[str], weights: np.ndarray, bias: np.ndarray, kind: str, encoder_name: str):
+        self.labels = labels
+        self.weights = weights.astype(np.float32)
+        self.bias = bias.astype(np.float32)
+        self.kind = kind
+        self.encoder_name = encoder_name
+
+    def predict_proba(self, embeddings: np.ndarray) -> np.ndarray:
+        return _softmax(embeddings @ self.weights + self.bias)
+
+    def save(self, path: str):
+        metadata = json.dumps({"labels": self.labels, "kind": self.kind, "encoder": self.encoder_name})
+        np.savez_compressed(path, weights=self.weights, bias=self.bias, metadata=np.array(metadata))
+
+    @classmethod
+    def load(cls, path: str) -> "ClassifierHead":
+        with np.load(path) as data:
+            metadata = json.loads(str(data["metadata"]))
+            return cls(metadata["labels"], data["weights"], data["bias"], metadata["kind"], metadata["encoder"])
+
+
+def fit_centroid_head(embeddings: np.ndarray, y: np.ndarray, labels: List[str], encoder_name: str,
+                      temperature: float = 20.0) -> ClassifierHead:
+    """
+    Cabeça por centroides: similaridade de cosseno com a média de cada classe.
+    """
+    centroids = np.stack([embeddings[y == i].mean(axis=0) for i in range(len(labels))])
+    centroids = _l2_normalize(centroids)
+    return ClassifierHead(labels, centroids.T * temperature, np.zeros(len(labels)), "centroid", encoder_name)
+
+
+def fit_logistic_head(embeddings: np.ndarray, y: np.ndarray, labels: List[str], encoder_name: str,
+                      epochs: int = 300, learning_rate: float = 0.5, l2: float = 1e-3) -> ClassifierHead:
+    """
+    Regressão logística multinomial treinada por gradiente em lote completo.
+    """
+    n, dim = embeddings.shape
+    classes = len(labels)
+    weights = np.zeros((dim, classes), dtype=np.float32)
+    bias = np.zeros(classes, dtype=np.float32)
+    targets = np.eye(classes, dtype=np.float32)[y]
+    for _ in range(epochs):
+        probs = _softmax(embeddings @ weights + bias)
+        grad = (probs - targets) / n
+        weights -= learning_rate * (embeddings.T @ grad + l2 * weights)
+        bias -= learning_rate * grad.sum(axis=0)
+    return ClassifierHead(labels, weights, bias, "logistic", encoder_name)
+
+
+class EmbeddingClassifier:
+    """
+    Encoder + cabeça. Expõe tokenizer para que o orçamento de tokens e as
+    janelas de documentos longos funcionem como no classificador NLI.
+    """
+
+    def __init__(self, encoder: SentenceEncoder, head: ClassifierHead):
+        self.encoder = encoder
+        self.head = head
+        self.tokenizer = encoder.tokenizer
+
+    @classmethod
+    def load(cls, head_path: str, device: int = -1) -> "EmbeddingClassifier":
+        head = ClassifierHead.load(head_path)
+        return cls(SentenceEncoder(head.encoder_name, device=device), head)
+
+    def predict_scores(self, texts: List[str]) -> List[Dict[str, float]]:
+        probs = self.head.predict_proba(self.encoder.encode(texts))
+        return [
+            {label: round(float(p), 4) for label, p in zip(self.head.labels, row)}
+            for row in probs
+        ]
+
+
+def read_training_data(path: str) -> Tuple[List[str], List[str]]:
+    texts, labels = [], []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                item = json.loads(line)
+                texts.append(item["text"])
+                labels.append(item["label"].lower())
+    return texts, labels
+
+
+def train(data_path: str, output_path: str, encoder_name: str = DEFAULT_ENCODER, head: str = "centroid") -> ClassifierHead:
+    """
+    Treina a cabeça a partir de um JSONL rotulado e salva o artefato (.npz).
+    """
+    if head not in HEADS:
+        raise ValueError(f"Cabeça inválida: {head} (use {', '.join(HEADS)})")
+    texts, raw_labels = read_training_data(data_path)
+    labels = sorted(set(raw_labels))
+    y = np.array([labels.index(label) for label in raw_labels])
+
+    embeddings = SentenceEncoder(encoder_name).encode(texts)
+    if head == "logistic":
+        fitted = fit_logistic_head(embeddings, y, labels, encoder_name)
+    else:
+        fitted = fit_centroid_head(embeddings, y, labels, encoder_name)
+
+    predictions = fitted.predict_proba(embeddings).argmax(axis=1)
+    print(f"Cabeça '{head}' treinada com {len(texts)} exemplos; acurácia no treino: {(predictions == y).mean():.3f}")
+    fitted.save(output_path)
+    return fitted
+
@@ -1,8 +1,22 @@
-from googleapiclient.discovery import build
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.errors import HttpError
 from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 import base64
+import httplib2
+import json
+import logging
+import threading
 from email.mime.text import MIMEText
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from src.core.config import settings
 from src.services.ai_services import classify_email, suggest_response  
+from src.services.gmail_sync_store import GmailSyncStore
+from src.services.metrics import metrics
+from src.services.result_cache import MemoryCache, make_key
+
+logger = logging.getLogger(__name__)
 
 # Escopos necessários para ler e enviar emails pelo Gmail API
 SCOPES = [
@@ -10,14 +24,112 @@ SCOPES = [
     'https://www.googleapis.com/auth/gmail.send'
 ]
 
+# Clientes já construídos, por token e por thread (o transporte httplib2 não
+# é thread-safe). Cada cliente mantém suas conexões keep-alive abertas, que são
+# fechadas quando ele sai do cache (ver _retire_service).
+_service_cache = MemoryCache(
+    max_entries=settings.GMAIL_CLIENT_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.GMAIL_CLIENT_CACHE_TTL_SECONDS,
+    on_evict=lambda entry: _retire_service(*entry)
+)
+_service_stats = {"hits": 0, "misses": 0, "closed": 0}
+_service_stats_lock = threading.Lock()
+# Clientes removidos do cache por outra thread, fechados pela thread dona
+_retired_lock = threading.Lock()
+_retired_services: Dict[int, List] = {}
+_discovery_lock = threading.Lock()
+_discovery_document = None
+
+# Cursor (historyId) e emails já classificados de cada conta, aberto sob demanda
+_store_lock = threading.Lock()
+_store = None
+
 def get_gmail_service_with_token(access_token):
     """
     Cria e retorna o serviço Gmail autenticado usando o access_token do usuário.
+    O cliente é reutilizado enquanto estiver no cache (GMAIL_CLIENT_CACHE_TTL_SECONDS).
     """
-    creds = Credentials(token=access_token, scopes=SCOPES)
-    service = build('gmail', 'v1', credentials=creds)
+    owner = threading.get_ident()
+    if _retired_services:
+        _close_retired(owner)
+    key = make_key("gmail", access_token, str(owner))
+    found, entry = _service_cache.get(key)
+    if found:
+        _count_service("hits")
+        return entry[1]
+
+    _count_service("misses")
+    service = _build_gmail_service(access_token)
+    _service_cache.set(key, (owner, service))
     return service
 
+def _count_service(name: str, amount: int = 1):
+    with _service_stats_lock:
+        _service_stats[name] += amount
+
+def _retire_service(owner: int, service):
+    """
+    Fecha as conexões de um cliente que saiu do cache. O httplib2 não aceita
+    close() concorrente com uma requisição, então o cliente de outra thread
+    ainda viva fica pendente até a próxima chamada da thread dona.
+    """
+    if owner == threading.get_ident() or owner not in _live_threads():
+        _close_service(service)
+        return
+    with _retired_lock:
+        _retired_services.setdefault(owner, []).append(service)
+
+def _close_retired(owner: int):
+    # Também fecha os pendentes de threads que terminaram desde então
+    live = _live_threads()
+    with _retired_lock:
+        owners = [ident for ident in _retired_services if ident == owner or ident not in live]
+        services = [service for ident in owners for service in _retired_services.pop(ident)]
+    for service in services:
+        _close_service(service)
+
+def _live_threads():
+    return {thread.ident for thread in threading.enumerate()}
+
+def _close_service(service):
+    try:
+        service.close()
+    except Exception as e:
+        logger.debug(f"Falha ao fechar o cliente Gmail: {e}")
+    _count_service("closed")
+
+def _build_gmail_service(access_token):
+    """
+    Monta o cliente a partir do documento de descoberta estático, já
+    interpretado, com um transporte HTTP próprio e persistente.
+    """
+    creds = Credentials(token=access_token, scopes=SCOPES)
+    http = AuthorizedHttp(creds, http=httplib2.Http(timeout=settings.GMAIL_HTTP_TIMEOUT_SECONDS))
+    client_options = {"api_endpoint": settings.GMAIL_API_ENDPOINT} if settings.GMAIL_API_ENDPOINT else None
+    return build_from_document(_gmail_discovery(), http=http, client_options=client_options)
+
+def _gmail_discovery() -> Dict:
+    """
+    Documento de descoberta do Gmail v1 empacotado com o google-api-python-client,
+    lido e interpretado uma única vez por processo.
+    """
+    global _discovery_document
+    if _discovery_document is None:
+        with _discovery_lock:
+            if _discovery_document is None:
+                document = get_static_doc('gmail', 'v1')
+                if document is None:
+                    raise RuntimeError("Documento de descoberta do Gmail v1 não encontrado no google-api-python-client")
+                _discovery_document = json.loads(document)
+    return _discovery_document
+
+def get_gmail_client_stats() -> Dict:
+    with _service_stats_lock:
+        stats = dict(_service_stats)
+    with _retired_lock:
+        pending = sum(len(services) for services in _retired_services.values())
+    return {**stats, "cached_clients": len(_service_cache), "pending_close": pending}
+
 def fetch_latest_emails(access_token, max_results=10):
     """
     Busca os últimos emails da caixa de entrada do usuário, classifica cada email usando IA,
@@ -25,72 +137,396 @@ def fetch_latest_emails(access_token, max_results=10):
 
     Retorna uma lista de dicionários com informações dos emails.
     """
+    return fetch_latest_emails_with_metadata(access_token, max_results)[0]
+
+def fetch_latest_emails_with_metadata(access_token, max_results=10) -> Tuple[List[Dict], Dict]:
+    """
+    Igual a fetch_latest_emails, mas também retorna a contagem de chamadas à API.
+    """
+    parsed, metadata = fetch_latest_parsed_emails(access_token, max_results)
+    return analyze_parsed_emails(parsed), metadata
+
+def fetch_latest_parsed_emails(access_token, max_results=10) -> Tuple[List[Dict], Dict]:
+    """
+    Só a busca de fetch_latest_emails_with_metadata: retorna os emails
+    interpretados (sem classificação, ver analyze_parsed_emails) e a contagem
+    de chamadas à API. Assim a API faz a rede no executor de I/O e a
+    inferência no de inferência.
+
+    As mensagens são buscadas em requisições batch HTTP e cada thread é
+    consultada uma única vez (threads().get em formato metadata), mesmo que
+    várias mensagens pertençam a ela.
+    """
+    calls = {"api_calls": 0, "http_requests": 0}
     service = get_gmail_service_with_token(access_token)
-    results = service.users().messages().list(
-        userId='me',
-        labelIds=['INBOX'],
-        maxResults=max_results
-    ).execute()
-    messages = results.get('messages', [])
-    emails = []
-
-    for msg in messages:
-        # Busca os dados completos do email
-        msg_data = service.users().messages().get(userId='me', id=msg['id'], format='full').execute()
-        headers = msg_data['payload']['headers']
-        subject = next((h['value'] for h in headers if h['name'] == 'Subject'), '')
-        from_ = next((h['value'] for h in headers if h['name'] == 'From'), '')
-        body = ''
-        parts = msg_data['payload'].get('parts', [])
-        for part in parts:
-            if part['mimeType'] == 'text/plain':
-                body = base64.urlsafe_b64decode(part['body'].get('data', '')).decode('utf-8', errors='ignore')
+    message_ids = _list_inbox(service, max_results, calls)
+    message_data, failed_messages = _fetch_messages(service, message_ids, calls)
+    threads, failed_threads = _fetch_threads(service, message_data, calls)
+
+    parsed = [
+        _parse_message(message_id, message_data[message_id], threads)
+        for message_id in message_ids
+        if message_id in message_data
+    ]
+    metadata = {
+        **calls,
+        "messages": len(message_ids),
+        "threads": len(threads) + failed_threads,
+        "failed_messages": failed_messages,
+        "failed_threads": failed_threads
+    }
+    return parsed, metadata
+
+def iter_latest_emails(access_token, max_results=10, calls: Dict[str, int] = None, chunk_size: int = None):
+    """
+    Versão em streaming da busca: lista a caixa de entrada e busca mensagens
+    e threads em blocos de chunk_size (padrão GMAIL_STREAM_CHUNK_SIZE),
+    entregando cada email já interpretado (sem classificação) assim que o seu
+    bloco chega. Se calls for informado, recebe a contagem de chamadas à API.
+    """
+    calls = calls if calls is not None else {}
+    calls.setdefault("api_calls", 0)
+    calls.setdefault("http_requests", 0)
+    chunk_size = max(1, chunk_size or settings.GMAIL_STREAM_CHUNK_SIZE)
+    service = get_gmail_service_with_token(access_token)
+    message_ids = _list_inbox(service, max_results, calls)
+    for start in range(0, len(message_ids), chunk_size):
+        chunk = message_ids[start:start + chunk_size]
+        message_data, _ = _fetch_messages(service, chunk, calls)
+        threads, _ = _fetch_threads(service, message_data, calls)
+        for message_id in chunk:
+            if message_id in message_data:
+                yield _parse_message(message_id, message_data[message_id], threads)
+
+class PendingSync(NamedTuple):
+    """
+    Sincronização buscada e ainda não gravada (ver prepare_sync).
+    """
+    account: str
+    mode: str  # full ou incremental
+    cursor: Optional[str]  # historyId gravado quando a busca começou
+    history_id: str
+    changes: Optional[Dict]
+    max_results: int
+    new_messages: List[Dict]  # message_id, thread_id, internal_date e parsed
+    metadata: Dict
+
+def sync_latest_emails(access_token, max_results=10) -> Tuple[List[Dict], Dict]:
+    """
+    Sincronização incremental: guarda o último historyId de cada conta e os
+    emails já classificados (GMAIL_SYNC_DB_PATH) e, a cada chamada, busca em
+    users().history().list só o que mudou desde então. Apenas os emails novos
+    são classificados; os demais vêm do armazenamento local.
+
+    Sem cursor, ou com o cursor expirado (404 da API), faz uma sincronização
+    completa dos últimos max_results emails. Equivale a prepare_sync,
+    analyze_parsed_emails e complete_sync em sequência.
+    """
+    pending = prepare_sync(access_token, max_results)
+    emails = analyze_parsed_emails([message["parsed"] for message in pending.new_messages])
+    return complete_sync(pending, emails)
+
+def prepare_sync(access_token, max_results=10) -> PendingSync:
+    """
+    Parte de rede da sincronização: lê o cursor, busca as mudanças (ou a
+    caixa inteira) e interpreta os emails novos, sem classificar nem gravar.
+    """
+    store = _sync_store()
+    calls = {"api_calls": 0, "http_requests": 0}
+    service = get_gmail_service_with_token(access_token)
+    profile = service.users().getProfile(userId='me').execute()
+    calls["api_calls"] += 1
+    calls["http_requests"] += 1
+    account = profile['emailAddress']
+
+    changes = None
+    cursor = store.get_cursor(account)
+    if cursor is not None:
+        try:
+            changes = _history_since(service, cursor, calls)
+        except HttpError as e:
+            if e.resp.status != 404:
+                raise
+            logger.info(f"historyId {cursor} expirado, fazendo sincronização completa")
 
+    if changes is None:
+        mode = "full"
+        # O historyId do perfil é lido antes da listagem: o que chegar depois
+        # dela aparece no próximo history().list
+        history_id = profile['historyId']
+        message_ids = _list_inbox(service, max_results, calls)
+    else:
+        mode = "incremental"
+        history_id = changes["history_id"]
+        # A remoção dos emails que saíram da caixa fica para complete_sync
+        # Só os mais recentes aparecem na resposta; os demais não precisam ser classificados
+        message_ids = changes["added"][-max_results:] if max_results > 0 else []
+
+    message_data, failed_messages = _fetch_messages(service, message_ids, calls)
+    threads, failed_threads = _fetch_threads(service, message_data, calls)
+    new_messages = [
+        {
+            "message_id": message_id,
+            "thread_id": message_data[message_id].get('threadId'),
+            "internal_date": message_data[message_id].get('internalDate', 0),
+            "parsed": _parse_message(message_id, message_data[message_id], threads)
+        }
+        for message_id in message_ids
+        if message_id in message_data
+    ]
+    metadata = {
+        **calls,
+        "sync_mode": mode,
+        "history_id": str(history_id),
+        "new_messages": len(message_data),
+        "removed_messages": len(changes["removed"]) if changes else 0,
+        "failed_messages": failed_messages,
+        "failed_threads": failed_threads
+    }
+    return PendingSync(account, mode, cursor, history_id, changes, max_results, new_messages, metadata)
+
+def complete_sync(pending: PendingSync, emails: List[Dict]) -> Tuple[List[Dict], Dict]:
+    """
+    Grava os emails novos já analisados (na ordem de pending.new_messages),
+    marca os respondidos e avança o cursor. Retorna os max_results mais
+    recentes da conta e os metadados da sincronização.
+
+    A gravação só acontece se o cursor ainda é o lido por prepare_sync. Em
+    sincronizações concorrentes da mesma conta, a primeira a terminar grava e
+    as outras devolvem o estado já gravado (sync_conflict nos metadados); o
+    que só elas viram aparece no próximo history().list.
+    """
+    store = _sync_store()
+    account = pending.account
+    messages = [
+        {
+            "message_id": message["message_id"],
+            "thread_id": message["thread_id"],
+            "internal_date": message["internal_date"],
+            "email": email
+        }
+        for message, email in zip(pending.new_messages, emails)
+    ]
+    changes = pending.changes
+    replied = store.apply_sync(
+        account,
+        pending.cursor,
+        pending.history_id,
+        messages,
+        removed=changes["removed"] if changes is not None else None,
+        sent=changes["sent"] if changes is not None else ()
+    )
+    metadata = {**pending.metadata, "newly_replied": replied or 0, "sync_conflict": replied is None}
+    if replied is None:
+        logger.info("Outra sincronização da conta gravou antes; devolvendo o estado já gravado")
+    return store.latest(account, pending.max_results), metadata
+
+def _history_since(service, start_history_id, calls: Dict[str, int]) -> Dict:
+    """
+    Percorre as páginas de history().list a partir do cursor e resume as
+    mudanças: emails que entraram na caixa de entrada (em ordem), emails que
+    saíram dela e mensagens enviadas (thread, id).
+    """
+    added, removed, sent = [], set(), []
+    page_token = None
+    while True:
+        with metrics.timer("gmail_fetch"):
+            response = service.users().history().list(
+                userId='me',
+                startHistoryId=start_history_id,
+                historyTypes=['messageAdded', 'messageDeleted', 'labelRemoved'],
+                pageToken=page_token
+            ).execute()
+        calls["api_calls"] += 1
+        calls["http_requests"] += 1
+        for record in response.get('history', []):
+            for item in record.get('messagesAdded', []):
+                message = item['message']
+                labels = message.get('labelIds', [])
+                if 'INBOX' in labels:
+                    added.append(message['id'])
+                if 'SENT' in labels and message.get('threadId'):
+                    sent.append((message['threadId'], message['id']))
+            for item in record.get('messagesDeleted', []):
+                removed.add(item['message']['id'])
+            for item in record.get('labelsRemoved', []):
+                if 'INBOX' in item.get('labelIds', []):
+                    removed.add(item['message']['id'])
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            break
+
+    added = [message_id for message_id in dict.fromkeys(added) if message_id not in removed]
+    return {"added": added, "removed": list(removed), "sent": sent, "history_id": response['historyId']}
+
+def _sync_store() -> GmailSyncStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = GmailSyncStore(settings.GMAIL_SYNC_DB_PATH, settings.GMAIL_SYNC_MAX_STORED)
+    return _store
+
+def _list_inbox(service, max_results, calls: Dict[str, int]) -> List[str]:
+    with metrics.timer("gmail_fetch"):
+        results = service.users().messages().list(
+            userId='me',
+            labelIds=['INBOX'],
+            maxResults=max_results
+        ).execute()
+    calls["api_calls"] += 1
+    calls["http_requests"] += 1
+    return [msg['id'] for msg in results.get('messages', [])]
+
+def _fetch_messages(service, message_ids: List[str], calls: Dict[str, int]) -> Tuple[Dict[str, Dict], int]:
+    """
+    Busca os dados completos dos emails em lotes. Retorna os dados por id e
+    quantos falharam.
+    """
+    message_data, errors = _batch_execute(service, {
+        message_id: service.users().messages().get(userId='me', id=message_id, format='full')
+        for message_id in message_ids
+    }, calls)
+    for message_id, error in errors.items():
+        logger.error(f"Erro ao buscar a mensagem {message_id}: {error}")
+    return message_data, len(errors)
+
+def _fetch_threads(service, message_data: Dict[str, Dict], calls: Dict[str, int]) -> Tuple[Dict[str, Dict], int]:
+    """
+    Uma consulta por thread, só com os ids e labels das mensagens.
+    """
+    thread_ids = {data['threadId'] for data in message_data.values() if data.get('threadId')}
+    threads, errors = _batch_execute(service, {
+        thread_id: service.users().threads().get(
+            userId='me', id=thread_id, format='metadata', fields='messages(id,labelIds)'
+        )
+        for thread_id in thread_ids
+    }, calls)
+    for thread_id, error in errors.items():
+        logger.error(f"Erro ao buscar a thread {thread_id}: {error}")
+    return threads, len(errors)
+
+def analyze_parsed_emails(parsed: List[Dict]) -> List[Dict]:
+    """
+    analyze_parsed_email para cada email, na ordem recebida.
+    """
+    return [analyze_parsed_email(email) for email in parsed]
+
+def analyze_parsed_email(parsed: Dict) -> Dict:
+    """
+    Classifica e gera a sugestão de um email já interpretado por
+    _parse_message (também usado pelo modo streaming da API).
+    """
+    body = parsed['body']
+
+    # Classificação e sugestão de resposta via IA
+    category = classify_email(parsed['text']).capitalize()
+    suggestion = suggest_response(parsed['text'], category)
+
+    # Monta o dicionário do email para retorno
+    return {
+        'subject': parsed['subject'],
+        'from': parsed['from'],
+        'category': category,
+        'suggestion': suggestion,
+        'body_preview': body[:100] + "..." if len(body) > 100 else body,
+        'thread_id': parsed['thread_id'],
+        'already_replied': parsed['already_replied']
+    }
+
+def _parse_message(message_id: str, msg_data: Dict, threads: Dict[str, Dict]) -> Dict:
+    """
+    Extrai assunto, remetente, corpo e o texto para análise, e verifica se o
+    email já foi respondido na thread.
+    """
+    headers = msg_data['payload']['headers']
+    subject = next((h['value'] for h in headers if h['name'] == 'Subject'), '')
+    from_ = next((h['value'] for h in headers if h['name'] == 'From'), '')
+    body = ''
+    parts = msg_data['payload'].get('parts', [])
+    for part in parts:
+        if part['mimeType'] == 'text/plain':
+            body = base64.urlsafe_b64decode(part['body'].get('data', '')).decode('utf-8', errors='ignore')
+
+    # Verifica se já foi respondido na thread: alguma outra mensagem com label 'SENT'
+    thread_id = msg_data.get('threadId')
+    thread_messages = threads.get(thread_id, {}).get('messages', [])
+    already_replied = any(
+        'SENT' in tm.get('labelIds', []) and tm['id'] != message_id
+        for tm in thread_messages
+    )
+
+    return {
+        'subject': subject,
+        'from': from_,
+        'body': body,
         # Texto completo para análise
-        text = f"{subject}\n\n{body}"
-
-        # Classificação e sugestão de resposta via IA
-        category = classify_email(text).capitalize()
-        suggestion = suggest_response(text, category)
-
-        # Verifica se já foi respondido na thread
-        thread_id = msg_data.get('threadId')
-        already_replied = False
-        if thread_id:
-            # Busca todas as mensagens da thread
-            thread_msgs = service.users().messages().list(userId='me', q=f'thread:{thread_id}').execute().get('messages', [])
-            for tm in thread_msgs:
-                tm_data = service.users().messages().get(userId='me', id=tm['id'], format='metadata').execute()
-                print(f"Mensagem {tm['id']} labelIds: {tm_data.get('labelIds', [])}")  # Log para depuração
-                # Se for uma mensagem enviada pelo usuário (label 'SENT') e não for o próprio email original
-                if 'SENT' in tm_data.get('labelIds', []) and tm['id'] != msg['id']:
-                    already_replied = True
-                    break
-
-        # Monta o dicionário do email para retorno
-        emails.append({
-            'subject': subject,
-            'from': from_,
-            'category': category,
-            'suggestion': suggestion,
-            'body_preview': body[:100] + "..." if len(body) > 100 else body,
-            'thread_id': thread_id,
-            'already_replied': already_replied
-        })
-    return emails
-
-def send_gmail_reply(access_token, to_email, subject, body, thread_id=None):
+        'text': f"{subject}\n\n{body}",
+        'thread_id': thread_id,
+        'already_replied': already_replied
+    }
+
+def _batch_execute(service, requests: Dict[str, object], calls: Dict[str, int]) -> Tuple[Dict[str, Dict], Dict[str, Exception]]:
+    """
+    Executa as requisições em batch HTTP (até GMAIL_BATCH_SIZE por ida ao
+    servidor) e retorna as respostas e os erros por id.
+    """
+    responses, errors = {}, {}
+
+    def callback(request_id, response, exception):
+        if exception is not None:
+            errors[request_id] = exception
+        else:
+            responses[request_id] = response
+
+    items = list(requests.items())
+    batch_size = max(1, settings.GMAIL_BATCH_SIZE)
+    for start in range(0, len(items), batch_size):
+        batch = service.new_batch_http_request(callback=callback)
+        for request_id, request in items[start:start + batch_size]:
+            batch.add(request, request_id=request_id)
+        with metrics.timer("gmail_fetch"):
+            batch.execute()
+        calls["api_calls"] += len(items[start:start + batch_size])
+        calls["http_requests"] += 1
+    return responses, errors
+
+def send_gmail_reply(access_token, to_email, subject, body, thread_id=None, message_id=None):
     """
     Envia uma resposta automática para o email informado, usando o access_token do usuário.
-    O email é enviado na mesma thread, se o thread_id for informado.
+    O email é enviado na mesma thread, se o thread_id for informado. message_id
+    fixa o cabeçalho Message-ID, o que permite conferir depois se o envio
+    aconteceu (ver find_sent_message).
     """
     service = get_gmail_service_with_token(access_token)
     message = MIMEText(body)
     message['to'] = to_email
     message['subject'] = f"Re: {subject}"
+    if message_id:
+        message['Message-ID'] = message_id
     raw = base64.urlsafe_b64encode(message.as_bytes()).decode()
     msg = {'raw': raw}
     if thread_id:
         msg['threadId'] = thread_id
-    sent = service.users().messages().send(userId='me', body=msg).execute()
-    return sent
\ No newline at end of file
+    with metrics.timer("reply_send"):
+        sent = service.users().messages().send(userId='me', body=msg).execute()
+    return sent
+
+def find_sent_message(access_token, message_id) -> Optional[str]:
+    """
+    Procura entre os enviados uma mensagem com o Message-ID informado e
+    retorna o id dela no Gmail, ou None.
+    """
+    service = get_gmail_service_with_token(access_token)
+    found = service.users().messages().list(
+        userId='me', q=f"in:sent rfc822msgid:{message_id}", maxResults=1
+    ).execute()
+    messages = found.get('messages', [])
+    return messages[0]['id'] if messages else None
+
+def get_account_email(access_token) -> str:
+    """
+    Endereço da conta dona do token (getProfile).
+    """
+    service = get_gmail_service_with_token(access_token)
+    return service.users().getProfile(userId='me').execute()['emailAddress']
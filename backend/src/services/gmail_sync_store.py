@@ -0,0 +1,169 @@
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class GmailSyncStore:
+    """
+    Estado da sincronização incremental do Gmail em SQLite: o último
+    historyId de cada conta e os emails já classificados.
+    """
+
+    def __init__(self, path: str, max_messages_per_account: int = 500):
+        self.path = path
+        self.max_messages_per_account = max_messages_per_account
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS accounts ("
+            "account TEXT PRIMARY KEY, history_id TEXT NOT NULL, synced_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            "account TEXT NOT NULL, message_id TEXT NOT NULL, thread_id TEXT, "
+            "internal_date INTEGER NOT NULL, data TEXT NOT NULL, "
+            "PRIMARY KEY (account, message_id))"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS messages_by_date ON messages (account, internal_date DESC)"
+        )
+        self._conn.commit()
+
+    def get_cursor(self, account: str) -> Optional[str]:
+        with self._lock:
+            return self._get_cursor(account)
+
+    def _get_cursor(self, account: str) -> Optional[str]:
+        row = self._conn.execute(
+            "SELECT history_id FROM accounts WHERE account = ?", (account,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_cursor(self, account: str, history_id: str):
+        with self._lock:
+            self._set_cursor(account, history_id)
+            self._conn.commit()
+
+    def _set_cursor(self, account: str, history_id: str):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO accounts (account, history_id, synced_at) VALUES (?, ?, ?)",
+            (account, str(history_id), time.time())
+        )
+
+    def reset(self, account: str):
+        """
+        Descarta o cursor e os emails da conta (usado antes de uma sincronização completa).
+        """
+        with self._lock:
+            self._reset(account)
+            self._conn.commit()
+
+    def _reset(self, account: str):
+        self._conn.execute("DELETE FROM accounts WHERE account = ?", (account,))
+        self._conn.execute("DELETE FROM messages WHERE account = ?", (account,))
+
+    def save_messages(self, account: str, messages: List[Dict]):
+        """
+        Grava emails classificados: cada item tem message_id, thread_id,
+        internal_date e email (o dicionário devolvido pela API).
+        """
+        with self._lock:
+            self._save_messages(account, messages)
+            self._conn.commit()
+
+    def _save_messages(self, account: str, messages: List[Dict]):
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO messages (account, message_id, thread_id, internal_date, data) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [
+                (account, m["message_id"], m["thread_id"], int(m["internal_date"]),
+                 json.dumps(m["email"], ensure_ascii=False))
+                for m in messages
+            ]
+        )
+        # Mantém só os emails mais recentes de cada conta
+        self._conn.execute(
+            "DELETE FROM messages WHERE account = ? AND message_id NOT IN ("
+            "SELECT message_id FROM messages WHERE account = ? ORDER BY internal_date DESC LIMIT ?)",
+            (account, account, self.max_messages_per_account)
+        )
+
+    def remove_messages(self, account: str, message_ids: List[str]):
+        with self._lock:
+            self._remove_messages(account, message_ids)
+            self._conn.commit()
+
+    def _remove_messages(self, account: str, message_ids: List[str]):
+        self._conn.executemany(
+            "DELETE FROM messages WHERE account = ? AND message_id = ?",
+            [(account, message_id) for message_id in message_ids]
+        )
+
+    def mark_replied(self, account: str, thread_id: str, sent_message_id: str) -> int:
+        """
+        Marca como respondidos os emails da thread que recebeu uma mensagem enviada.
+        Retorna quantos emails foram atualizados.
+        """
+        with self._lock:
+            updated = self._mark_replied(account, thread_id, sent_message_id)
+            self._conn.commit()
+        return updated
+
+    def _mark_replied(self, account: str, thread_id: str, sent_message_id: str) -> int:
+        rows = self._conn.execute(
+            "SELECT message_id, data FROM messages WHERE account = ? AND thread_id = ? AND message_id != ?",
+            (account, thread_id, sent_message_id)
+        ).fetchall()
+        updated = 0
+        for message_id, data in rows:
+            email = json.loads(data)
+            if not email.get("already_replied"):
+                email["already_replied"] = True
+                self._conn.execute(
+                    "UPDATE messages SET data = ? WHERE account = ? AND message_id = ?",
+                    (json.dumps(email, ensure_ascii=False), account, message_id)
+                )
+                updated += 1
+        return updated
+
+    def apply_sync(
+        self,
+        account: str,
+        expected_cursor: Optional[str],
+        history_id: str,
+        messages: List[Dict],
+        removed: Optional[List[str]] = None,
+        sent: Iterable[Tuple[str, str]] = ()
+    ) -> Optional[int]:
+        """
+        Grava uma sincronização de uma vez, só se o cursor da conta ainda for
+        expected_cursor (o lido antes de buscar as mudanças). removed None
+        indica sincronização completa: a conta é zerada antes. sent traz os
+        pares (thread, mensagem enviada) a marcar como respondidos.
+
+        Retorna quantos emails foram marcados como respondidos, ou None se
+        outra sincronização da conta gravou antes (nada é alterado).
+        """
+        with self._lock:
+            if self._get_cursor(account) != expected_cursor:
+                return None
+            if removed is None:
+                self._reset(account)
+            else:
+                self._remove_messages(account, removed)
+            self._save_messages(account, messages)
+            replied = sum(self._mark_replied(account, thread_id, message_id) for thread_id, message_id in sent)
+            self._set_cursor(account, history_id)
+            self._conn.commit()
+        return replied
+
+    def latest(self, account: str, limit: int) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM messages WHERE account = ? ORDER BY internal_date DESC LIMIT ?",
+                (account, limit)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
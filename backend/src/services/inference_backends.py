@@ -0,0 +1,61 @@
+import logging
+
+import torch
+from transformers import AutoTokenizer, pipeline
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("fp32", "int8", "onnx")
+
+# Classes do optimum usadas para exportar cada tarefa para ONNX
+_ONNX_MODEL_CLASSES = {
+    "zero-shot-classification": "ORTModelForSequenceClassification",
+    "text2text-generation": "ORTModelForSeq2SeqLM"
+}
+
+
+def load_pipeline(task: str, model: str, backend: str = "fp32", device: int = -1):
+    """
+    Carrega um pipeline Hugging Face com o backend de inferência escolhido.
+
+    - fp32: pesos originais em float32 (padrão).
+    - int8: quantização dinâmica das camadas Linear com
+      torch.quantization.quantize_dynamic (apenas CPU).
+    - onnx: grafo exportado e executado pelo ONNX Runtime (requer optimum[onnxruntime]).
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend de inferência inválido: {backend} (use {', '.join(BACKENDS)})")
+
+    if backend != "fp32" and device != -1:
+        logger.warning(f"Backend '{backend}' só é suportado em CPU; usando fp32 na GPU")
+        backend = "fp32"
+
+    if backend == "onnx":
+        return _load_onnx_pipeline(task, model)
+
+    loaded = pipeline(
+        task,
+        model=model,
+        device=device,
+        model_kwargs={"torch_dtype": torch.float32}
+    )
+    if backend == "int8":
+        loaded.model = torch.quantization.quantize_dynamic(
+            loaded.model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+        loaded.model.eval()
+    return loaded
+
+
+def _load_onnx_pipeline(task: str, model: str):
+    try:
+        import optimum.onnxruntime as ort
+    except ImportError as e:
+        raise RuntimeError(
+            "Backend 'onnx' requer o pacote optimum[onnxruntime] (pip install optimum[onnxruntime])"
+        ) from e
+
+    model_class = getattr(ort, _ONNX_MODEL_CLASSES[task])
+    onnx_model = model_class.from_pretrained(model, export=True)
+    tokenizer = AutoTokenizer.from_pretrained(model)
+    return pipeline(task, model=onnx_model, tokenizer=tokenizer, device=-1)
@@ -0,0 +1,322 @@
+import asyncio
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, AsyncIterator, Callable, Optional
+
+from src.core.config import settings
+from src.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+# Marcadores das entradas trocadas entre a thread do gerador e o consumidor
+_ITEM, _END, _ERROR = object(), object(), object()
+
+
+class ExecutorQueueFull(Exception):
+    """
+    Levantada quando a fila do executor está cheia e a tarefa foi recusada.
+    """
+
+
+class BoundedExecutor:
+    """
+    Executor com fila limitada para tirar chamadas bloqueantes do event loop.
+
+    No máximo max_workers tarefas rodam ao mesmo tempo e até max_queue ficam
+    aguardando; além disso as novas tarefas são recusadas com ExecutorQueueFull
+    em vez de acumularem memória e latência. Cada chamada tem um timeout.
+
+    Em executores de processo, initializer roda uma vez em cada processo
+    novo, e as métricas registradas no processo durante a chamada voltam
+    com o resultado e são somadas às do processo principal.
+    """
+
+    def __init__(
+        self,
+        kind: str = "thread",
+        max_workers: int = 2,
+        max_queue: int = 32,
+        timeout: Optional[float] = 60.0,
+        name: str = "executor",
+        start_method: Optional[str] = None,
+        initializer: Optional[Callable] = None
+    ):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Tipo de executor inválido: {kind} (use 'thread' ou 'process')")
+        self.kind = kind
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.timeout = timeout
+        self.name = name
+        # Só para executores de processo: fork (padrão no Linux), spawn ou forkserver
+        self.start_method = start_method
+        self.initializer = initializer
+
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_queue)
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._executor: Optional[Executor] = None
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self) -> Executor:
+        with self._executor_lock:
+            if self._executor is None:
+                if self.kind == "process":
+                    # Cada processo carrega sua própria cópia dos modelos
+                    context = multiprocessing.get_context(self.start_method) if self.start_method else None
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers, mp_context=context, initializer=self.initializer
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix=self.name
+                    )
+            return self._executor
+
+    def _submit(self, func: Callable, *args, block: bool = False) -> Future:
+        if not self._slots.acquire(blocking=block):
+            raise ExecutorQueueFull(f"{self.name}: fila cheia ({self.max_workers + self.max_queue} tarefas)")
+
+        try:
+            future = self._get_executor().submit(func, *args)
+        except BrokenProcessPool:
+            self._reset_broken_pool()
+            try:
+                future = self._get_executor().submit(func, *args)
+            except Exception:
+                self._slots.release()
+                raise
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._pending_lock:
+            self._pending += 1
+        future.add_done_callback(self._on_done)
+        return future
+
+    async def run(self, func: Callable, *args, timeout: Optional[float] = None) -> Any:
+        """
+        Executa func(*args) no pool e aguarda o resultado sem bloquear o loop.
+
+        Levanta ExecutorQueueFull se a fila estiver cheia e asyncio.TimeoutError
+        se o resultado não chegar dentro do timeout. A tarefa que estourou o
+        timeout continua ocupando sua vaga até terminar, para que a fila
+        continue refletindo o trabalho real em andamento.
+        """
+        if self.kind == "process":
+            future = self._submit(_call_collecting_metrics, func, *args)
+        else:
+            future = self._submit(func, *args)
+        try:
+            result = await asyncio.wait_for(
+                asyncio.wrap_future(future),
+                timeout=timeout if timeout is not None else self.timeout
+            )
+        except asyncio.TimeoutError:
+            # Só surte efeito se a tarefa ainda estiver na fila
+            future.cancel()
+            logger.warning(f"{self.name}: tarefa {getattr(func, '__name__', func)} excedeu o timeout")
+            raise
+        except BrokenProcessPool:
+            # Um processo morreu (ex.: falta de memória); o próximo pedido
+            # recria o pool em vez de falhar para sempre
+            self._reset_broken_pool()
+            raise
+        if self.kind == "process":
+            result, drained = result
+            metrics.merge(drained)
+        return result
+
+    def call(self, func: Callable, *args, timeout: Optional[float] = None) -> Any:
+        """
+        Versão bloqueante de run para threads de segundo plano (jobs em lote,
+        monitoramento IMAP): o trabalho delas também respeita max_workers,
+        mas espera uma vaga em vez de ser recusado com ExecutorQueueFull.
+
+        Levanta concurrent.futures.TimeoutError se o resultado não chegar
+        dentro do timeout.
+        """
+        if self.kind == "process":
+            future = self._submit(_call_collecting_metrics, func, *args, block=True)
+        else:
+            future = self._submit(func, *args, block=True)
+        try:
+            result = future.result(timeout=timeout if timeout is not None else self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            logger.warning(f"{self.name}: tarefa {getattr(func, '__name__', func)} excedeu o timeout")
+            raise
+        except BrokenProcessPool:
+            self._reset_broken_pool()
+            raise
+        if self.kind == "process":
+            result, drained = result
+            metrics.merge(drained)
+        return result
+
+    def _reset_broken_pool(self):
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            logger.warning(f"{self.name}: pool de processos quebrado, recriando")
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def iterate(
+        self,
+        func: Callable,
+        *args,
+        max_buffered: int = 2,
+        timeout: Optional[float] = None
+    ) -> AsyncIterator[Any]:
+        """
+        Consome o gerador bloqueante func(*args) em uma thread do pool,
+        entregando cada item assim que fica pronto.
+
+        O gerador pausa quando max_buffered itens aguardam o consumidor
+        (contrapressão) e é fechado na própria thread quando o consumidor
+        desiste. O timeout vale para a espera de cada item. Apenas para
+        executores de thread.
+        """
+        if self.kind != "thread":
+            raise ValueError("iterate só é suportado em executores de thread")
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, max_buffered))
+        stop = threading.Event()
+
+        def put(entry) -> bool:
+            future = asyncio.run_coroutine_threadsafe(queue.put(entry), loop)
+            while not stop.is_set():
+                try:
+                    future.result(timeout=0.1)
+                    return True
+                except FutureTimeoutError:
+                    continue
+            future.cancel()
+            return False
+
+        def produce():
+            generator = func(*args)
+            try:
+                for item in generator:
+                    if not put((_ITEM, item)):
+                        return
+                put((_END, None))
+            except Exception as e:
+                put((_ERROR, e))
+            finally:
+                generator.close()
+
+        self._submit(produce)
+        try:
+            while True:
+                kind, value = await asyncio.wait_for(
+                    queue.get(),
+                    timeout=timeout if timeout is not None else self.timeout
+                )
+                if kind is _END:
+                    return
+                if kind is _ERROR:
+                    raise value
+                yield value
+        finally:
+            stop.set()
+
+    def _on_done(self, _future):
+        with self._pending_lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def stats(self) -> dict:
+        """
+        Retorna o tipo do pool e quantas tarefas estão em execução ou na fila.
+        """
+        with self._pending_lock:
+            pending = self._pending
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "pending": pending,
+            "in_flight": min(pending, self.max_workers),
+            "queued": max(0, pending - self.max_workers)
+        }
+
+    def shutdown(self, wait: bool = True):
+        """
+        Encerra o pool, cancelando tarefas que ainda não começaram.
+        """
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+
+def _call_collecting_metrics(func: Callable, *args):
+    # Roda no processo do pool: devolve o resultado com as métricas da chamada
+    metrics.drain()
+    result = func(*args)
+    return result, metrics.drain()
+
+
+def _init_inference_process():
+    # Importado aqui: ai_services não é carregado nos processos de PDF
+    from src.services import ai_services
+    ai_services.init_worker_process()
+
+
+# Pool dedicado aos modelos de IA (classificação e geração)
+inference_executor = BoundedExecutor(
+    kind=settings.INFERENCE_EXECUTOR_KIND,
+    max_workers=settings.INFERENCE_MAX_WORKERS,
+    max_queue=settings.INFERENCE_MAX_QUEUE,
+    timeout=settings.INFERENCE_TIMEOUT_SECONDS,
+    name="inference",
+    initializer=_init_inference_process
+)
+
+# Pool para chamadas de rede bloqueantes (IMAP e Gmail API)
+io_executor = BoundedExecutor(
+    kind="thread",
+    max_workers=settings.IO_MAX_WORKERS,
+    max_queue=settings.IO_MAX_QUEUE,
+    timeout=settings.IO_TIMEOUT_SECONDS,
+    name="io"
+)
+
+# Pool de processos para extrair texto de PDFs; spawn evita herdar a memória
+# dos modelos e as threads do processo principal
+pdf_executor = BoundedExecutor(
+    kind="process",
+    max_workers=settings.PDF_MAX_WORKERS,
+    max_queue=settings.PDF_MAX_QUEUE,
+    timeout=settings.PDF_TIMEOUT_SECONDS,
+    name="pdf",
+    start_method="spawn"
+)
+
+
+_executors = (inference_executor, io_executor, pdf_executor)
+metrics.register_gauge(
+    "executor_in_flight", "Tarefas em execução por executor (inference = inferência em andamento).",
+    lambda: {executor.name: executor.stats()["in_flight"] for executor in _executors}, label="executor"
+)
+metrics.register_gauge(
+    "executor_queue_depth", "Tarefas aguardando uma vaga por executor.",
+    lambda: {executor.name: executor.stats()["queued"] for executor in _executors}, label="executor"
+)
+
+
+def shutdown_executors(wait: bool = True):
+    """
+    Encerra os pools de inferência, de I/O e de PDFs (chamado no shutdown da aplicação).
+    """
+    inference_executor.shutdown(wait=wait)
+    io_executor.shutdown(wait=wait)
+    pdf_executor.shutdown(wait=wait)
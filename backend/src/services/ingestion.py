@@ -0,0 +1,199 @@
+"""
+Ingestão de arquivos enviados ao /analyze.
+
+O upload é lido em blocos de UPLOAD_CHUNK_SIZE com limite de tamanho: .txt
+é decodificado de forma incremental e a leitura para quando já há texto
+suficiente para a classificação; .pdf é copiado em blocos para um arquivo
+temporário e extraído página a página por extract_pdf_text, que roda em um
+processo separado (pdf_executor) para não travar o event loop.
+"""
+import codecs
+import json
+import os
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+import PyPDF2
+
+from src.services.metrics import metrics
+
+
+class UploadTooLarge(Exception):
+    """
+    Levantada quando o arquivo enviado passa de UPLOAD_MAX_BYTES.
+    """
+
+
+def _check_declared_size(file, max_bytes: int):
+    # Starlette informa o tamanho quando o multipart já foi recebido
+    size = getattr(file, "size", None)
+    if size is not None and size > max_bytes:
+        raise UploadTooLarge(f"Arquivo maior que o limite de {max_bytes} bytes.")
+
+
+async def read_text_upload(file, max_bytes: int, max_chars: int, chunk_size: int) -> Tuple[str, Dict]:
+    """
+    Lê e decodifica um .txt (UTF-8, com ou sem BOM) bloco a bloco. Para de ler
+    quando passa de max_chars caracteres (um arquivo com exatamente max_chars
+    é lido até o fim e não conta como truncado). Retorna o texto e os metadados da
+    ingestão (bytes lidos, truncamento e tempos por etapa).
+    """
+    _check_declared_size(file, max_bytes)
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    parts = []
+    chars = size = 0
+    upload_s = decode_s = 0.0
+    truncated = False
+    try:
+        while True:
+            started = time.perf_counter()
+            chunk = await file.read(chunk_size)
+            upload_s += time.perf_counter() - started
+            started = time.perf_counter()
+            if not chunk:
+                parts.append(decoder.decode(b"", final=True))
+                decode_s += time.perf_counter() - started
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(f"Arquivo maior que o limite de {max_bytes} bytes.")
+            piece = decoder.decode(chunk)
+            decode_s += time.perf_counter() - started
+            parts.append(piece)
+            chars += len(piece)
+            if chars > max_chars:
+                # Texto suficiente; o restante do arquivo nem é lido. Bytes
+                # de um caractere incompleto no fim do bloco ficam depois do
+                # corte, então não faltam no texto devolvido
+                truncated = True
+                break
+    except UnicodeDecodeError as e:
+        raise ValueError(f"O arquivo .txt deve estar em UTF-8 ({e.reason} na posição {e.start}).")
+
+    metrics.observe("upload", upload_s)
+    metrics.observe("text_decode", decode_s)
+    text = "".join(parts)
+    if len(text) > max_chars:
+        text = text[:max_chars]
+    return text, {
+        "bytes_read": size,
+        "truncated": truncated,
+        "stop_reason": "max_chars" if truncated else None,
+        "timings_ms": {
+            "upload": round(upload_s * 1000, 2),
+            "decode": round(decode_s * 1000, 2)
+        }
+    }
+
+
+async def spool_upload(file, max_bytes: int, chunk_size: int, suffix: str = "") -> Tuple[str, Dict]:
+    """
+    Copia o upload em blocos para um arquivo temporário (o PDF precisa do
+    arquivo inteiro). Retorna o caminho, que deve ser removido por quem
+    chamou, e os metadados da cópia.
+    """
+    _check_declared_size(file, max_bytes)
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    size = 0
+    started = time.perf_counter()
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"Arquivo maior que o limite de {max_bytes} bytes.")
+                out.write(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    elapsed = time.perf_counter() - started
+    metrics.observe("upload", elapsed)
+    return path, {
+        "bytes_read": size,
+        "timings_ms": {"upload": round(elapsed * 1000, 2)}
+    }
+
+
+def extract_pdf_text(path: str, max_pages: int, max_chars: int) -> Dict:
+    """
+    Extrai o texto de um PDF página a página, parando em max_pages páginas
+    ou quando max_chars caracteres já foram coletados. Roda no pdf_executor.
+    """
+    reader = PyPDF2.PdfReader(path)
+    pages_total = len(reader.pages)
+    parts = []
+    chars = 0
+    stop_reason: Optional[str] = None
+    for index, page in enumerate(reader.pages):
+        if index >= max_pages:
+            stop_reason = "max_pages"
+            break
+        text = page.extract_text() or ""
+        parts.append(text)
+        chars += len(text)
+        if chars >= max_chars:
+            if index + 1 < pages_total or chars > max_chars:
+                stop_reason = "max_chars"
+            break
+    text = "".join(parts)[:max_chars]
+    return {
+        "text": text,
+        "pages_total": pages_total,
+        "pages_read": len(parts),
+        "truncated": stop_reason is not None,
+        "stop_reason": stop_reason
+    }
+
+
+async def read_jsonl_upload(file, max_bytes: int, chunk_size: int, max_items: int) -> Tuple[List[Tuple[str, Optional[str]]], int]:
+    """
+    Lê um arquivo JSONL bloco a bloco, uma linha por email: uma string JSON
+    ou um objeto com "text" e "id" opcional. Retorna os itens (texto, id) e
+    quantos emails vazios foram ignorados.
+    """
+    _check_declared_size(file, max_bytes)
+    items: List[Tuple[str, Optional[str]]] = []
+    skipped = size = 0
+    line_number = 0
+    pending = b""
+
+    def parse(line: bytes):
+        nonlocal skipped
+        if not line.strip():
+            return
+        try:
+            value = json.loads(line)
+        except (UnicodeDecodeError, ValueError) as e:
+            raise ValueError(f"Linha {line_number} do JSONL inválida: {e}")
+        if isinstance(value, dict):
+            text, external_id = value.get("text"), value.get("id")
+        else:
+            text, external_id = value, None
+        if not isinstance(text, str):
+            raise ValueError(f"Linha {line_number} do JSONL sem texto (use uma string ou {{\"text\": ...}}).")
+        if not text.strip():
+            skipped += 1
+            return
+        if len(items) >= max_items:
+            raise ValueError(f"Máximo de {max_items} emails por job.")
+        items.append((text, str(external_id) if external_id is not None else None))
+
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_bytes:
+            raise UploadTooLarge(f"Arquivo maior que o limite de {max_bytes} bytes.")
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            line_number += 1
+            parse(line)
+    line_number += 1
+    parse(pending)
+    return items, skipped
@@ -0,0 +1,168 @@
+"""
+Fila de jobs de análise em lote.
+
+Um job é aceito de imediato (gravado no JobStore) e processado em segundo
+plano por threads de trabalho, em lotes de GENERATOR_BATCH_SIZE itens com
+analyze_emails. Cada lote roda no executor de inferência, dividindo as vagas
+(INFERENCE_MAX_WORKERS) com as requisições. Jobs são atendidos em ordem de chegada
+e, acima de JOBS_MAX_PENDING_ITEMS itens aguardando, novos jobs são
+recusados com JobQueueFull. No reinício, os itens que estavam em
+processamento voltam para a fila.
+"""
+import logging
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from src.core.config import settings
+from src.services.ai_services import analyze_emails
+from src.services.inference_executor import inference_executor
+from src.services.job_store import JobStore
+from src.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueueFull(Exception):
+    """
+    Levantada quando há itens demais aguardando processamento.
+    """
+
+
+class JobQueue:
+    def __init__(self, db_path: str, workers: int = 1, max_pending_items: int = 50000):
+        self.db_path = db_path
+        self.workers = max(1, workers)
+        self.max_pending_items = max_pending_items
+        self._store: Optional[JobStore] = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._stopping = False
+        self._threads: List[threading.Thread] = []
+        self.batches = 0
+
+    @property
+    def store(self) -> JobStore:
+        with self._lock:
+            if self._store is None:
+                self._store = JobStore(self.db_path)
+            return self._store
+
+    def resume(self):
+        """
+        Retoma jobs aceitos antes de um reinício (chamado no startup). Sem
+        arquivo de estado não há o que retomar e nada é criado.
+        """
+        if not os.path.exists(self.db_path):
+            return
+        recovered = self.store.recover()
+        if recovered:
+            logger.info(f"{recovered} itens de jobs interrompidos voltaram para a fila")
+        self._start_workers()
+
+    def submit(self, items: List[Tuple[str, Optional[str]]], style: str = "padrao",
+               sender_name: Optional[str] = None) -> Dict:
+        """
+        Aceita um job com os itens (texto, id externo opcional) e retorna o
+        seu estado inicial.
+        """
+        pending = self.store.pending_items()
+        if pending + len(items) > self.max_pending_items:
+            raise JobQueueFull(f"Fila de jobs cheia ({pending} itens aguardando).")
+        job_id = self.store.create_job(items, style, sender_name)
+        self._start_workers()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        return self.store.get_job(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        return self.store.get_job(job_id)
+
+    def results(self, job_id: str, cursor: int = 0, limit: int = 100) -> Tuple[List[Dict], int]:
+        return self.store.results(job_id, cursor, limit)
+
+    def cancel(self, job_id: str) -> bool:
+        return self.store.cancel(job_id)
+
+    def stop(self, timeout: float = 5.0):
+        """
+        Para as threads depois do lote em andamento; itens não concluídos
+        continuam no SQLite para o próximo startup.
+        """
+        with self._wakeup:
+            self._stopping = True
+            threads, self._threads = self._threads, []
+            self._wakeup.notify_all()
+        for thread in threads:
+            thread.join(timeout)
+        with self._lock:
+            self._stopping = False
+
+    def stats(self) -> Dict:
+        with self._lock:
+            store = self._store
+            workers = len(self._threads)
+        return {
+            "workers": workers,
+            "batches": self.batches,
+            "jobs": store.counts() if store else {},
+            "pending_items": store.pending_items() if store else 0
+        }
+
+    def _start_workers(self):
+        with self._lock:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(
+                    target=self._work, name=f"job-worker-{len(self._threads)}", daemon=True
+                )
+                self._threads.append(thread)
+                thread.start()
+
+    def _work(self):
+        store = self.store
+        while True:
+            with self._wakeup:
+                if self._stopping:
+                    return
+            claimed = store.claim_batch(max(1, settings.GENERATOR_BATCH_SIZE))
+            if claimed is None:
+                with self._wakeup:
+                    if self._stopping:
+                        return
+                    self._wakeup.wait(settings.JOBS_IDLE_POLL_SECONDS)
+                continue
+            job, items = claimed
+            try:
+                store.save_results(job["job_id"], _analyze_items(items, job["style"], job["sender_name"]))
+                with self._lock:
+                    self.batches += 1
+            except Exception as e:
+                logger.error(f"Falha no lote do job {job['job_id']}: {str(e)}")
+                store.release_batch(job["job_id"], [idx for idx, _, _ in items])
+                # Evita girar sem parar se o erro for persistente (ex.: modelo indisponível)
+                with self._wakeup:
+                    self._wakeup.wait(settings.JOBS_IDLE_POLL_SECONDS)
+
+
+def _analyze_items(items: List[Tuple[int, str, Optional[str]]], style: str, sender_name: Optional[str]) -> List[Dict]:
+    analyzed = inference_executor.call(analyze_emails, [text for _, text, _ in items], style, sender_name)
+    return [
+        {
+            "index": idx,
+            "id": external_id,
+            "email_preview": text[:50] + "..." if len(text) > 50 else text,
+            **outcome
+        }
+        for (idx, text, external_id), outcome in zip(items, analyzed)
+    ]
+
+
+job_queue = JobQueue(
+    db_path=settings.JOBS_DB_PATH,
+    workers=settings.JOBS_WORKERS,
+    max_pending_items=settings.JOBS_MAX_PENDING_ITEMS
+)
+metrics.register_gauge(
+    "jobs_pending_items", "Itens de jobs em lote aguardando ou em processamento.",
+    lambda: job_queue.stats()["pending_items"]
+)
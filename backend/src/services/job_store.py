@@ -0,0 +1,216 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+# Estados finais de um job
+FINISHED_STATUSES = ("completed", "cancelled")
+
+
+class JobStore:
+    """
+    Jobs de análise em lote e seus itens em SQLite, para que o trabalho
+    aceito sobreviva a um reinício do servidor.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "job_id TEXT PRIMARY KEY, status TEXT NOT NULL, style TEXT, sender_name TEXT, "
+            "total INTEGER NOT NULL, processed INTEGER NOT NULL DEFAULT 0, "
+            "successful INTEGER NOT NULL DEFAULT 0, failed INTEGER NOT NULL DEFAULT 0, "
+            "created_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS job_items ("
+            "job_id TEXT NOT NULL, idx INTEGER NOT NULL, text TEXT NOT NULL, external_id TEXT, "
+            "status TEXT NOT NULL, result TEXT, finished_at REAL, seq INTEGER, "
+            "PRIMARY KEY (job_id, idx))"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS job_items_pending ON job_items (status, job_id, idx)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS job_items_by_seq ON job_items (job_id, seq)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, created_at)")
+        self._conn.commit()
+
+    def create_job(self, items: List[Tuple[str, Optional[str]]], style: str, sender_name: Optional[str]) -> str:
+        """
+        Grava um job com os itens (texto, id externo opcional) e retorna o job_id.
+        """
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, status, style, sender_name, total, created_at) VALUES (?, 'queued', ?, ?, ?, ?)",
+                (job_id, style, sender_name, len(items), time.time())
+            )
+            self._conn.executemany(
+                "INSERT INTO job_items (job_id, idx, text, external_id, status) VALUES (?, ?, ?, ?, 'pending')",
+                [(job_id, i, text, external_id) for i, (text, external_id) in enumerate(items)]
+            )
+            self._conn.commit()
+        return job_id
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT job_id, status, style, sender_name, total, processed, successful, failed, "
+                "created_at, started_at, finished_at FROM jobs WHERE job_id = ?",
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(
+            ("job_id", "status", "style", "sender_name", "total", "processed", "successful", "failed",
+             "created_at", "started_at", "finished_at"),
+            row
+        ))
+        job["progress"] = round(job["processed"] / job["total"], 4) if job["total"] else 1.0
+        return job
+
+    def claim_batch(self, limit: int) -> Optional[Tuple[Dict, List[Tuple[int, str, Optional[str]]]]]:
+        """
+        Reserva até limit itens pendentes do job ativo mais antigo (FIFO entre
+        jobs). Retorna (job, [(idx, texto, id externo)]) ou None se não há trabalho.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT job_id FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            while row is not None:
+                job_id = row[0]
+                items = self._conn.execute(
+                    "SELECT idx, text, external_id FROM job_items WHERE job_id = ? AND status = 'pending' "
+                    "ORDER BY idx LIMIT ?",
+                    (job_id, limit)
+                ).fetchall()
+                if items:
+                    self._conn.executemany(
+                        "UPDATE job_items SET status = 'processing' WHERE job_id = ? AND idx = ?",
+                        [(job_id, idx) for idx, _, _ in items]
+                    )
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'running', started_at = COALESCE(started_at, ?) WHERE job_id = ?",
+                        (time.time(), job_id)
+                    )
+                    self._conn.commit()
+                    break
+                # Itens todos reservados por outro worker: tenta o próximo job
+                row = self._conn.execute(
+                    "SELECT job_id FROM jobs WHERE status IN ('queued', 'running') AND created_at > "
+                    "(SELECT created_at FROM jobs WHERE job_id = ?) ORDER BY created_at LIMIT 1",
+                    (job_id,)
+                ).fetchone()
+            else:
+                return None
+        return self.get_job(job_id), items
+
+    def save_results(self, job_id: str, results: List[Dict]):
+        """
+        Grava os resultados de itens reservados (cada um com index e status
+        success ou failed) e conclui o job quando não resta item pendente.
+
+        Cada resultado recebe um número de sequência crescente dentro do job,
+        usado como cursor por results(): com vários workers os lotes terminam
+        fora da ordem dos índices.
+        """
+        successful = sum(1 for r in results if r["status"] == "success")
+        with self._lock:
+            now = time.time()
+            last_seq = self._conn.execute(
+                "SELECT COALESCE(MAX(seq), 0) FROM job_items WHERE job_id = ?", (job_id,)
+            ).fetchone()[0]
+            self._conn.executemany(
+                "UPDATE job_items SET status = ?, result = ?, finished_at = ?, seq = ? "
+                "WHERE job_id = ? AND idx = ? AND status = 'processing'",
+                [
+                    ("done" if r["status"] == "success" else "failed", json.dumps(r, ensure_ascii=False), now,
+                     last_seq + i + 1, job_id, r["index"])
+                    for i, r in enumerate(results)
+                ]
+            )
+            self._conn.execute(
+                "UPDATE jobs SET processed = processed + ?, successful = successful + ?, failed = failed + ? "
+                "WHERE job_id = ?",
+                (len(results), successful, len(results) - successful, job_id)
+            )
+            remaining = self._conn.execute(
+                "SELECT COUNT(*) FROM job_items WHERE job_id = ? AND status IN ('pending', 'processing')",
+                (job_id,)
+            ).fetchone()[0]
+            if remaining == 0:
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'completed', finished_at = ? WHERE job_id = ? AND status = 'running'",
+                    (now, job_id)
+                )
+            self._conn.commit()
+
+    def release_batch(self, job_id: str, indexes: List[int]):
+        """
+        Devolve itens reservados para a fila (ex.: falha inesperada do worker).
+        """
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE job_items SET status = 'pending' WHERE job_id = ? AND idx = ? AND status = 'processing'",
+                [(job_id, idx) for idx in indexes]
+            )
+            self._conn.commit()
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancela um job ainda não concluído; itens já processados são mantidos.
+        """
+        with self._lock:
+            updated = self._conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ? "
+                "WHERE job_id = ? AND status IN ('queued', 'running')",
+                (time.time(), job_id)
+            ).rowcount
+            if updated:
+                self._conn.execute(
+                    "UPDATE job_items SET status = 'cancelled' WHERE job_id = ? AND status = 'pending'",
+                    (job_id,)
+                )
+            self._conn.commit()
+        return bool(updated)
+
+    def results(self, job_id: str, cursor: int = 0, limit: int = 100) -> Tuple[List[Dict], int]:
+        """
+        Resultados prontos depois do cursor, na ordem em que terminaram.
+        Retorna (resultados, novo cursor); o cursor inicial é 0.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, result FROM job_items WHERE job_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+                (job_id, cursor, limit)
+            ).fetchall()
+        return [json.loads(row[1]) for row in rows], (rows[-1][0] if rows else cursor)
+
+    def recover(self) -> int:
+        """
+        Devolve para a fila os itens que estavam em processamento quando o
+        servidor parou. Retorna quantos itens foram recuperados.
+        """
+        with self._lock:
+            recovered = self._conn.execute(
+                "UPDATE job_items SET status = 'pending' WHERE status = 'processing'"
+            ).rowcount
+            self._conn.commit()
+        return recovered
+
+    def pending_items(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM job_items WHERE status IN ('pending', 'processing')"
+            ).fetchone()[0]
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
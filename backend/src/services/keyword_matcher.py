@@ -0,0 +1,261 @@
+import re
+from typing import Dict, FrozenSet, List, NamedTuple
+
+import numpy as np
+
+from src.services.metrics import metrics
+
+# Palavras-chave mais específicas e amplas para produtivo: (palavras, peso)
+PRODUCTIVE_INDICATORS = {
+    'trabalho_negocio': (['reunião', 'meeting', 'projeto', 'project', 'negócio', 'business', 'empresa', 'company', 'contrato', 'contract'], 2),
+    'solicitacoes': (['pedido', 'solicitação', 'request', 'orçamento', 'budget', 'proposta', 'proposal', 'cotação'], 2),
+    'urgencia': (['urgente', 'urgent', 'importante', 'important', 'prioridade', 'priority', 'deadline', 'prazo'], 2),
+    'comercial': (['venda', 'sale', 'compra', 'buy', 'cliente', 'customer', 'fornecedor', 'supplier'], 1),
+    'colaboracao': (['colaboração', 'partnership', 'parceria', 'trabalhar juntos', 'work together'], 1),
+    'problemas': (['problema', 'issue', 'erro', 'error', 'bug', 'falha', 'failure', 'suporte', 'support'], 1),
+    'documentos': (['documento', 'document', 'relatório', 'report', 'planilha', 'spreadsheet', 'arquivo', 'file'], 1)
+}
+
+# Palavras-chave que indicam email improdutivo: (palavras, peso)
+UNPRODUCTIVE_INDICATORS = {
+    'pessoal': (['parabéns', 'congratulations', 'feliz aniversário', 'happy birthday', 'felicidades'], 1),
+    'social': (['convite', 'invitation', 'festa', 'party', 'evento social', 'social event'], 1),
+    'spam': (['promoção', 'promotion', 'desconto', 'discount', 'oferta especial', 'special offer', 'newsletter'], 2),
+    'casual': (['como vai', 'how are you', 'oi', 'hi', 'olá', 'hello', 'tchau', 'bye'], 1),
+    'agradecimento': (['obrigado', 'thank you', 'thanks', 'agradecimento'], 1)
+}
+
+# Listas usadas na extração de insights (palavras-chave, urgência e tom)
+INSIGHT_KEYWORDS = {
+    'palavras_produtivo': ['urgente', 'importante', 'prazo', 'reunião', 'projeto', 'contrato', 'negócio', 'proposta'],
+    'palavras_improdutivo': ['obrigado', 'parabéns', 'feliz', 'convite', 'pessoal'],
+    'urgencia_alta': ['urgente', 'imediato', 'asap', 'prioritário'],
+    'urgencia_baixa': ['quando possível', 'sem pressa', 'qualquer hora'],
+    'tom_cordial': ['por favor', 'obrigado', 'agradeço', 'grato'],
+    'tom_urgente': ['urgente', 'imediato', 'rápido'],
+    'tom_preocupado': ['problema', 'erro', 'falha'],
+    'tom_positivo': ['parabéns', 'feliz', 'excelente']
+}
+
+
+class KeywordScore(NamedTuple):
+    productive: int
+    unproductive: int
+    word_count: int
+    matches: FrozenSet[str]
+
+    @property
+    def label(self) -> str:
+        return _decide(self.productive, self.unproductive, self.word_count)
+
+    @property
+    def confidence(self) -> float:
+        """
+        Confiança baseada na margem entre os placares, entre 0.5 (empate) e 1.
+        A suavização evita que uma única palavra-chave gere confiança alta.
+        """
+        return _margin_confidence(self.productive, self.unproductive)
+
+    def probabilities(self) -> Dict[str, float]:
+        """
+        Converte os placares em pontuações no formato do classificador
+        ({categoria: pontuação}, somando 1).
+        """
+        confidence = self.confidence
+        # No empate a decisão usa o tamanho do texto; a pontuação acompanha
+        if confidence == 0.5:
+            confidence = 0.5001
+        other = "improdutivo" if self.label == "produtivo" else "produtivo"
+        return {self.label: round(confidence, 4), other: round(1 - confidence, 4)}
+
+
+# Peso extra no denominador da margem (ver KeywordScore.confidence)
+CONFIDENCE_SMOOTHING = 2.0
+
+
+def _margin_confidence(productive, unproductive):
+    # Funciona com escalares e com arrays NumPy
+    margin = abs(productive - unproductive)
+    return 0.5 + 0.5 * margin / (productive + unproductive + CONFIDENCE_SMOOTHING)
+
+
+def _build_vocabulary() -> List[str]:
+    words = []
+    for keywords, _ in list(PRODUCTIVE_INDICATORS.values()) + list(UNPRODUCTIVE_INDICATORS.values()):
+        words.extend(keywords)
+    for keywords in INSIGHT_KEYWORDS.values():
+        words.extend(keywords)
+    return list(dict.fromkeys(words))
+
+
+VOCABULARY = _build_vocabulary()
+_INDEX = {word: i for i, word in enumerate(VOCABULARY)}
+
+
+def _trie_pattern(words: List[str]) -> str:
+    """
+    Monta uma regex em forma de trie (prefixos compartilhados), equivalente a
+    um autômato Aho-Corasick: em cada posição do texto só é seguido o ramo do
+    caractere atual, e o ramo mais longo é preferido.
+    """
+    trie: Dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def build(node: Dict) -> str:
+        terminal = "" in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if terminal:
+            return "(?:" + body + ")?"
+        return body
+
+    return build(trie)
+
+
+# Uma única regex com todas as palavras; cada busca retorna a palavra mais
+# longa que começa na próxima posição candidata do texto.
+_PATTERN = re.compile(_trie_pattern(VOCABULARY))
+
+# Palavras contidas em outras (ex.: 'erro' em 'error', 'oi' em 'oito'...) são
+# marcadas junto com a palavra maior, preservando a semântica de substring
+# de "palavra in texto" sem precisar de uma passada por palavra.
+_IMPLIED = {
+    word: frozenset(other for other in VOCABULARY if other in word)
+    for word in VOCABULARY
+}
+
+# Matriz de pesos (palavras x [produtivo, improdutivo]) para o placar em lote
+_WEIGHTS = np.zeros((len(VOCABULARY), 2), dtype=np.int32)
+for _keywords, _weight in PRODUCTIVE_INDICATORS.values():
+    for _word in _keywords:
+        _WEIGHTS[_INDEX[_word], 0] += _weight
+for _keywords, _weight in UNPRODUCTIVE_INDICATORS.values():
+    for _word in _keywords:
+        _WEIGHTS[_INDEX[_word], 1] += _weight
+_WORD_WEIGHTS = {word: (int(_WEIGHTS[i, 0]), int(_WEIGHTS[i, 1])) for word, i in _INDEX.items()}
+
+
+def find_keywords(text_lower: str) -> FrozenSet[str]:
+    """
+    Retorna todas as palavras do vocabulário presentes no texto (já em
+    minúsculas), em uma única passada.
+    """
+    found = set()
+    seen = set()
+    search = _PATTERN.search
+    match = search(text_lower)
+    while match:
+        word = match.group()
+        if word not in seen:
+            seen.add(word)
+            found.update(_IMPLIED[word])
+        # Recomeça logo após o início da ocorrência para achar palavras sobrepostas
+        match = search(text_lower, match.start() + 1)
+    return frozenset(found)
+
+
+def _decide(productive: int, unproductive: int, word_count: int) -> str:
+    # Decisão final
+    if productive > unproductive:
+        return "produtivo"
+    if unproductive > productive:
+        return "improdutivo"
+    # Em caso de empate, emails longos tendem a ser mais produtivos
+    return "produtivo" if word_count > 20 else "improdutivo"
+
+
+def score_text(text: str) -> KeywordScore:
+    """
+    Calcula os placares produtivo/improdutivo de um email.
+    """
+    with metrics.timer("keyword_scoring"):
+        matches = find_keywords(text.lower())
+        productive = sum(_WORD_WEIGHTS[word][0] for word in matches)
+        unproductive = sum(_WORD_WEIGHTS[word][1] for word in matches)
+
+        word_count = len(text.split())
+        productive, unproductive = _adjust(productive, unproductive, text, word_count)
+    return KeywordScore(productive, unproductive, word_count, matches)
+
+
+def _adjust(productive: int, unproductive: int, text: str, word_count: int):
+    # Mensagens muito curtas tendem a ser improdutivas
+    if word_count < 5:
+        unproductive += 1
+    # Perguntas ou chamadas para ação são indicativo de produtivo
+    if productive > 0 and ('?' in text or '!' in text):
+        productive += 1
+    return productive, unproductive
+
+
+def classify_text(text: str) -> str:
+    """
+    Classifica um email apenas por palavras-chave (modo degradado sem modelo).
+    """
+    return score_text(text).label
+
+
+def score_batch(texts: List[str]) -> np.ndarray:
+    """
+    Calcula os placares de vários emails de uma vez.
+
+    Retorna uma matriz (n, 2) com os placares produtivo e improdutivo já
+    ajustados por tamanho e pontuação.
+    """
+    hits = np.zeros((len(texts), len(VOCABULARY)), dtype=np.int32)
+    for i, text in enumerate(texts):
+        for word in find_keywords(text.lower()):
+            hits[i, _INDEX[word]] = 1
+    scores = hits @ _WEIGHTS
+
+    word_counts = np.fromiter((len(text.split()) for text in texts), dtype=np.int32, count=len(texts))
+    has_call = np.fromiter(('?' in text or '!' in text for text in texts), dtype=bool, count=len(texts))
+    scores[:, 1] += word_counts < 5
+    scores[:, 0] += has_call & (scores[:, 0] > 0)
+    return scores
+
+
+def classify_batch(texts: List[str]) -> List[str]:
+    """
+    Classifica vários emails por palavras-chave de forma vetorizada.
+    """
+    return classify_batch_with_confidence(texts)[0]
+
+
+def classify_batch_with_confidence(texts: List[str]):
+    """
+    Versão vetorizada de classify_text que também retorna a confiança por
+    margem de cada email: (categorias, confiancas).
+    """
+    if not texts:
+        return [], np.zeros(0)
+    with metrics.timer("keyword_scoring"):
+        scores = score_batch(texts)
+        word_counts = np.fromiter((len(text.split()) for text in texts), dtype=np.int32, count=len(texts))
+        productive = (scores[:, 0] > scores[:, 1]) | ((scores[:, 0] == scores[:, 1]) & (word_counts > 20))
+        labels = ["produtivo" if flag else "improdutivo" for flag in productive.tolist()]
+        return labels, confidence_batch(scores)
+
+
+def confidence_batch(scores: np.ndarray) -> np.ndarray:
+    """
+    Confiança por margem para a matriz retornada por score_batch.
+    """
+    return _margin_confidence(scores[:, 0].astype(np.float64), scores[:, 1].astype(np.float64))
+
+
+def insight_keywords(matches: FrozenSet[str]) -> Dict[str, List[str]]:
+    """
+    Agrupa as palavras encontradas nas listas de insights, mantendo a ordem
+    original de cada lista.
+    """
+    return {
+        name: [word for word in words if word in matches]
+        for name, words in INSIGHT_KEYWORDS.items()
+    }
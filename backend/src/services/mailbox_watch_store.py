@@ -0,0 +1,108 @@
+import json
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+
+class MailboxWatchStore:
+    """
+    Estado do monitoramento IMAP em SQLite: o último UID visto em cada conta
+    (junto com o UIDVALIDITY da caixa) e os emails já classificados.
+    """
+
+    def __init__(self, path: str, max_messages_per_account: int = 500):
+        self.path = path
+        self.max_messages_per_account = max_messages_per_account
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS watch_cursors ("
+            "account TEXT PRIMARY KEY, uidvalidity INTEGER NOT NULL, last_uid INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS watch_messages ("
+            "account TEXT NOT NULL, uidvalidity INTEGER NOT NULL, uid INTEGER NOT NULL, "
+            "category TEXT, classified_at REAL NOT NULL, data TEXT NOT NULL, "
+            "PRIMARY KEY (account, uidvalidity, uid))"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS watch_messages_by_time ON watch_messages (account, classified_at DESC)"
+        )
+        self._conn.commit()
+
+    def get_cursor(self, account: str) -> Optional[Tuple[int, int]]:
+        """
+        Retorna (uidvalidity, last_uid) da conta ou None.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT uidvalidity, last_uid FROM watch_cursors WHERE account = ?", (account,)
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def set_cursor(self, account: str, uidvalidity: int, last_uid: int):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO watch_cursors (account, uidvalidity, last_uid) VALUES (?, ?, ?)",
+                (account, int(uidvalidity), int(last_uid))
+            )
+            self._conn.commit()
+
+    def save_messages(self, account: str, messages: List[Dict]):
+        """
+        Grava emails classificados: cada item tem uidvalidity, uid,
+        classified_at e o dicionário devolvido pela API em email.
+        """
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO watch_messages (account, uidvalidity, uid, category, classified_at, data) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (account, int(m["uidvalidity"]), int(m["uid"]), m["email"].get("category"),
+                     m["classified_at"], json.dumps(m["email"], ensure_ascii=False))
+                    for m in messages
+                ]
+            )
+            # Mantém só os emails mais recentes de cada conta
+            self._conn.execute(
+                "DELETE FROM watch_messages WHERE account = ? AND rowid NOT IN ("
+                "SELECT rowid FROM watch_messages WHERE account = ? ORDER BY classified_at DESC LIMIT ?)",
+                (account, account, self.max_messages_per_account)
+            )
+            self._conn.commit()
+
+    def latest(
+        self,
+        account: str,
+        limit: int,
+        since: Optional[float] = None,
+        category: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Emails classificados da conta, do mais recente para o mais antigo,
+        opcionalmente só os classificados depois de since (timestamp Unix)
+        ou de uma categoria.
+        """
+        query = "SELECT data FROM watch_messages WHERE account = ?"
+        params: list = [account]
+        if since is not None:
+            query += " AND classified_at > ?"
+            params.append(since)
+        if category:
+            query += " AND lower(category) = lower(?)"
+            params.append(category)
+        query += " ORDER BY classified_at DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def reset(self, account: str):
+        """
+        Descarta o cursor e os emails da conta.
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM watch_cursors WHERE account = ?", (account,))
+            self._conn.execute("DELETE FROM watch_messages WHERE account = ?", (account,))
+            self._conn.commit()
@@ -0,0 +1,474 @@
+"""
+Monitoramento contínuo de caixas de entrada via IMAP IDLE.
+
+Cada conta registrada ganha uma thread com uma conexão IMAP dedicada em
+IDLE: o servidor avisa quando chega email (EXISTS) e só os UIDs acima do
+último visto são buscados, com o mesmo fetch parcial de email_reader. Os
+emails novos entram em uma fila de classificação consumida em lote por
+threads de trabalho, que rodam cada lote no executor de inferência (as
+mesmas vagas das requisições), e os resultados ficam em um
+MailboxWatchStore que a API consulta. Servidores sem IDLE caem para NOOP periódico na mesma conexão.
+
+As senhas ficam apenas em memória: depois de reiniciar o servidor as
+contas precisam ser registradas de novo (o cursor de UIDs é mantido).
+
+O registro confere as credenciais com um login antes de aceitar a conta e
+devolve um token secreto (watch_token), exigido para ler os resultados e
+para parar o monitoramento; só o hash do token fica em memória.
+"""
+import hashlib
+import hmac
+import logging
+import queue
+import secrets
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+import imapclient
+
+from src.core.config import settings
+from src.services.ai_services import analyze_emails
+from src.services.email_reader import fetch_uids
+from src.services.inference_executor import inference_executor
+from src.services.mailbox_watch_store import MailboxWatchStore
+from src.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class WatchedEmail(NamedTuple):
+    account_id: str
+    uidvalidity: int
+    uid: int
+    email: Dict
+    style: str
+    received_at: float
+
+
+class WatcherLimitReached(Exception):
+    pass
+
+
+def _token_hash(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class _Account:
+    """
+    Conta registrada e o estado da sua thread de monitoramento.
+    """
+
+    def __init__(self, account_id: str, email_address: str, password: str, imap_server: str,
+                 ssl: bool, port: Optional[int], style: str, backfill: int, token_hash: str):
+        self.account_id = account_id
+        self.token_hash = token_hash
+        self.email_address = email_address
+        self.password = password
+        self.imap_server = imap_server
+        self.ssl = ssl
+        self.port = port
+        self.style = style
+        self.backfill = backfill
+        self.stop = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.state = "connecting"
+        self.mode: Optional[str] = None
+        self.connected_at: Optional[float] = None
+        self.last_event_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.fetched = 0
+        self.reconnects = 0
+
+    def status(self) -> Dict:
+        return {
+            "account_id": self.account_id,
+            "email_address": self.email_address,
+            "imap_server": self.imap_server,
+            "style": self.style,
+            "state": self.state,
+            "mode": self.mode,
+            "connected_at": self.connected_at,
+            "last_event_at": self.last_event_at,
+            "last_error": self.last_error,
+            "fetched": self.fetched,
+            "reconnects": self.reconnects
+        }
+
+
+class MailboxWatcher:
+    """
+    Mantém uma conexão IDLE por conta registrada e classifica os emails
+    novos em segundo plano.
+    """
+
+    def __init__(self, db_path: str, max_accounts: int = 20, queue_size: int = 256, workers: int = 1):
+        self.db_path = db_path
+        self.max_accounts = max_accounts
+        self.workers = max(1, workers)
+        self._queue: "queue.Queue[Optional[WatchedEmail]]" = queue.Queue(maxsize=max(1, queue_size))
+        self._accounts: Dict[str, _Account] = {}
+        self._lock = threading.Lock()
+        self._store: Optional[MailboxWatchStore] = None
+        self._worker_threads: List[threading.Thread] = []
+        self._workers_stop = threading.Event()
+        self.classified = 0
+        self.failed = 0
+        self._latency_total = 0.0
+
+    @property
+    def store(self) -> MailboxWatchStore:
+        with self._lock:
+            if self._store is None:
+                self._store = MailboxWatchStore(self.db_path, settings.IMAP_WATCH_MAX_STORED)
+            return self._store
+
+    def register(
+        self,
+        email_address: str,
+        password: str,
+        imap_server: str = 'imap.gmail.com',
+        style: str = "padrao",
+        backfill: Optional[int] = None,
+        ssl: bool = True,
+        port: Optional[int] = None
+    ) -> Dict:
+        """
+        Começa a monitorar a conta (ou reinicia o monitoramento com as novas
+        credenciais, se já estava registrada). backfill é quantos emails não
+        lidos já existentes classificar na primeira vez que a conta é vista.
+
+        Bloqueante: faz um login de verificação (levanta LoginError com
+        credenciais erradas, sem afetar um monitoramento já ativo). Retorna o
+        estado da conta com o watch_token, mostrado só nesta resposta; um novo
+        registro invalida o token anterior.
+        """
+        account_id = account_key(email_address, imap_server, port)
+        with self._lock:
+            if account_id not in self._accounts and len(self._accounts) >= self.max_accounts:
+                raise WatcherLimitReached(f"Máximo de {self.max_accounts} contas monitoradas.")
+        _verify_login(email_address, password, imap_server, ssl, port)
+
+        token = secrets.token_urlsafe(32)
+        account = _Account(
+            account_id, email_address, password, imap_server, ssl, port, style,
+            settings.IMAP_WATCH_BACKFILL if backfill is None else max(0, backfill),
+            _token_hash(token)
+        )
+        with self._lock:
+            previous = self._accounts.get(account_id)
+            if previous is None and len(self._accounts) >= self.max_accounts:
+                raise WatcherLimitReached(f"Máximo de {self.max_accounts} contas monitoradas.")
+            self._accounts[account_id] = account
+            self._start_workers()
+        if previous is not None:
+            previous.stop.set()
+        account.thread = threading.Thread(
+            target=self._watch, args=(account,), name=f"imap-watch-{account_id[:8]}", daemon=True
+        )
+        account.thread.start()
+        return {**account.status(), "watch_token": token}
+
+    def authorize(self, account_id: str, token: Optional[str]) -> bool:
+        """
+        Confere o watch_token de uma conta registrada.
+        """
+        with self._lock:
+            account = self._accounts.get(account_id)
+        if account is None or not token:
+            return False
+        return hmac.compare_digest(account.token_hash, _token_hash(token))
+
+    def unregister(self, account_id: str) -> bool:
+        with self._lock:
+            account = self._accounts.pop(account_id, None)
+        if account is None:
+            return False
+        account.stop.set()
+        return True
+
+    def account(self, account_id: str) -> Optional[Dict]:
+        with self._lock:
+            account = self._accounts.get(account_id)
+        return account.status() if account else None
+
+    def accounts(self) -> List[Dict]:
+        with self._lock:
+            accounts = list(self._accounts.values())
+        return [account.status() for account in accounts]
+
+    def results(self, account_id: str, limit: int = 50, since: Optional[float] = None,
+                category: Optional[str] = None) -> List[Dict]:
+        return self.store.latest(account_id, limit, since, category)
+
+    def stop(self, timeout: float = 5.0):
+        """
+        Encerra as threads de monitoramento e de classificação.
+        """
+        with self._lock:
+            accounts = list(self._accounts.values())
+            self._accounts.clear()
+            workers = self._worker_threads
+            self._worker_threads = []
+            workers_stop, self._workers_stop = self._workers_stop, threading.Event()
+        for account in accounts:
+            account.stop.set()
+        # Os workers terminam o que está na fila e saem quando ela esvazia;
+        # o sentinela só adianta a saída e é dispensado com a fila cheia
+        workers_stop.set()
+        for _ in workers:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                break
+        deadline = time.monotonic() + timeout
+        for thread in [a.thread for a in accounts if a.thread] + workers:
+            thread.join(max(0.0, deadline - time.monotonic()))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            accounts = list(self._accounts.values())
+            classified = self.classified
+            latency_total = self._latency_total
+        states: Dict[str, int] = {}
+        for account in accounts:
+            states[account.state] = states.get(account.state, 0) + 1
+        return {
+            "accounts": len(accounts),
+            "states": states,
+            "queue_depth": self._queue.qsize(),
+            "classified": classified,
+            "failed": self.failed,
+            "avg_arrival_to_result_seconds": round(latency_total / classified, 3) if classified else None
+        }
+
+    # Threads de monitoramento
+
+    def _watch(self, account: _Account):
+        backoff = 1.0
+        while not account.stop.is_set():
+            server = None
+            try:
+                account.state = "connecting"
+                server = imapclient.IMAPClient(
+                    account.imap_server, port=account.port, ssl=account.ssl,
+                    timeout=settings.IMAP_TIMEOUT_SECONDS
+                )
+                server.login(account.email_address, account.password)
+                account.connected_at = time.time()
+                account.last_error = None
+                backoff = 1.0
+                self._run_session(account, server)
+            except imapclient.exceptions.LoginError as e:
+                # Senha errada não melhora com novas tentativas
+                account.state = "auth_failed"
+                account.last_error = str(e)
+                logger.warning(f"Monitoramento de {account.email_address} parado: login recusado")
+                return
+            except Exception as e:
+                account.state = "backoff"
+                account.last_error = str(e)
+                account.reconnects += 1
+                logger.warning(f"Monitoramento de {account.email_address} caiu ({e}), reconectando em {backoff:.0f}s")
+            finally:
+                if server is not None:
+                    _logout(server)
+            account.stop.wait(backoff)
+            backoff = min(backoff * 2, settings.IMAP_WATCH_MAX_BACKOFF_SECONDS)
+        account.state = "stopped"
+
+    def _run_session(self, account: _Account, server: imapclient.IMAPClient):
+        selected = server.select_folder('INBOX', readonly=True)
+        uidvalidity = int(selected.get(b'UIDVALIDITY', 0))
+        cursor = self.store.get_cursor(account.account_id)
+
+        if cursor is not None and cursor[0] == uidvalidity:
+            # Reconexão: busca o que chegou enquanto a conexão estava fora
+            last_uid = cursor[1]
+            last_uid = self._fetch_new(account, server, uidvalidity, last_uid)
+        else:
+            # Primeira vez (ou caixa recriada): só os emails a partir de agora,
+            # mais os backfill não lidos mais recentes
+            uidnext = selected.get(b'UIDNEXT')
+            last_uid = int(uidnext) - 1 if uidnext else max(server.search(['ALL']) or [0])
+            if account.backfill:
+                backlog = server.search(['UNSEEN'])[-account.backfill:]
+                self._enqueue(account, uidvalidity, fetch_uids(server, backlog))
+            self.store.set_cursor(account.account_id, uidvalidity, last_uid)
+
+        if server.has_capability('IDLE'):
+            account.mode = "idle"
+            self._idle_loop(account, server, uidvalidity, last_uid)
+        else:
+            account.mode = "poll"
+            self._poll_loop(account, server, uidvalidity, last_uid)
+
+    def _idle_loop(self, account: _Account, server: imapclient.IMAPClient, uidvalidity: int, last_uid: int):
+        while not account.stop.is_set():
+            account.state = "idle"
+            server.idle()
+            # O IDLE é renovado periodicamente (servidores derrubam após ~29min)
+            refresh_at = time.monotonic() + settings.IMAP_IDLE_REFRESH_SECONDS
+            arrived = False
+            try:
+                while not account.stop.is_set() and time.monotonic() < refresh_at:
+                    responses = server.idle_check(timeout=1.0)
+                    if any(len(r) > 1 and r[1] == b'EXISTS' for r in responses):
+                        arrived = True
+                        break
+            finally:
+                server.idle_done()
+            if arrived:
+                account.last_event_at = time.time()
+            # Busca também na renovação: um EXISTS pode chegar entre o
+            # idle_check e o idle_done (ou durante o DONE) e se perder
+            last_uid = self._fetch_new(account, server, uidvalidity, last_uid)
+
+    def _poll_loop(self, account: _Account, server: imapclient.IMAPClient, uidvalidity: int, last_uid: int):
+        while not account.stop.wait(settings.IMAP_WATCH_POLL_SECONDS):
+            account.state = "polling"
+            server.noop()
+            last_uid = self._fetch_new(account, server, uidvalidity, last_uid)
+
+    def _fetch_new(self, account: _Account, server: imapclient.IMAPClient, uidvalidity: int, last_uid: int) -> int:
+        # "n:*" sempre inclui o último UID da caixa, mesmo se for menor que n
+        uids = [uid for uid in server.search(['UID', f'{last_uid + 1}:*']) if uid > last_uid]
+        if not uids:
+            return last_uid
+        account.state = "fetching"
+        chunk_size = max(1, settings.IMAP_STREAM_CHUNK_SIZE)
+        for start in range(0, len(uids), chunk_size):
+            chunk = uids[start:start + chunk_size]
+            self._enqueue(account, uidvalidity, fetch_uids(server, chunk))
+            last_uid = max(last_uid, max(chunk))
+            self.store.set_cursor(account.account_id, uidvalidity, last_uid)
+        return last_uid
+
+    def _enqueue(self, account: _Account, uidvalidity: int, emails: List[Dict]):
+        now = time.time()
+        for email in emails:
+            account.fetched += 1
+            item = WatchedEmail(account.account_id, uidvalidity, email['uid'], email, account.style, now)
+            # Fila cheia segura a conexão IMAP até a classificação alcançar
+            while not account.stop.is_set():
+                try:
+                    self._queue.put(item, timeout=1.0)
+                    break
+                except queue.Full:
+                    continue
+
+    # Threads de classificação
+
+    def _start_workers(self):
+        # Chamado com self._lock
+        while len(self._worker_threads) < self.workers:
+            thread = threading.Thread(
+                target=self._classify_loop, args=(self._workers_stop,),
+                name=f"imap-watch-worker-{len(self._worker_threads)}", daemon=True
+            )
+            self._worker_threads.append(thread)
+            thread.start()
+
+    def _classify_loop(self, stopping: threading.Event):
+        while True:
+            try:
+                item = self._queue.get(timeout=1.0)
+            except queue.Empty:
+                if stopping.is_set():
+                    return
+                continue
+            if item is None:
+                return
+            batch = [item]
+            stop = False
+            # Junta o que já estiver na fila para classificar em lote
+            while len(batch) < max(1, settings.GENERATOR_BATCH_SIZE):
+                try:
+                    extra = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if extra is None:
+                    stop = True
+                    break
+                batch.append(extra)
+            try:
+                self._classify_batch(batch)
+            except Exception as e:
+                logger.error(f"Falha ao classificar {len(batch)} emails monitorados: {str(e)}")
+                with self._lock:
+                    self.failed += len(batch)
+            if stop:
+                return
+
+    def _classify_batch(self, batch: List[WatchedEmail]):
+        texts = [f"{item.email['subject']}\n\n{item.email['body']}" for item in batch]
+        # Cada conta tem o seu estilo de sugestão
+        analyzed = inference_executor.call(analyze_emails, texts, [item.style for item in batch])
+
+        now = time.time()
+        by_account: Dict[str, List[Dict]] = {}
+        classified = failed = 0
+        latency_total = 0.0
+        for item, outcome in zip(batch, analyzed):
+            body = item.email['body']
+            result = {
+                "uid": item.uid,
+                "subject": item.email['subject'],
+                "from": item.email['from'],
+                "style": item.style,
+                "body_preview": body[:100] + "..." if len(body) > 100 else body,
+                "received_at": item.received_at,
+                "classified_at": now
+            }
+            if outcome["status"] == "failed":
+                logger.error(f"Erro ao analisar email monitorado {item.uid}: {outcome['error']}")
+                result.update({"category": None, **outcome})
+                failed += 1
+            else:
+                result.update(outcome)
+                classified += 1
+                latency_total += now - item.received_at
+            by_account.setdefault(item.account_id, []).append(
+                {"uidvalidity": item.uidvalidity, "uid": item.uid, "classified_at": now, "email": result}
+            )
+
+        for account_id, messages in by_account.items():
+            self.store.save_messages(account_id, messages)
+        with self._lock:
+            self.classified += classified
+            self.failed += failed
+            self._latency_total += latency_total
+
+
+def account_key(email_address: str, imap_server: str, port: Optional[int] = None) -> str:
+    """
+    Identificador estável da conta monitorada (não inclui a senha).
+    """
+    return hashlib.sha256(f'{imap_server}\x00{port}\x00{email_address.lower()}'.encode()).hexdigest()[:16]
+
+
+def _verify_login(email_address: str, password: str, imap_server: str, ssl: bool, port: Optional[int]):
+    server = imapclient.IMAPClient(imap_server, port=port, ssl=ssl, timeout=settings.IMAP_TIMEOUT_SECONDS)
+    try:
+        server.login(email_address, password)
+    finally:
+        _logout(server)
+
+
+def _logout(server: imapclient.IMAPClient):
+    try:
+        server.logout()
+    except Exception:
+        pass
+
+
+mailbox_watcher = MailboxWatcher(
+    db_path=settings.IMAP_WATCH_DB_PATH,
+    max_accounts=settings.IMAP_WATCH_MAX_ACCOUNTS,
+    queue_size=settings.IMAP_WATCH_QUEUE_SIZE,
+    workers=settings.IMAP_WATCH_WORKERS
+)
+metrics.register_gauge(
+    "watcher_queue_depth", "Emails novos aguardando classificação no monitoramento IMAP.",
+    lambda: mailbox_watcher.stats()["queue_depth"]
+)
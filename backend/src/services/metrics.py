@@ -0,0 +1,346 @@
+"""
+Métricas do processo servidas pelo /stats, em JSON e no formato texto do
+Prometheus.
+
+- Histogramas de latência por etapa (stage_latency_seconds): upload,
+  extração de PDF, palavras-chave, classificação, geração, busca no
+  Gmail/IMAP e envio de respostas. Os tempos vêm de time.perf_counter
+  (relógio monotônico).
+- Requisições por endpoint, método e status, com a latência por endpoint.
+- Contadores livres (ex.: categorias, origem da classificação).
+- Medidores lidos sob demanda (fila, inferência em andamento): as funções
+  registradas com register_gauge só rodam quando /stats é consultado.
+
+Registrar uma observação custa uma busca binária nos limites dos buckets e
+um incremento sob o lock do próprio histograma.
+"""
+import bisect
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.core.config import settings
+
+# Limites (s) dos buckets: de 100 µs (palavras-chave) a 60 s (beam search em CPU)
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+_HELP = {
+    "stage_latency_seconds": "Latência de cada etapa do processamento.",
+    "http_request_duration_seconds": "Latência das requisições por endpoint.",
+    "http_requests_total": "Requisições por endpoint, método e status.",
+    "classifications_total": "Emails classificados por origem (cache, keywords, model ou fallback sem modelo).",
+    "categories_total": "Emails classificados por categoria.",
+    "generations_total": "Sugestões por estratégia (template é o fallback do modelo).",
+    "replies_total": "Respostas do /gmail-auto-reply por resultado.",
+}
+
+# Content-Type do formato texto de exposição
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """
+    Histograma de buckets fixos, cumulativo como no Prometheus na exportação.
+    """
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = tuple(bounds)
+        self._counts = [0] * (len(self.bounds) + 1)  # o último é o +Inf
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            if value > self._max:
+                self._max = value
+
+    def state(self) -> Tuple[List[int], float, float]:
+        """
+        Retorna (contagem por bucket, soma, máximo) de forma consistente.
+        """
+        with self._lock:
+            return list(self._counts), self._sum, self._max
+
+    def merge(self, counts: List[int], total: float, maximum: float):
+        """
+        Soma as observações de outro histograma com os mesmos limites.
+        """
+        with self._lock:
+            self._counts = [a + b for a, b in zip(self._counts, counts)]
+            self._sum += total
+            if maximum > self._max:
+                self._max = maximum
+
+    def summary(self) -> Dict:
+        counts, total, maximum = self.state()
+        count = sum(counts)
+        return {
+            "count": count,
+            "mean_ms": round(total / count * 1000, 3) if count else None,
+            "p50_ms": _quantile_ms(self.bounds, counts, maximum, 0.5),
+            "p95_ms": _quantile_ms(self.bounds, counts, maximum, 0.95),
+            "p99_ms": _quantile_ms(self.bounds, counts, maximum, 0.99),
+            "max_ms": round(maximum * 1000, 3) if count else None
+        }
+
+
+def _quantile_ms(bounds, counts: List[int], maximum: float, q: float) -> Optional[float]:
+    """
+    Estima o quantil interpolando dentro do bucket, como o histogram_quantile
+    do Prometheus, limitado ao maior valor observado.
+    """
+    total = sum(counts)
+    if not total:
+        return None
+    rank = q * total
+    cumulative = 0
+    for index, count in enumerate(counts):
+        if count and cumulative + count >= rank:
+            lower = bounds[index - 1] if index else 0.0
+            upper = bounds[index] if index < len(bounds) else maximum
+            value = lower + (upper - lower) * (rank - cumulative) / count
+            return round(min(value, maximum) * 1000, 3)
+        cumulative += count
+    return round(maximum * 1000, 3)
+
+
+class _Timer:
+    """
+    Context manager que mede o bloco e registra no histograma ao sair
+    (também quando o bloco levanta exceção). elapsed fica disponível depois.
+    """
+    __slots__ = ("_histogram", "_started", "elapsed")
+
+    def __init__(self, histogram: Optional[Histogram]):
+        self._histogram = histogram
+        self.elapsed = 0.0
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self._started
+        if self._histogram is not None:
+            self._histogram.observe(self.elapsed)
+        return False
+
+
+class MetricsRegistry:
+    def __init__(self, prefix: str = "email_analyzer", enabled: bool = True):
+        self.prefix = prefix
+        self.enabled = enabled
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._gauges: Dict[str, Tuple[str, Optional[str], Callable]] = {}
+
+    # Registro (caminho quente)
+
+    def observe(self, stage: str, seconds: float):
+        """
+        Registra a duração (s) de uma etapa.
+        """
+        if self.enabled:
+            self._histogram("stage_latency_seconds", (("stage", stage),)).observe(seconds)
+
+    def timer(self, stage: str) -> _Timer:
+        """
+        with metrics.timer("generation"): ... mede o bloco como a etapa stage.
+        """
+        if not self.enabled:
+            return _Timer(None)
+        return _Timer(self._histogram("stage_latency_seconds", (("stage", stage),)))
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        """
+        Soma amount ao contador name com os rótulos informados.
+        """
+        if not self.enabled or not amount:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe_request(self, endpoint: str, method: str, status: int, seconds: float):
+        if not self.enabled:
+            return
+        self.inc("http_requests_total", endpoint=endpoint, method=method, status=str(status))
+        self._histogram("http_request_duration_seconds", (("endpoint", endpoint),)).observe(seconds)
+
+    def register_gauge(self, name: str, help: str, collect: Callable, label: Optional[str] = None):
+        """
+        Registra um medidor calculado na hora da consulta. collect retorna um
+        número ou, com label, um dict {valor do rótulo: número}. None omite.
+        """
+        with self._lock:
+            self._gauges[name] = (help, label, collect)
+
+    def _histogram(self, name: str, labels: Labels) -> Histogram:
+        key = (name, labels)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram())
+        return histogram
+
+    # Leitura
+
+    def counter_values(self, name: str, label: str) -> Dict[str, float]:
+        """
+        Totais do contador name agrupados pelo rótulo label.
+        """
+        with self._lock:
+            items = [(dict(labels), value) for (counter, labels), value in self._counters.items() if counter == name]
+        totals: Dict[str, float] = {}
+        for labels, value in items:
+            key = labels.get(label, "")
+            totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def snapshot(self) -> Dict:
+        """
+        Visão em JSON: resumo (contagem, média e quantis estimados) de cada
+        etapa e endpoint, contadores e medidores.
+        """
+        with self._lock:
+            histograms = list(self._histograms.items())
+            counters = list(self._counters.items())
+        stages, requests = {}, {}
+        for (name, labels), histogram in sorted(histograms):
+            if name == "stage_latency_seconds":
+                stages[labels[0][1]] = histogram.summary()
+            else:
+                requests[labels[0][1]] = {**histogram.summary(), "by_status": {}}
+        grouped: Dict[str, Dict[str, float]] = {}
+        for (name, labels), value in sorted(counters):
+            if name == "http_requests_total":
+                fields = dict(labels)
+                by_status = requests.setdefault(fields["endpoint"], {"by_status": {}})["by_status"]
+                by_status[fields["status"]] = by_status.get(fields["status"], 0) + value
+                continue
+            grouped.setdefault(name, {})[",".join(f"{k}={v}" for k, v in labels) or "total"] = value
+        return {
+            "enabled": self.enabled,
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "stages": stages,
+            "requests": requests,
+            "counters": grouped,
+            "gauges": {name: value for name, _, _, value in self._collect_gauges()}
+        }
+
+    def render_prometheus(self) -> str:
+        """
+        Formato texto de exposição do Prometheus (versão 0.0.4).
+        """
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+        lines: List[str] = []
+        families: Dict[str, List] = {}
+        for (name, labels), histogram in histograms:
+            families.setdefault(name, []).append((labels, histogram))
+        for name, series in families.items():
+            metric = f"{self.prefix}_{name}"
+            lines += [f"# HELP {metric} {_HELP.get(name, name)}", f"# TYPE {metric} histogram"]
+            for labels, histogram in series:
+                counts, total, _ = histogram.state()
+                cumulative = 0
+                for bound, count in zip(histogram.bounds + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{metric}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{metric}_sum{_format_labels(labels)} {total!r}")
+                lines.append(f"{metric}_count{_format_labels(labels)} {cumulative}")
+
+        seen = set()
+        for (name, labels), value in counters:
+            metric = f"{self.prefix}_{name}"
+            if name not in seen:
+                seen.add(name)
+                lines += [f"# HELP {metric} {_HELP.get(name, name)}", f"# TYPE {metric} counter"]
+            lines.append(f"{metric}{_format_labels(labels)} {_format_value(value)}")
+
+        for name, help, label, value in self._collect_gauges():
+            metric = f"{self.prefix}_{name}"
+            lines += [f"# HELP {metric} {help}", f"# TYPE {metric} gauge"]
+            if label is None:
+                lines.append(f"{metric} {_format_value(value)}")
+            else:
+                for key, item in sorted(value.items()):
+                    lines.append(f"{metric}{_format_labels(((label, key),))} {_format_value(item)}")
+        return "\n".join(lines) + "\n"
+
+    def _collect_gauges(self):
+        with self._lock:
+            gauges = sorted(self._gauges.items())
+        for name, (help, label, collect) in gauges:
+            try:
+                value = collect()
+            except Exception:
+                # Um medidor com defeito não derruba o /stats
+                continue
+            if value is None:
+                continue
+            if label is not None:
+                value = {str(key): item for key, item in value.items() if item is not None}
+            yield name, help, label, value
+
+    def drain(self) -> Dict:
+        """
+        Retorna e zera histogramas e contadores em forma serializável, para
+        que um processo do executor devolva ao principal o que registrou
+        (ver merge). Os medidores não vão junto: são lidos no principal.
+        """
+        with self._lock:
+            histograms, self._histograms = self._histograms, {}
+            counters, self._counters = self._counters, {}
+        return {
+            "histograms": [(key, *histogram.state()) for key, histogram in histograms.items()],
+            "counters": list(counters.items())
+        }
+
+    def merge(self, drained: Dict):
+        """
+        Incorpora o resultado de drain() de outro processo.
+        """
+        if not self.enabled:
+            return
+        for (name, labels), counts, total, maximum in drained["histograms"]:
+            self._histogram(name, labels).merge(counts, total, maximum)
+        with self._lock:
+            for key, value in drained["counters"]:
+                self._counters[key] = self._counters.get(key, 0) + value
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self.started_at = time.time()
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+metrics = MetricsRegistry(enabled=settings.METRICS_ENABLED)
@@ -0,0 +1,251 @@
+"""
+Profiling sob demanda de requisições de análise.
+
+Uma requisição é perfilada quando traz o cabeçalho X-Profile-Token igual a
+PROFILING_ADMIN_TOKEN ou quando cai na amostragem de PROFILING_SAMPLE_RATE.
+Cada chamada bloqueante dela (_run_blocking) roda sob cProfile no próprio
+worker (thread ou processo) e, no executor de inferência, também sob o
+profiler de operadores do torch. Ao final tudo vai para
+PROFILING_DIR/<profile_id>/:
+
+- summary.json: endpoint, gatilho e tempo de cada etapa;
+- python.prof (abre com pstats ou snakeviz) e python.txt (top funções);
+- torch.txt (operadores por tempo de CPU) e torch_trace_*.json (chrome://tracing).
+
+Sem profiling ativo o custo é a leitura de uma ContextVar por chamada
+bloqueante e de um atributo thread-local nos pontos de trace().
+"""
+import contextlib
+import contextvars
+import cProfile
+import hmac
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import shutil
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from src.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_current: contextvars.ContextVar = contextvars.ContextVar("request_profile", default=None)
+_local = threading.local()
+# O profiler do torch é global ao processo: um por vez
+_torch_lock = threading.Lock()
+_NULL = contextlib.nullcontext()
+
+
+class ProfilingDenied(Exception):
+    """
+    Levantada quando o cabeçalho de profiling não traz o token de administrador.
+    """
+
+
+class _CaptureOptions(NamedTuple):
+    torch_trace_path: Optional[str]  # None: só cProfile
+
+
+class _Capture:
+    """
+    Estatísticas do cProfile em forma serializável (voltam de processos
+    filhos); pstats.Stats aceita o objeto como se fosse um Profile.
+    """
+
+    def __init__(self, stats: Dict, torch_table: Optional[str]):
+        self.stats = stats
+        self.torch_table = torch_table
+
+    def create_stats(self):
+        pass
+
+
+def profile_call(func, options: _CaptureOptions, *args):
+    """
+    Executa func(*args) sob cProfile (e, se pedido, sob o profiler do torch)
+    e retorna (resultado, _Capture). Roda dentro do worker.
+    """
+    profiler = cProfile.Profile()
+    torch_profiler = _start_torch_profiler() if options.torch_trace_path else None
+    _local.profiling, _local.torch = True, torch_profiler is not None
+    profiler.enable()
+    try:
+        result = func(*args)
+    finally:
+        profiler.disable()
+        _local.profiling = _local.torch = False
+        torch_table = _stop_torch_profiler(torch_profiler, options.torch_trace_path)
+    profiler.create_stats()
+    return result, _Capture(profiler.stats, torch_table)
+
+
+def _start_torch_profiler():
+    if not _torch_lock.acquire(blocking=False):
+        return None
+    try:
+        import torch
+        activities = [torch.profiler.ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(torch.profiler.ProfilerActivity.CUDA)
+        torch_profiler = torch.profiler.profile(activities=activities, record_shapes=True)
+        torch_profiler.__enter__()
+        return torch_profiler
+    except Exception as e:
+        _torch_lock.release()
+        logger.warning(f"Profiler do torch indisponível: {e}")
+        return None
+
+
+def _stop_torch_profiler(torch_profiler, trace_path: Optional[str]) -> Optional[str]:
+    if torch_profiler is None:
+        return None
+    try:
+        torch_profiler.__exit__(None, None, None)
+        torch_profiler.export_chrome_trace(trace_path)
+        return torch_profiler.key_averages().table(sort_by="self_cpu_time_total", row_limit=40)
+    except Exception as e:
+        logger.warning(f"Falha ao exportar o profile do torch: {e}")
+        return None
+    finally:
+        _torch_lock.release()
+
+
+def trace(name: str):
+    """
+    Marca um trecho (ex.: construção do prompt, forward do NLI) no trace do
+    torch quando a thread está sendo perfilada; caso contrário não faz nada.
+    """
+    if not getattr(_local, "torch", False):
+        return _NULL
+    import torch
+    return torch.profiler.record_function(name)
+
+
+def active() -> bool:
+    """
+    Indica se a thread atual roda uma chamada perfilada.
+    """
+    return getattr(_local, "profiling", False)
+
+
+class RequestProfile:
+    def __init__(self, endpoint: str, trigger: str):
+        self.id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.endpoint = endpoint
+        self.trigger = trigger  # header ou sample
+        self.directory = os.path.join(settings.PROFILING_DIR, self.id)
+        self.started = time.perf_counter()
+        self.segments: List[Dict] = []
+        self._captures: List[_Capture] = []
+        self._token = None
+
+    async def run(self, executor, func, *args, with_torch: bool = False) -> Any:
+        """
+        Executa func(*args) no executor sob profile_call e guarda o resultado
+        da captura como uma etapa.
+        """
+        stage = getattr(func, "__name__", str(func))
+        trace_path = None
+        if with_torch and settings.PROFILING_TORCH:
+            os.makedirs(self.directory, exist_ok=True)
+            trace_path = os.path.abspath(os.path.join(self.directory, f"torch_trace_{len(self.segments)}_{stage}.json"))
+        segment = {"stage": stage, "executor": executor.name, "elapsed_ms": None, "error": None}
+        self.segments.append(segment)
+        started = time.perf_counter()
+        try:
+            result, capture = await executor.run(profile_call, func, _CaptureOptions(trace_path), *args)
+        except Exception as e:
+            segment["error"] = str(e) or type(e).__name__
+            raise
+        finally:
+            segment["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        self._captures.append(capture)
+        return result
+
+    def save(self) -> str:
+        """
+        Grava os arquivos do profile e remove os mais antigos além de
+        PROFILING_MAX_PROFILES. Bloqueante: chame fora do event loop.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        summary = {
+            "profile_id": self.id,
+            "endpoint": self.endpoint,
+            "trigger": self.trigger,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 2),
+            "segments": self.segments
+        }
+        if self._captures:
+            report = io.StringIO()
+            stats = pstats.Stats(self._captures[0], stream=report)
+            for capture in self._captures[1:]:
+                stats.add(capture)
+            stats.dump_stats(os.path.join(self.directory, "python.prof"))
+            stats.sort_stats("cumulative").print_stats(60)
+            with open(os.path.join(self.directory, "python.txt"), "w", encoding="utf-8") as f:
+                f.write(report.getvalue())
+        tables = [
+            f"== {segment['stage']} ==\n{capture.torch_table}"
+            for segment, capture in zip([s for s in self.segments if s["error"] is None], self._captures)
+            if capture.torch_table
+        ]
+        if tables:
+            with open(os.path.join(self.directory, "torch.txt"), "w", encoding="utf-8") as f:
+                f.write("\n\n".join(tables))
+        summary["files"] = sorted(os.listdir(self.directory)) + ["summary.json"]
+        with open(os.path.join(self.directory, "summary.json"), "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        _prune(settings.PROFILING_DIR, settings.PROFILING_MAX_PROFILES)
+        return self.directory
+
+
+def start_profile(endpoint: str, token: Optional[str]) -> Optional[RequestProfile]:
+    """
+    Decide se a requisição será perfilada (cabeçalho com token ou
+    amostragem) e a torna a atual do contexto. Levanta ProfilingDenied se o
+    cabeçalho vier com token errado ou sem token configurado.
+    """
+    if token is not None:
+        admin_token = settings.PROFILING_ADMIN_TOKEN
+        if not admin_token or not hmac.compare_digest(token.encode(), admin_token.encode()):
+            raise ProfilingDenied("Token de profiling inválido.")
+        trigger = "header"
+    elif settings.PROFILING_SAMPLE_RATE > 0 and random.random() < settings.PROFILING_SAMPLE_RATE:
+        trigger = "sample"
+    else:
+        return None
+    profile = RequestProfile(endpoint, trigger)
+    profile._token = _current.set(profile)
+    return profile
+
+
+def finish_profile(profile: RequestProfile):
+    """
+    Desfaz o profile atual do contexto (os arquivos são gravados por save).
+    """
+    if profile._token is not None:
+        _current.reset(profile._token)
+        profile._token = None
+
+
+def current_profile() -> Optional[RequestProfile]:
+    return _current.get()
+
+
+def _prune(directory: str, keep: int):
+    if keep <= 0:
+        return
+    # Os ids começam pela data, então a ordem alfabética é a cronológica
+    entries = sorted(
+        entry for entry in os.listdir(directory)
+        if os.path.isdir(os.path.join(directory, entry))
+    )
+    for entry in entries[:-keep]:
+        shutil.rmtree(os.path.join(directory, entry), ignore_errors=True)
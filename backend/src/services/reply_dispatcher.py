@@ -0,0 +1,310 @@
+"""
+Envio em lote das respostas aprovadas (/gmail-auto-reply).
+
+As respostas saem por um pool de threads compartilhado (concorrência
+limitada e clientes Gmail reaproveitados), passam por um token bucket por
+conta para respeitar a cota de envio e, em erros temporários (429, 403 de
+rate limit, 5xx, falhas de rede), são repetidas com backoff exponencial e
+jitter, respeitando o Retry-After.
+
+Cada resposta tem uma chave de idempotência (informada pelo cliente ou
+derivada do conteúdo) registrada no ReplyLedger com um Message-ID fixo
+para aquele envio: uma resposta já enviada não sai de novo, e depois de um
+erro ambíguo (5xx ou timeout, quando o Gmail pode ter aceitado o envio) a
+existência do Message-ID nos enviados é conferida. A busca depende de duas
+premissas que a API não garante: que o Gmail preserve o Message-ID
+definido pelo cliente e que o índice de busca (rfc822msgid) já inclua a
+mensagem. Por isso um Message-ID não encontrado não dispara reenvio: a
+resposta fica como unknown (revisão manual) até a chave expirar. As
+chaves do cliente valem por GMAIL_REPLY_KEY_TTL_SECONDS; as derivadas do
+conteúdo só por GMAIL_REPLY_CONTENT_DEDUPE_SECONDS, o bastante para
+absorver retries sem impedir que a mesma resposta seja enviada de novo de
+propósito mais tarde.
+"""
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from src.core.config import settings
+from src.services.gmail_oauth import find_sent_message, get_account_email, send_gmail_reply
+from src.services.metrics import metrics
+from src.services.reply_ledger import ReplyLedger
+
+logger = logging.getLogger(__name__)
+
+# Motivos de 403 que o Gmail usa para limite de taxa (os demais 403 são definitivos)
+_RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+
+_UNKNOWN_ERROR = "Envio ambíguo: o Message-ID não foi encontrado nos enviados. Confira antes de reenviar."
+
+_ledger: Optional[ReplyLedger] = None
+_buckets: Dict[str, "TokenBucket"] = {}
+_pool: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+
+
+class TokenBucket:
+    """
+    Token bucket thread-safe: rate fichas por segundo, até capacity acumuladas.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Consome uma ficha, esperando se necessário. Retorna o tempo esperado (s).
+        """
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+def iter_dispatch_replies(access_token: str, replies: List[Dict]):
+    """
+    Envia as respostas e entrega o resultado de cada uma assim que termina
+    (fora da ordem de entrada; use o campo index). Cada item de replies tem
+    to_email, subject, body e, opcionalmente, thread_id e idempotency_key.
+    """
+    account = _retry_call(get_account_email, access_token)
+    bucket = _bucket(account)
+    pool = _reply_pool()
+    futures = [
+        pool.submit(_deliver, access_token, account, index, reply, bucket)
+        for index, reply in enumerate(replies)
+    ]
+    try:
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        # Consumidor desistiu: o que ainda não começou não é enviado
+        for future in futures:
+            future.cancel()
+
+
+def summarize_dispatch(results: List[Dict], elapsed: float) -> Dict:
+    summary = {"total": len(results), "sent": 0, "duplicate": 0, "in_progress": 0, "unknown": 0, "error": 0}
+    for result in results:
+        summary[result["status"]] = summary.get(result["status"], 0) + 1
+    attempts = sum(result["attempts"] for result in results)
+    latencies = sorted(result["latency_ms"] for result in results)
+    summary.update({
+        "attempts": attempts,
+        "retries": attempts - sum(1 for result in results if result["attempts"]),
+        "elapsed_seconds": round(elapsed, 3),
+        "p50_latency_ms": latencies[len(latencies) // 2] if latencies else None,
+        "max_latency_ms": latencies[-1] if latencies else None
+    })
+    return summary
+
+
+def idempotency_key(reply: Dict) -> str:
+    """
+    Chave informada pelo cliente ou derivada do destinatário, thread, assunto e corpo.
+    """
+    if reply.get("idempotency_key"):
+        return str(reply["idempotency_key"])
+    content = json.dumps(
+        [reply.get("to_email"), reply.get("thread_id"), reply.get("subject"), reply.get("body")],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def _deliver(access_token: str, account: str, index: int, reply: Dict, bucket: TokenBucket) -> Dict:
+    started = time.perf_counter()
+    result = {"index": index, "to": reply.get("to_email"), "status": "error", "id": None, "attempts": 0}
+
+    def finish(**fields) -> Dict:
+        result.update(fields)
+        result["latency_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        metrics.inc("replies_total", status=result["status"])
+        return result
+
+    missing = [field for field in ("to_email", "subject", "body") if not reply.get(field)]
+    if missing:
+        return finish(error=f"Campos obrigatórios ausentes: {', '.join(missing)}", rate_limit_wait_ms=0.0)
+
+    key = idempotency_key(reply)
+    result["idempotency_key"] = key
+    ttl = settings.GMAIL_REPLY_KEY_TTL_SECONDS if reply.get("idempotency_key") else settings.GMAIL_REPLY_CONTENT_DEDUPE_SECONDS
+    # Novo a cada reserva: um reenvio depois da expiração não repete o Message-ID
+    message_id = f"<{uuid.uuid4().hex}@email-analyzer>"
+    ledger = _reply_ledger()
+    state, gmail_id, message_id = ledger.claim(account, key, message_id, ttl)
+    if state == "sent":
+        return finish(status="duplicate", id=gmail_id, rate_limit_wait_ms=0.0)
+    if state == "in_progress":
+        return finish(status="in_progress", rate_limit_wait_ms=0.0)
+    if state == "unknown":
+        return finish(status="unknown", error=_UNKNOWN_ERROR, rate_limit_wait_ms=0.0)
+
+    # Reserva abandonada: o envio anterior pode ter acontecido
+    ambiguous = state == "resumed"
+    waited = 0.0
+    attempts = 0
+    last_error: Optional[Exception] = None
+    while True:
+        if ambiguous:
+            try:
+                found = find_sent_message(access_token, message_id)
+            except Exception as e:
+                # Sem como conferir, não reenvia: conta como tentativa e espera
+                found, last_error = None, e
+                attempts += 1
+                if attempts >= settings.GMAIL_REPLY_MAX_ATTEMPTS:
+                    break
+                time.sleep(_backoff(attempts, None))
+                continue
+            if found:
+                ledger.mark_sent(account, key, found, ttl)
+                return finish(status="sent", id=found, attempts=attempts, verified=True,
+                              rate_limit_wait_ms=round(waited * 1000, 2))
+            # Não encontrado não prova que não saiu (Message-ID reescrito ou
+            # busca ainda sem a mensagem): não reenvia
+            ledger.mark_unknown(account, key, ttl)
+            logger.warning(f"Resposta {index} para {reply['to_email']}: envio ambíguo sem confirmação ({message_id})")
+            return finish(status="unknown", error=_UNKNOWN_ERROR, message_id=message_id, attempts=attempts,
+                          rate_limit_wait_ms=round(waited * 1000, 2))
+
+        if attempts >= settings.GMAIL_REPLY_MAX_ATTEMPTS:
+            break
+        waited += bucket.acquire()
+        attempts += 1
+        try:
+            sent = send_gmail_reply(
+                access_token, reply["to_email"], reply["subject"], reply["body"],
+                reply.get("thread_id"), message_id=message_id
+            )
+        except Exception as e:
+            last_error = e
+            retryable, ambiguous, retry_after = _classify_error(e)
+            if not retryable:
+                break
+            logger.info(f"Resposta {index} para {reply['to_email']}: tentativa {attempts} falhou ({e}), repetindo")
+            time.sleep(_backoff(attempts, retry_after))
+            continue
+        ledger.mark_sent(account, key, sent.get("id"), ttl)
+        return finish(status="sent", id=sent.get("id"), attempts=attempts,
+                      rate_limit_wait_ms=round(waited * 1000, 2))
+
+    # Sem sucesso: a reserva só é liberada se o envio com certeza não aconteceu
+    if not ambiguous:
+        ledger.release(account, key)
+    return finish(error=str(last_error), attempts=attempts, rate_limit_wait_ms=round(waited * 1000, 2))
+
+
+def _classify_error(error: Exception) -> Tuple[bool, bool, Optional[float]]:
+    """
+    Retorna (vale repetir, envio pode ter acontecido, Retry-After em segundos).
+    """
+    if isinstance(error, HttpError):
+        status = error.resp.status
+        retry_after = _retry_after(error)
+        if status == 429:
+            return True, False, retry_after
+        if status == 403 and _error_reason(error) in _RATE_LIMIT_REASONS:
+            return True, False, retry_after
+        if status >= 500:
+            return True, True, retry_after
+        return False, False, None
+    if isinstance(error, (httplib2.HttpLib2Error, OSError)):
+        # Timeout ou conexão caída: o Gmail pode ter recebido o envio
+        return True, True, None
+    return False, False, None
+
+
+def _retry_after(error: HttpError) -> Optional[float]:
+    try:
+        return float(error.resp.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _error_reason(error: HttpError) -> Optional[str]:
+    try:
+        return json.loads(error.content)["error"]["errors"][0]["reason"]
+    except (ValueError, KeyError, IndexError, TypeError):
+        return None
+
+
+def _backoff(attempt: int, retry_after: Optional[float]) -> float:
+    # Backoff exponencial com jitter completo
+    ceiling = min(settings.GMAIL_REPLY_BACKOFF_MAX_SECONDS, settings.GMAIL_REPLY_BACKOFF_BASE_SECONDS * 2 ** (attempt - 1))
+    delay = random.uniform(0, ceiling)
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, settings.GMAIL_REPLY_BACKOFF_MAX_SECONDS))
+    return delay
+
+
+def _retry_call(func, *args):
+    for attempt in range(1, settings.GMAIL_REPLY_MAX_ATTEMPTS + 1):
+        try:
+            return func(*args)
+        except Exception as e:
+            retryable, _, retry_after = _classify_error(e)
+            if not retryable or attempt == settings.GMAIL_REPLY_MAX_ATTEMPTS:
+                raise
+            time.sleep(_backoff(attempt, retry_after))
+
+
+def _bucket(account: str) -> TokenBucket:
+    with _lock:
+        bucket = _buckets.get(account)
+        if bucket is None:
+            bucket = _buckets[account] = TokenBucket(
+                settings.GMAIL_REPLY_RATE_PER_SECOND, settings.GMAIL_REPLY_BURST
+            )
+        return bucket
+
+
+def _reply_pool() -> ThreadPoolExecutor:
+    # Pool compartilhado: limita a concorrência total e reaproveita os
+    # clientes Gmail em cache por thread
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=max(1, settings.GMAIL_REPLY_CONCURRENCY), thread_name_prefix="gmail-reply"
+            )
+        return _pool
+
+
+def _reply_ledger() -> ReplyLedger:
+    global _ledger
+    with _lock:
+        if _ledger is None:
+            _ledger = ReplyLedger(settings.GMAIL_REPLY_LEDGER_PATH, settings.GMAIL_REPLY_CLAIM_TTL_SECONDS)
+        return _ledger
+
+
+def shutdown_reply_pool():
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,127 @@
+import sqlite3
+import threading
+import time
+from typing import Optional, Tuple
+
+
+class ReplyLedger:
+    """
+    Registro em SQLite das respostas enviadas, por conta e chave de
+    idempotência: a mesma resposta reenviada (retry do cliente ou da própria
+    API) é reconhecida e não sai duas vezes.
+
+    Estados: sending (reservada por um envio em andamento), sent e unknown
+    (envio ambíguo não encontrado nos enviados; precisa de revisão). Uma reserva
+    mais velha que claim_ttl é considerada abandonada (ex.: processo morto
+    no meio do envio) e pode ser retomada.
+
+    Cada linha vale até expires_at (ttl informado em claim e mark_sent):
+    depois disso a chave volta a ser aceita como nova e a linha é apagada
+    na próxima limpeza, feita a cada prune_interval segundos durante claim.
+    """
+
+    def __init__(self, path: str, claim_ttl: float = 300.0, prune_interval: float = 60.0):
+        self.path = path
+        self.claim_ttl = claim_ttl
+        self.prune_interval = prune_interval
+        self._last_prune = 0.0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS replies ("
+            "account TEXT NOT NULL, idempotency_key TEXT NOT NULL, status TEXT NOT NULL, "
+            "message_id TEXT, gmail_id TEXT, updated_at REAL NOT NULL, expires_at REAL, "
+            "PRIMARY KEY (account, idempotency_key))"
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(replies)")]
+        if "expires_at" not in columns:
+            # Ledger criado antes do TTL: as linhas antigas expiram na primeira limpeza
+            self._conn.execute("ALTER TABLE replies ADD COLUMN expires_at REAL")
+            self._conn.execute("UPDATE replies SET expires_at = updated_at")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS replies_by_expiry ON replies (expires_at)")
+        self._conn.commit()
+
+    def claim(self, account: str, key: str, message_id: str, ttl: float) -> Tuple[str, Optional[str], Optional[str]]:
+        """
+        Reserva a chave para envio por até ttl segundos. Uma linha expirada
+        conta como inexistente. Retorna (resultado, gmail_id, message_id):
+        - ("claimed", None, message_id): pode enviar;
+        - ("resumed", None, message_id): reserva abandonada retomada; o envio
+          anterior pode ter acontecido, confira antes de reenviar;
+        - ("sent", gmail_id, message_id): já enviada;
+        - ("unknown", None, message_id): envio ambíguo sem confirmação, não reenviar;
+        - ("in_progress", None, message_id): outro envio em andamento.
+        """
+        now = time.time()
+        with self._lock:
+            if now - self._last_prune >= self.prune_interval:
+                self._prune(now)
+            row = self._conn.execute(
+                "SELECT status, message_id, gmail_id, updated_at, expires_at FROM replies "
+                "WHERE account = ? AND idempotency_key = ?",
+                (account, key)
+            ).fetchone()
+            if row is None or (row[4] is not None and row[4] <= now and row[0] != "sending"):
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO replies (account, idempotency_key, status, message_id, gmail_id, "
+                    "updated_at, expires_at) VALUES (?, ?, 'sending', ?, NULL, ?, ?)",
+                    (account, key, message_id, now, now + ttl)
+                )
+                self._conn.commit()
+                return "claimed", None, message_id
+            status, stored_message_id, gmail_id, updated_at, _ = row
+            if status in ("sent", "unknown"):
+                return status, gmail_id, stored_message_id
+            if now - updated_at < self.claim_ttl:
+                return "in_progress", None, stored_message_id
+            self._conn.execute(
+                "UPDATE replies SET updated_at = ? WHERE account = ? AND idempotency_key = ?",
+                (now, account, key)
+            )
+            self._conn.commit()
+            return "resumed", None, stored_message_id
+
+    def mark_sent(self, account: str, key: str, gmail_id: Optional[str], ttl: float):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE replies SET status = 'sent', gmail_id = ?, updated_at = ?, expires_at = ? "
+                "WHERE account = ? AND idempotency_key = ?",
+                (gmail_id, now, now + ttl, account, key)
+            )
+            self._conn.commit()
+
+    def mark_unknown(self, account: str, key: str, ttl: float):
+        """
+        Registra que o envio pode ter acontecido mas não foi encontrado; a
+        chave fica bloqueada (sem reenvio automático) até expirar.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE replies SET status = 'unknown', updated_at = ?, expires_at = ? "
+                "WHERE account = ? AND idempotency_key = ?",
+                (now, now + ttl, account, key)
+            )
+            self._conn.commit()
+
+    def release(self, account: str, key: str):
+        """
+        Libera a reserva depois de uma falha definitiva (o envio não aconteceu).
+        """
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM replies WHERE account = ? AND idempotency_key = ? AND status = 'sending'",
+                (account, key)
+            )
+            self._conn.commit()
+
+    def _prune(self, now: float):
+        # Chamado com self._lock; reservas em andamento só saem depois de abandonadas
+        self._conn.execute(
+            "DELETE FROM replies WHERE expires_at <= ? AND (status != 'sending' OR updated_at < ?)",
+            (now, now - self.claim_ttl)
+        )
+        self._conn.commit()
+        self._last_prune = now
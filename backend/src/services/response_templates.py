@@ -0,0 +1,187 @@
+"""
+Catálogo de templates de resposta carregado de um arquivo JSON.
+
+Formato: {categoria: {estilo: [template, ...]}}. Placeholders usam a sintaxe
+de str.format ({sender_name}) e trechos entre [[ ]] só aparecem quando todos
+os seus placeholders têm valor, por exemplo "Olá[[ {sender_name}]]!".
+
+O arquivo é lido uma vez e compilado em um registro indexado por
+(categoria, estilo); alterações no arquivo são recarregadas sem reiniciar.
+"""
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import string
+import threading
+import time
+from itertools import combinations
+from typing import Dict, FrozenSet, List, Mapping, NamedTuple, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TEMPLATES_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "response_templates.json")
+
+# Categoria e estilo usados quando o pedido não existe no catálogo
+FALLBACK_CATEGORY = "improdutivo"
+FALLBACK_STYLE = "padrao"
+
+SELECTIONS = ("random", "hash")
+
+_OPTIONAL_SEGMENT = re.compile(r"\[\[(.*?)\]\]", re.DOTALL)
+
+
+def _placeholders(text: str) -> FrozenSet[str]:
+    return frozenset(name for _, name, _, _ in string.Formatter().parse(text) if name)
+
+
+class CompiledTemplate(NamedTuple):
+    placeholders: FrozenSet[str]  # Placeholders dos trechos opcionais
+    # Placeholders com valor -> (texto já resolvido, se ainda precisa de format)
+    variants: Dict[FrozenSet[str], Tuple[str, bool]]
+
+    def render(self, values: Mapping[str, str]) -> str:
+        available = frozenset(name for name in self.placeholders if values.get(name))
+        text, needs_format = self.variants[available]
+        return text.format_map(_Values(values)) if needs_format else text
+
+
+class _Values(dict):
+    # Placeholder obrigatório sem valor vira texto vazio em vez de KeyError
+    def __missing__(self, key):
+        return ""
+
+
+def compile_template(text: str) -> CompiledTemplate:
+    """
+    Pré-calcula o texto para cada combinação de placeholders opcionais
+    presentes, deixando para a requisição só a substituição final.
+    """
+    segments = _OPTIONAL_SEGMENT.findall(text)
+    optional = frozenset().union(*(_placeholders(segment) for segment in segments)) if segments else frozenset()
+    variants = {}
+    for size in range(len(optional) + 1):
+        for subset in combinations(sorted(optional), size):
+            available = frozenset(subset)
+            variant = _OPTIONAL_SEGMENT.sub(
+                lambda match: match.group(1) if _placeholders(match.group(1)) <= available else "",
+                text
+            )
+            if _placeholders(variant):
+                variants[available] = (variant, True)
+            else:
+                # Sem placeholders: já resolve as chaves escapadas ({{ }})
+                variants[available] = (variant.format(), False)
+    return CompiledTemplate(optional, variants)
+
+
+def compile_catalog(catalog: Dict) -> Dict[Tuple[str, str], List[CompiledTemplate]]:
+    if not isinstance(catalog, dict):
+        raise ValueError("O catálogo deve ser um objeto {categoria: {estilo: [templates]}}")
+    registry = {}
+    for category, styles in catalog.items():
+        if not isinstance(styles, dict):
+            raise ValueError(f"A categoria '{category}' deve mapear estilos para listas de templates")
+        for style, templates in styles.items():
+            if not templates or not isinstance(templates, list) or not all(isinstance(t, str) for t in templates):
+                raise ValueError(f"Templates inválidos para ({category}, {style})")
+            try:
+                registry[(category.lower(), style)] = [compile_template(t) for t in templates]
+            except (IndexError, KeyError) as e:
+                raise ValueError(f"Placeholder inválido em ({category}, {style}): {e}") from e
+    if (FALLBACK_CATEGORY, FALLBACK_STYLE) not in registry:
+        raise ValueError(f"O catálogo precisa de templates para ({FALLBACK_CATEGORY}, {FALLBACK_STYLE})")
+    return registry
+
+
+class TemplateRegistry:
+    """
+    Registro de templates compilados com recarga a quente: a data de
+    modificação do arquivo é verificada no máximo a cada check_interval
+    segundos, e um arquivo inválido mantém a versão anterior em uso.
+    """
+
+    def __init__(self, path: str = DEFAULT_TEMPLATES_PATH, selection: str = "random", check_interval: float = 2.0):
+        if selection not in SELECTIONS:
+            raise ValueError(f"Seleção de template inválida: {selection} (use {', '.join(SELECTIONS)})")
+        self.path = path
+        self.selection = selection
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._registry: Dict[Tuple[str, str], List[CompiledTemplate]] = {}
+        self._mtime = None
+        self._next_check = 0.0
+        self.reloads = 0
+        self.last_error = None
+        self.reload(force=True)
+
+    def reload(self, force: bool = False) -> bool:
+        """
+        Recarrega o catálogo se o arquivo mudou. Retorna True se recarregou.
+        """
+        with self._lock:
+            mtime = os.stat(self.path).st_mtime_ns
+            if not force and mtime == self._mtime:
+                return False
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    registry = compile_catalog(json.load(f))
+            except (OSError, ValueError) as e:
+                self.last_error = str(e)
+                if not self._registry:
+                    raise
+                logger.error(f"Catálogo de templates inválido em {self.path}, mantendo a versão anterior: {e}")
+                self._mtime = mtime
+                return False
+            self._registry = registry
+            self._mtime = mtime
+            self.last_error = None
+            self.reloads += 1
+            logger.info(f"Catálogo de templates carregado de {self.path}: {len(registry)} combinações")
+            return True
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        try:
+            self.reload()
+        except OSError as e:
+            logger.error(f"Não foi possível verificar o catálogo de templates: {e}")
+
+    def templates(self, category: str, style: str) -> List[CompiledTemplate]:
+        self._maybe_reload()
+        registry = self._registry
+        category = category.lower()
+        return (
+            registry.get((category, style))
+            or registry.get((category, FALLBACK_STYLE))
+            or registry.get((FALLBACK_CATEGORY, style))
+            or registry[(FALLBACK_CATEGORY, FALLBACK_STYLE)]
+        )
+
+    def render(self, category: str, style: str, values: Mapping[str, str] = None, seed: str = None) -> str:
+        """
+        Escolhe e preenche um template. Com seleção por hash e um seed (o
+        texto do email), o mesmo email recebe sempre o mesmo template.
+        """
+        candidates = self.templates(category, style)
+        if self.selection == "hash" and seed is not None:
+            digest = hashlib.blake2b(seed.encode("utf-8"), digest_size=8).digest()
+            template = candidates[int.from_bytes(digest, "big") % len(candidates)]
+        else:
+            template = random.choice(candidates)
+        return template.render(values or {})
+
+    def stats(self) -> Dict:
+        return {
+            "path": os.path.abspath(self.path),
+            "combinations": len(self._registry),
+            "templates": sum(len(t) for t in self._registry.values()),
+            "selection": self.selection,
+            "reloads": self.reloads,
+            "last_error": self.last_error
+        }
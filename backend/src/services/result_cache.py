@@ -0,0 +1,209 @@
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normaliza o texto para que reenvios com espaços ou quebras de linha
+    diferentes gerem a mesma chave.
+    """
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def make_key(namespace: str, *parts: Optional[str]) -> str:
+    """
+    Gera uma chave de cache endereçada por conteúdo (SHA-256).
+    """
+    digest = hashlib.sha256()
+    digest.update(namespace.encode("utf-8"))
+    for part in parts:
+        # Separador explícito evita colisões entre ("ab", "c") e ("a", "bc")
+        digest.update(b"\x00")
+        digest.update((part or "").encode("utf-8"))
+    return digest.hexdigest()
+
+
+class MemoryCache:
+    """
+    Cache LRU em memória com expiração por TTL.
+
+    on_evict, se informado, recebe cada valor removido pelo LRU, pela
+    expiração ou por um set que substitui a entrada; é chamado fora do lock.
+    """
+
+    def __init__(self, max_entries: int = 2048, ttl_seconds: float = 3600.0,
+                 on_evict: Optional[Callable[[Any], None]] = None):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl_seconds
+        self.on_evict = on_evict
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at >= time.monotonic():
+                self._data.move_to_end(key)
+                return True, value
+            del self._data[key]
+        self._evicted([value])
+        return False, None
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            previous = self._data.get(key)
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            evicted = [previous[1]] if previous is not None and previous[1] is not value else []
+            while len(self._data) > self.max_entries:
+                evicted.append(self._data.popitem(last=False)[1][1])
+        self._evicted(evicted)
+
+    def _evicted(self, values: List[Any]):
+        if self.on_evict is None:
+            return
+        for value in values:
+            try:
+                self.on_evict(value)
+            except Exception as e:
+                logger.warning(f"Falha ao descartar entrada do cache: {e}")
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteCache:
+    """
+    Cache persistente em SQLite, para que os resultados sobrevivam a reinícios.
+    Os valores são armazenados como JSON.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = 3600.0):
+        self.path = path
+        self.ttl = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self.purge_expired()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM results WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] < time.time():
+            return False, None
+        return True, json.loads(row[0])
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), time.time() + self.ttl)
+            )
+            self._conn.commit()
+
+    def purge_expired(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM results WHERE expires_at < ?", (time.time(),))
+            self._conn.commit()
+
+
+class ResultCache:
+    """
+    Cache de resultados da IA: LRU em memória na frente de um SQLite opcional.
+    Mantém contadores de acertos e falhas por namespace.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 2048,
+        ttl_seconds: float = 3600.0,
+        sqlite_path: Optional[str] = None,
+        enabled: bool = True
+    ):
+        self.enabled = enabled
+        self.memory = MemoryCache(max_entries, ttl_seconds)
+        self.disk: Optional[SQLiteCache] = None
+        if enabled and sqlite_path:
+            try:
+                self.disk = SQLiteCache(sqlite_path, ttl_seconds)
+            except sqlite3.Error as e:
+                logger.error(f"Não foi possível abrir o cache SQLite em {sqlite_path}: {e}")
+
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._counters_lock = threading.Lock()
+
+    def _count(self, namespace: str, outcome: str):
+        with self._counters_lock:
+            counters = self._counters.setdefault(namespace, {"hits": 0, "disk_hits": 0, "misses": 0})
+            counters[outcome] += 1
+
+    def get(self, namespace: str, key: str) -> Tuple[bool, Any]:
+        """
+        Busca primeiro na memória e depois no disco; acertos no disco são
+        promovidos para a memória.
+        """
+        if not self.enabled:
+            return False, None
+
+        found, value = self.memory.get(key)
+        if found:
+            self._count(namespace, "hits")
+            return True, value
+
+        if self.disk is not None:
+            found, value = self.disk.get(key)
+            if found:
+                self.memory.set(key, value)
+                self._count(namespace, "hits")
+                self._count(namespace, "disk_hits")
+                return True, value
+
+        self._count(namespace, "misses")
+        return False, None
+
+    def set(self, key: str, value: Any):
+        if not self.enabled:
+            return
+        self.memory.set(key, value)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, value)
+            except sqlite3.Error as e:
+                logger.warning(f"Falha ao gravar no cache SQLite: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._counters_lock:
+            counters = {name: dict(values) for name, values in self._counters.items()}
+        for values in counters.values():
+            total = values["hits"] + values["misses"]
+            values["hit_rate"] = round(values["hits"] / total, 3) if total else 0.0
+        return {
+            "enabled": self.enabled,
+            "memory_entries": len(self.memory),
+            "max_entries": self.memory.max_entries,
+            "ttl_seconds": self.memory.ttl,
+            "sqlite_path": self.disk.path if self.disk is not None else None,
+            "namespaces": counters
+        }
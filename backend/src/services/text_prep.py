@@ -0,0 +1,83 @@
+import logging
+from typing import List, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+# Marca inserida no ponto onde o meio do texto foi removido
+ELLIPSIS = " [...] "
+
+
+class PreparedText(NamedTuple):
+    text: str
+    tokens: int  # Tokens após o corte
+    original_tokens: int  # Tokens do texto original
+    truncated: bool
+
+
+def count_tokens(tokenizer, text: str) -> int:
+    """
+    Conta os tokens do texto sem os tokens especiais do modelo.
+    """
+    return len(tokenizer(text, add_special_tokens=False)["input_ids"])
+
+
+def head_tail_truncate(tokenizer, text: str, max_tokens: int, head_fraction: float = 0.6) -> PreparedText:
+    """
+    Limita o texto a max_tokens mantendo o início e o fim.
+
+    O início de um email costuma trazer o pedido e o fim a pergunta ou o prazo;
+    o meio (histórico da thread, anexos colados) é o que menos pesa na decisão.
+    """
+    ids = tokenizer(text, add_special_tokens=False)["input_ids"]
+    total = len(ids)
+    if max_tokens <= 0 or total <= max_tokens:
+        return PreparedText(text, total, total, False)
+
+    head = max(1, int(max_tokens * head_fraction))
+    tail = max(0, max_tokens - head)
+    head_text = tokenizer.decode(ids[:head], skip_special_tokens=True)
+    tail_text = tokenizer.decode(ids[total - tail:], skip_special_tokens=True) if tail else ""
+    return PreparedText(head_text + ELLIPSIS + tail_text, head + tail, total, True)
+
+
+def prepare_for_model(tokenizer, text: str, max_tokens: int, model_name: str) -> PreparedText:
+    """
+    Aplica o orçamento de tokens de um modelo e registra o tamanho da entrada,
+    para acompanhar o custo de atenção (quadrático) em textos longos.
+    """
+    prepared = head_tail_truncate(tokenizer, text, max_tokens)
+    if prepared.truncated:
+        logger.info(
+            f"{model_name}: entrada de {prepared.original_tokens} tokens cortada para "
+            f"{prepared.tokens} (orçamento {max_tokens})"
+        )
+    else:
+        logger.debug(f"{model_name}: entrada de {prepared.tokens} tokens")
+    return prepared
+
+
+class TextWindow(NamedTuple):
+    index: int
+    text: str
+    start_token: int
+    end_token: int
+
+
+def split_windows(tokenizer, text: str, window_tokens: int, overlap_tokens: int = 0, max_windows: int = 0) -> List[TextWindow]:
+    """
+    Divide o texto em janelas de até window_tokens tokens, com overlap_tokens
+    de sobreposição entre janelas vizinhas para não cortar frases no limite.
+    """
+    ids = tokenizer(text, add_special_tokens=False)["input_ids"]
+    if len(ids) <= window_tokens:
+        return [TextWindow(0, text, 0, len(ids))]
+
+    step = max(1, window_tokens - max(0, overlap_tokens))
+    windows = []
+    for start in range(0, len(ids), step):
+        end = min(start + window_tokens, len(ids))
+        chunk = tokenizer.decode(ids[start:end], skip_special_tokens=True)
+        windows.append(TextWindow(len(windows), chunk, start, end))
+        if end == len(ids) or (max_windows and len(windows) >= max_windows):
+            break
+    return windows
@@ -0,0 +1,84 @@
+import threading
+import time
+
+import pytest
+
+from src.services.batching import MicroBatcher
+
+
+class FakeClassifier:
+    """
+    Classificador de teste: registra cada lote e pode segurar o processamento.
+    """
+
+    def __init__(self):
+        self.batches = []
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def __call__(self, items):
+        self.gate.wait(5)
+        self.batches.append(list(items))
+        return [f"categoria-{item}" for item in items]
+
+
+@pytest.fixture
+def classifier():
+    return FakeClassifier()
+
+
+def test_full_batch_is_flushed_without_waiting_the_window(classifier):
+    batcher = MicroBatcher(classifier, max_batch_size=4, max_wait_ms=5000)
+    started = time.perf_counter()
+    futures = [batcher.submit(i) for i in range(6)]
+    assert [f.result(timeout=2) for f in futures[:4]] == [f"categoria-{i}" for i in range(4)]
+    assert time.perf_counter() - started < 2
+    assert classifier.batches == [[0, 1, 2, 3]]
+    batcher.shutdown()
+    assert [f.result(timeout=0) for f in futures[4:]] == ["categoria-4", "categoria-5"]
+
+
+def test_partial_batch_is_flushed_after_max_wait(classifier):
+    batcher = MicroBatcher(classifier, max_batch_size=8, max_wait_ms=50)
+    started = time.perf_counter()
+    futures = [batcher.submit(i) for i in range(3)]
+    assert [f.result(timeout=2) for f in futures] == ["categoria-0", "categoria-1", "categoria-2"]
+    assert time.perf_counter() - started >= 0.045
+    assert classifier.batches == [[0, 1, 2]]
+    stats = batcher.stats()
+    assert (stats["batches"], stats["items"], stats["largest_batch"]) == (1, 3, 3)
+    batcher.shutdown()
+
+
+def test_batch_error_is_fanned_out_to_every_caller():
+    def failing(items):
+        raise ValueError("modelo indisponível")
+
+    batcher = MicroBatcher(failing, max_batch_size=4, max_wait_ms=20)
+    futures = [batcher.submit(i) for i in range(3)]
+    for future in futures:
+        with pytest.raises(ValueError, match="modelo indisponível"):
+            future.result(timeout=2)
+    batcher.shutdown()
+
+
+def test_wrong_result_count_fails_the_batch():
+    batcher = MicroBatcher(lambda items: items[:-1], max_batch_size=2, max_wait_ms=1000)
+    futures = [batcher.submit(i) for i in range(2)]
+    for future in futures:
+        with pytest.raises(RuntimeError, match="resultados"):
+            future.result(timeout=2)
+    batcher.shutdown()
+
+
+def test_shutdown_drains_queued_items_and_rejects_new_ones(classifier):
+    batcher = MicroBatcher(classifier, max_batch_size=2, max_wait_ms=5000)
+    classifier.gate.clear()
+    futures = [batcher.submit(i) for i in range(5)]
+    threading.Timer(0.05, classifier.gate.set).start()
+    batcher.shutdown(wait=True)
+    assert [f.result(timeout=0) for f in futures] == [f"categoria-{i}" for i in range(5)]
+    assert sorted(i for batch in classifier.batches for i in batch) == [0, 1, 2, 3, 4]
+    assert all(len(batch) <= 2 for batch in classifier.batches)
+    with pytest.raises(RuntimeError):
+        batcher.submit(99)
@@ -0,0 +1,66 @@
+import base64
+import quopri
+import threading
+
+import pytest
+
+from scripts.imap_bench import FakeIMAPServer, make_messages
+from src.core.config import settings
+from src.services.email_reader import _decode_partial, fetch_unread_emails, imap_pool
+
+TEXT = "Olá, preciso do orçamento até sexta. Ação necessária: revisão."
+
+
+def test_decode_partial_plain_utf8_cut_inside_character():
+    data = TEXT.encode("utf-8")
+    cut = data.index("ç".encode("utf-8")) + 1  # metade do "ç"
+    assert _decode_partial(data[:cut], "8BIT", "utf-8") == TEXT[:TEXT.index("ç")]
+
+
+def test_decode_partial_base64_drops_incomplete_block():
+    encoded = base64.encodebytes(TEXT.encode("utf-8"))  # com quebras de linha
+    decoded = _decode_partial(encoded[:37], "BASE64", "utf-8")
+    assert decoded and TEXT.startswith(decoded)
+    assert _decode_partial(encoded, "BASE64", "utf-8") == TEXT
+
+
+@pytest.mark.parametrize("cut", [1, 2])
+def test_decode_partial_quoted_printable_drops_incomplete_escape(cut):
+    encoded = quopri.encodestring(TEXT.encode("utf-8"))
+    escape = encoded.index(b"=")
+    decoded = _decode_partial(encoded[:escape + cut], "QUOTED-PRINTABLE", "utf-8")
+    assert decoded == "Ol"
+
+
+def test_decode_partial_latin1_and_unknown_charset():
+    assert _decode_partial(TEXT.encode("latin-1"), "8BIT", "iso-8859-1") == TEXT
+    assert _decode_partial(TEXT.encode("utf-8"), "8BIT", "x-desconhecido") == TEXT
+
+
+@pytest.fixture
+def imap_server():
+    server = FakeIMAPServer(make_messages(3, attachment_kb=512, text_chars=4000))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    imap_pool.close_all()
+    server.shutdown()
+    server.server_close()
+
+
+def test_fetch_reads_partial_text_without_attachments(imap_server, monkeypatch):
+    monkeypatch.setattr(settings, "IMAP_BODY_MAX_BYTES", 1000)
+    port = imap_server.server_address[1]
+    emails = fetch_unread_emails("user", "senha", "127.0.0.1", max_emails=3, ssl=False, port=port)
+    assert sorted(e["subject"] for e in emails) == [f"Reunião do projeto {uid}" for uid in (1, 2, 3)]
+    for item in emails:
+        assert item["body"].startswith("Olá, preciso do orçamento revisado")
+        assert len(item["body"].encode("utf-8")) <= 1000
+    # Os anexos de 512 KB nunca são baixados
+    assert imap_server.counters()["bytes_sent"] < 3 * 512 * 1024 // 4
+
+
+def test_fetch_reuses_pooled_connection(imap_server):
+    port = imap_server.server_address[1]
+    for _ in range(3):
+        fetch_unread_emails("user", "senha", "127.0.0.1", max_emails=1, ssl=False, port=port)
+    assert imap_server.counters()["connections"] == 1
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from src.services.embedding_classifier import ClassifierHead, _l2_normalize, fit_centroid_head, fit_logistic_head
+
+LABELS = ["improdutivo", "produtivo"]
+
+
+def _clusters(seed=0, n=40, dim=16):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(2, dim)) * 3
+    y = np.arange(n) % 2
+    embeddings = centers[y] + rng.normal(size=(n, dim))
+    return _l2_normalize(embeddings).astype(np.float32), y
+
+
+@pytest.mark.parametrize("fit", [fit_centroid_head, fit_logistic_head])
+def test_heads_separate_clusters(fit):
+    embeddings, y = _clusters()
+    head = fit(embeddings, y, LABELS, "encoder")
+    probs = head.predict_proba(embeddings)
+    assert probs.shape == (len(y), 2)
+    assert np.allclose(probs.sum(axis=1), 1.0, atol=1e-5)
+    assert (probs.argmax(axis=1) == y).mean() == 1.0
+
+
+def test_head_roundtrip(tmp_path):
+    embeddings, y = _clusters(seed=1)
+    head = fit_logistic_head(embeddings, y, LABELS, "encoder")
+    path = str(tmp_path / "cabeca.npz")
+    head.save(path)
+    loaded = ClassifierHead.load(path)
+    assert (loaded.labels, loaded.kind, loaded.encoder_name) == (LABELS, "logistic", "encoder")
+    assert np.allclose(loaded.predict_proba(embeddings), head.predict_proba(embeddings))
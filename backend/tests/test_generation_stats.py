@@ -0,0 +1,51 @@
+import pytest
+
+from src.core.config import settings
+from src.services import ai_services
+from src.services.result_cache import ResultCache
+from tests.test_text_prep import WordTokenizer
+
+
+class FakeGenerator:
+    """
+    Gerador de teste: respostas curtas demais para os emails marcados com "curto".
+    """
+    tokenizer = WordTokenizer()
+
+    def __call__(self, prompts, **kwargs):
+        if isinstance(prompts, str):
+            return self([prompts])[0]
+        return [
+            [{"generated_text": "ok" if "curto" in prompt else "Obrigado pelo contato, retorno em breve."}]
+            for prompt in prompts
+        ]
+
+
+@pytest.fixture
+def generation(monkeypatch):
+    monkeypatch.setattr(ai_services, "generator", FakeGenerator())
+    monkeypatch.setattr(ai_services, "_load_started", True)
+    monkeypatch.setattr(ai_services, "result_cache", ResultCache(enabled=False))
+    monkeypatch.setattr(settings, "GENERATOR_BATCH_SIZE", 8)
+    before = ai_services.get_generation_stats()["counts"]
+    return lambda: {
+        name: count - before[name] for name, count in ai_services.get_generation_stats()["counts"].items()
+    }
+
+
+def test_batch_counts_short_outputs_as_template(generation):
+    texts = ["preciso do relatório", "email curto", "revise o contrato", "outro curto"]
+    results = ai_services.suggest_responses(texts, ["produtivo"] * 4)
+    strategy = ai_services.DECODING_STRATEGIES[0].name
+    assert [r.strategy for r in results] == [strategy, "template", strategy, "template"]
+    counts = generation()
+    assert counts[strategy] == 2 and counts["template"] == 2
+
+
+def test_single_and_batch_paths_count_the_same(generation):
+    ai_services.generate_suggestion("email curto", "produtivo")
+    ai_services.generate_suggestion("preciso do relatório", "produtivo")
+    single = generation()
+    ai_services.suggest_responses(["email curto", "preciso do relatório"], ["produtivo"] * 2)
+    both = generation()
+    assert {name: both[name] - single[name] for name in both} == single
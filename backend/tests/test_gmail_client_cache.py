@@ -0,0 +1,92 @@
+import threading
+
+import pytest
+
+from src.services import gmail_oauth
+from src.services.result_cache import MemoryCache
+
+
+class FakeService:
+    def __init__(self, token):
+        self.token = token
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def clients(monkeypatch):
+    monkeypatch.setattr(gmail_oauth, "_build_gmail_service", FakeService)
+    monkeypatch.setattr(gmail_oauth, "_service_cache", MemoryCache(
+        max_entries=1, ttl_seconds=600, on_evict=lambda entry: gmail_oauth._retire_service(*entry)
+    ))
+    monkeypatch.setattr(gmail_oauth, "_service_stats", {"hits": 0, "misses": 0, "closed": 0})
+    monkeypatch.setattr(gmail_oauth, "_retired_services", {})
+    return gmail_oauth.get_gmail_service_with_token
+
+
+def _in_thread(func, *args):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(func(*args)))
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+def test_cached_client_is_reused(clients):
+    first = clients("token")
+    assert clients("token") is first
+    assert gmail_oauth.get_gmail_client_stats()["hits"] == 1
+
+
+def test_client_evicted_by_owner_thread_is_closed(clients):
+    first = clients("a")
+    second = clients("b")
+    assert first.closed and not second.closed
+    assert gmail_oauth.get_gmail_client_stats()["closed"] == 1
+
+
+def test_client_evicted_by_other_thread_is_closed_by_owner(clients):
+    mine = clients("a")
+    owner_done, evicted = threading.Event(), threading.Event()
+
+    def other_thread():
+        clients("b")
+        evicted.set()
+        owner_done.wait()
+
+    thread = threading.Thread(target=other_thread)
+    thread.start()
+    evicted.wait()
+    # "b" despejou "a": outra thread não fecha um cliente que pode estar em uso
+    assert not mine.closed
+    assert gmail_oauth.get_gmail_client_stats()["pending_close"] == 1
+    clients("c")
+    assert mine.closed
+    # O cliente de "b" sai agora, mas a thread dona ainda está viva
+    assert gmail_oauth.get_gmail_client_stats()["pending_close"] == 1
+    owner_done.set()
+    thread.join()
+    clients("d")
+    assert gmail_oauth.get_gmail_client_stats()["pending_close"] == 0
+
+
+def test_client_of_finished_thread_is_closed_on_eviction(clients):
+    other = _in_thread(clients, "a")
+    clients("b")
+    assert other.closed
+
+
+def test_stats_are_consistent_under_concurrency(clients):
+    def worker():
+        for _ in range(500):
+            clients("token")
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = gmail_oauth.get_gmail_client_stats()
+    assert stats["hits"] + stats["misses"] == 4000
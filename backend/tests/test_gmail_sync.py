@@ -0,0 +1,165 @@
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from src.services import gmail_oauth
+from src.services.gmail_sync_store import GmailSyncStore
+
+ACCOUNT = "eu@exemplo.com"
+
+
+def _message(message_id, thread_id=None, date=0, **email):
+    return {"message_id": message_id, "thread_id": thread_id or f"t-{message_id}", "internal_date": date,
+            "email": {"id": message_id, **email}}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return GmailSyncStore(str(tmp_path / "sync.db"), max_messages_per_account=3)
+
+
+def test_cursor_roundtrip_and_reset(store):
+    assert store.get_cursor(ACCOUNT) is None
+    store.set_cursor(ACCOUNT, 100)
+    assert store.get_cursor(ACCOUNT) == "100"
+    store.save_messages(ACCOUNT, [_message("a")])
+    store.reset(ACCOUNT)
+    assert store.get_cursor(ACCOUNT) is None and store.latest(ACCOUNT, 10) == []
+
+
+def test_keeps_only_most_recent_messages(store):
+    store.save_messages(ACCOUNT, [_message(str(i), date=i) for i in range(5)])
+    assert [m["id"] for m in store.latest(ACCOUNT, 10)] == ["4", "3", "2"]
+    assert store.latest("outra@exemplo.com", 10) == []
+
+
+def test_mark_replied_skips_sent_message_and_counts_once(store):
+    store.save_messages(ACCOUNT, [_message("a", "t1", 1), _message("b", "t1", 2), _message("c", "t2", 3)])
+    assert store.mark_replied(ACCOUNT, "t1", "b") == 1
+    assert store.mark_replied(ACCOUNT, "t1", "b") == 0
+    replied = {m["id"]: m.get("already_replied", False) for m in store.latest(ACCOUNT, 10)}
+    assert replied == {"a": True, "b": False, "c": False}
+
+
+def test_apply_sync_is_compare_and_set(store):
+    assert store.apply_sync(ACCOUNT, None, "10", [_message("a", "t1", 1)]) == 0
+    # Segunda sincronização que leu o mesmo cursor (None) chega depois: nada muda
+    assert store.apply_sync(ACCOUNT, None, "11", [_message("x", date=9)]) is None
+    assert store.get_cursor(ACCOUNT) == "10" and [m["id"] for m in store.latest(ACCOUNT, 10)] == ["a"]
+
+    replied = store.apply_sync(ACCOUNT, "10", "12", [_message("b", date=2)], removed=["a"], sent=[("t1", "s1")])
+    assert replied == 0 and store.get_cursor(ACCOUNT) == "12"
+    assert [m["id"] for m in store.latest(ACCOUNT, 10)] == ["b"]
+
+
+class FakeGmail:
+    """
+    Gmail falso para prepare_sync: perfil, history().list e uma caixa de entrada.
+    """
+
+    def __init__(self):
+        self.history_id = 100
+        self.inbox = ["m1", "m2"]
+        self.records = []
+        self.expired = False
+        self.history_calls = 0
+
+    def users(self):
+        return self
+
+    def getProfile(self, userId):
+        return _Execute(lambda: {"emailAddress": ACCOUNT, "historyId": str(self.history_id)})
+
+    def history(self):
+        return self
+
+    def list(self, userId, startHistoryId, historyTypes, pageToken=None):
+        def execute():
+            self.history_calls += 1
+            if self.expired:
+                raise HttpError(httplib2.Response({"status": 404}), b"expired")
+            records = [record for history_id, record in self.records if history_id > int(startHistoryId)]
+            return {"history": records, "historyId": str(self.history_id)}
+        return _Execute(execute)
+
+    def deliver(self, message_id, thread_id=None, labels=("INBOX",)):
+        self.history_id += 1
+        self.inbox.append(message_id)
+        message = {"id": message_id, "threadId": thread_id or f"t-{message_id}", "labelIds": list(labels)}
+        self.records.append((self.history_id, {"messagesAdded": [{"message": message}]}))
+
+
+class _Execute:
+    def __init__(self, func):
+        self.execute = func
+
+
+@pytest.fixture
+def gmail(monkeypatch, store):
+    fake = FakeGmail()
+    monkeypatch.setattr(gmail_oauth, "_store", store)
+    monkeypatch.setattr(gmail_oauth, "get_gmail_service_with_token", lambda token: fake)
+    monkeypatch.setattr(gmail_oauth, "_list_inbox", lambda service, max_results, calls: fake.inbox[-max_results:])
+    monkeypatch.setattr(gmail_oauth, "_fetch_messages", lambda service, ids, calls: (
+        {i: {"threadId": f"t-{i}", "internalDate": int(i[1:])} for i in ids}, 0
+    ))
+    monkeypatch.setattr(gmail_oauth, "_fetch_threads", lambda service, data, calls: ({}, 0))
+    monkeypatch.setattr(gmail_oauth, "_parse_message", lambda message_id, data, threads: {"id": message_id})
+    return fake
+
+
+def _sync(max_results=10):
+    pending = gmail_oauth.prepare_sync("token", max_results)
+    return pending, gmail_oauth.complete_sync(pending, [dict(m["parsed"]) for m in pending.new_messages])
+
+
+def test_full_then_incremental_sync(gmail, store):
+    pending, (emails, metadata) = _sync()
+    assert metadata["sync_mode"] == "full" and [e["id"] for e in emails] == ["m2", "m1"]
+    assert store.get_cursor(ACCOUNT) == "100"
+
+    gmail.deliver("m3")
+    pending, (emails, metadata) = _sync()
+    assert metadata["sync_mode"] == "incremental" and [m["message_id"] for m in pending.new_messages] == ["m3"]
+    assert [e["id"] for e in emails] == ["m3", "m2", "m1"] and store.get_cursor(ACCOUNT) == "101"
+
+
+def test_expired_cursor_falls_back_to_full_sync(gmail, store):
+    _sync()
+    store.save_messages(ACCOUNT, [_message("m0", date=0)])  # email que já saiu da caixa
+    gmail.expired = True
+    gmail.deliver("m3")
+    pending, (emails, metadata) = _sync()
+    assert metadata["sync_mode"] == "full" and gmail.history_calls == 1
+    assert [e["id"] for e in emails] == ["m3", "m2", "m1"]
+    assert store.get_cursor(ACCOUNT) == "101"
+
+
+def test_sent_reply_marks_thread_as_replied(gmail, store):
+    _sync()
+    gmail.deliver("s1", thread_id="t-m1", labels=("SENT",))
+    _, (emails, metadata) = _sync()
+    assert metadata["newly_replied"] == 1
+    assert {e["id"]: e.get("already_replied", False) for e in emails} == {"m2": False, "m1": True}
+
+
+def test_concurrent_incremental_syncs_write_once(gmail, store):
+    _sync()
+    gmail.deliver("m3")
+    first = gmail_oauth.prepare_sync("token", 10)
+    second = gmail_oauth.prepare_sync("token", 10)
+    gmail.deliver("m4")
+    late = gmail_oauth.prepare_sync("token", 10)
+
+    _, metadata = gmail_oauth.complete_sync(first, [{"id": "m3", "by": "first"}])
+    assert not metadata["sync_conflict"]
+    emails, metadata = gmail_oauth.complete_sync(second, [{"id": "m3", "by": "second"}])
+    assert metadata["sync_conflict"] and metadata["newly_replied"] == 0
+    assert [e.get("by") for e in emails if e["id"] == "m3"] == ["first"]
+    gmail_oauth.complete_sync(late, [{"id": "m3"}, {"id": "m4"}])
+    assert store.get_cursor(ACCOUNT) == "101"
+
+    # O próximo history().list parte do cursor gravado e encontra o m4
+    pending, (emails, _) = _sync()
+    assert [m["message_id"] for m in pending.new_messages] == ["m4"]
+    assert store.get_cursor(ACCOUNT) == "102"
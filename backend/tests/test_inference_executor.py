@@ -0,0 +1,61 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import pytest
+
+from src.services.inference_executor import BoundedExecutor, ExecutorQueueFull
+
+
+@pytest.fixture
+def executor():
+    executor = BoundedExecutor(kind="thread", max_workers=1, max_queue=0, timeout=5, name="teste")
+    yield executor
+    executor.shutdown()
+
+
+def test_call_waits_for_a_slot_and_respects_max_workers(executor):
+    running, peak, lock = [0], [0], threading.Lock()
+
+    def task(value):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        return value * 2
+
+    results = []
+    threads = [threading.Thread(target=lambda v=v: results.append(executor.call(task, v))) for v in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(results) == [0, 2, 4, 6] and peak[0] == 1
+    assert executor.stats()["pending"] == 0
+
+
+def test_call_occupies_the_slot_seen_by_run(executor):
+    started, release = threading.Event(), threading.Event()
+
+    def blocking():
+        started.set()
+        release.wait()
+
+    thread = threading.Thread(target=executor.call, args=(blocking,))
+    thread.start()
+    started.wait()
+    with pytest.raises(ExecutorQueueFull):
+        asyncio.run(executor.run(len, "abc"))
+    release.set()
+    thread.join()
+    assert asyncio.run(executor.run(len, "abc")) == 3
+
+
+def test_call_timeout_and_errors(executor):
+    with pytest.raises(FutureTimeoutError):
+        executor.call(time.sleep, 0.2, timeout=0.01)
+    with pytest.raises(ZeroDivisionError):
+        executor.call(lambda: 1 / 0)
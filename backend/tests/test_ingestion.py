@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from src.services.ingestion import UploadTooLarge, read_text_upload
+
+
+class FakeUpload:
+    def __init__(self, data: bytes):
+        self.data = data
+        self.position = 0
+        self.reads = 0
+
+    async def read(self, size: int) -> bytes:
+        self.reads += 1
+        chunk = self.data[self.position:self.position + size]
+        self.position += len(chunk)
+        return chunk
+
+
+def _read(data: bytes, max_chars: int, chunk_size: int = 4, max_bytes: int = 1000):
+    upload = FakeUpload(data)
+    text, info = asyncio.run(read_text_upload(upload, max_bytes, max_chars, chunk_size))
+    return text, info, upload
+
+
+def test_file_of_exactly_max_chars_is_not_truncated():
+    text, info, _ = _read(b"abcdefgh", max_chars=8)
+    assert text == "abcdefgh" and not info["truncated"] and info["stop_reason"] is None
+
+
+def test_longer_file_is_cut_and_reading_stops_early():
+    text, info, upload = _read(b"abcdefghij" * 10, max_chars=8)
+    assert text == "abcdefgh" and info["truncated"] and info["stop_reason"] == "max_chars"
+    assert upload.position < len(upload.data)
+
+
+def test_multibyte_character_split_across_chunks():
+    data = "açãoé".encode("utf-8")  # 8 bytes, 5 caracteres
+    text, info, _ = _read(data, max_chars=5, chunk_size=3)
+    assert text == "açãoé" and not info["truncated"]
+
+
+def test_multibyte_character_at_the_limit_counts_as_truncation():
+    data = "abcdé".encode("utf-8")
+    text, info, _ = _read(data, max_chars=4, chunk_size=5)  # o "é" fica pela metade no bloco
+    assert text == "abcd" and info["truncated"]
+
+
+def test_bom_is_removed():
+    text, _, _ = _read("\ufeffolá".encode("utf-8"), max_chars=10)
+    assert text == "olá"
+
+
+def test_invalid_utf8_and_size_limit():
+    with pytest.raises(ValueError):
+        _read(b"abc\xff", max_chars=10)
+    with pytest.raises(ValueError):
+        _read("olá".encode("utf-8")[:-1], max_chars=10)  # termina no meio de um caractere
+    with pytest.raises(UploadTooLarge):
+        _read(b"a" * 20, max_chars=100, max_bytes=10)
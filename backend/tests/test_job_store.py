@@ -0,0 +1,82 @@
+import pytest
+
+from src.services.job_store import JobStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.db"))
+
+
+def _items(n, prefix="email"):
+    return [(f"{prefix} {i}", f"id-{i}") for i in range(n)]
+
+
+def _success(indexes):
+    return [{"index": i, "status": "success"} for i in indexes]
+
+
+def test_claim_batch_reserves_items_in_order(store):
+    job_id = store.create_job(_items(5), "formal", None)
+    job, items = store.claim_batch(3)
+    assert job["job_id"] == job_id and job["status"] == "running" and job["started_at"]
+    assert [idx for idx, _, _ in items] == [0, 1, 2]
+    assert items[0] == (0, "email 0", "id-0")
+    _, items = store.claim_batch(3)
+    assert [idx for idx, _, _ in items] == [3, 4]
+    assert store.claim_batch(3) is None
+
+
+def test_claim_batch_moves_to_next_job_when_oldest_is_fully_reserved(store):
+    first = store.create_job(_items(2), "formal", None)
+    second = store.create_job(_items(2, "outro"), "formal", None)
+    assert store.claim_batch(10)[0]["job_id"] == first
+    job, items = store.claim_batch(10)
+    assert job["job_id"] == second and [text for _, text, _ in items] == ["outro 0", "outro 1"]
+
+
+def test_save_results_completes_job_and_orders_by_finish(store):
+    job_id = store.create_job(_items(4), "formal", None)
+    store.claim_batch(2)
+    store.claim_batch(2)
+    store.save_results(job_id, _success([2, 3]))
+    assert store.get_job(job_id)["status"] == "running"
+    store.save_results(job_id, [{"index": 0, "status": "success"}, {"index": 1, "status": "failed"}])
+    job = store.get_job(job_id)
+    assert (job["status"], job["processed"], job["successful"], job["failed"], job["progress"]) == ("completed", 4, 3, 1, 1.0)
+    results, cursor = store.results(job_id, limit=3)
+    assert [r["index"] for r in results] == [2, 3, 0]
+    results, cursor = store.results(job_id, cursor)
+    assert [r["index"] for r in results] == [1] and store.results(job_id, cursor) == ([], cursor)
+    assert store.pending_items() == 0
+
+
+def test_recover_returns_in_flight_items_after_restart(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    store = JobStore(path)
+    job_id = store.create_job(_items(3), "formal", None)
+    store.claim_batch(2)
+    store.save_results(job_id, _success([0]))
+
+    restarted = JobStore(path)
+    assert restarted.recover() == 1
+    job, items = restarted.claim_batch(10)
+    assert job["job_id"] == job_id and [idx for idx, _, _ in items] == [1, 2]
+    restarted.save_results(job_id, _success([1, 2]))
+    assert restarted.get_job(job_id)["status"] == "completed"
+    assert restarted.recover() == 0
+
+
+def test_release_batch_and_cancel(store):
+    job_id = store.create_job(_items(3), "formal", None)
+    _, items = store.claim_batch(2)
+    store.release_batch(job_id, [idx for idx, _, _ in items])
+    assert [idx for idx, _, _ in store.claim_batch(3)[1]] == [0, 1, 2]
+    store.release_batch(job_id, [2])
+    assert store.cancel(job_id) and not store.cancel(job_id)
+    assert store.claim_batch(3) is None
+    # Itens reservados antes do cancelamento ainda podem ser gravados
+    store.save_results(job_id, _success([0, 1]))
+    job = store.get_job(job_id)
+    assert (job["status"], job["processed"]) == ("cancelled", 2)
+    assert store.counts() == {"cancelled": 1}
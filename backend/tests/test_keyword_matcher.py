@@ -0,0 +1,102 @@
+import json
+import os
+
+import pytest
+
+from src.services import keyword_matcher
+from src.services.keyword_matcher import (
+    INSIGHT_KEYWORDS,
+    PRODUCTIVE_INDICATORS,
+    UNPRODUCTIVE_INDICATORS,
+    VOCABULARY,
+)
+
+EVAL_PATH = os.path.join(os.path.dirname(__file__), "..", "src", "data", "eval_emails.jsonl")
+
+EDGE_CASES = [
+    "",
+    "oi",
+    "Oito errors no report!",  # 'oi' em 'oito', 'erro' e 'error' em 'errors'
+    "Obrigado, thanks, THANK YOU",
+    "Reunião urgente sobre o contrato? Preciso do orçamento até o prazo.",
+    "Parabéns pela festa! Feliz aniversário e felicidades",
+    "Promoção com desconto: oferta especial na newsletter",
+    "hihihi hello hellohello",  # ocorrências sobrepostas e repetidas
+    "palavra " * 25,  # empate decidido pelo tamanho
+    "Quando possível, sem pressa: por favor revise o documento e a planilha.",
+]
+
+
+def _eval_texts():
+    with open(EVAL_PATH, encoding="utf-8") as f:
+        return [json.loads(line)["text"] for line in f if line.strip()]
+
+
+def _reference_scores(text):
+    # Implementação original: uma busca de substring por palavra-chave
+    text_lower = text.lower()
+    productive = sum(weight for words, weight in PRODUCTIVE_INDICATORS.values() for word in words if word in text_lower)
+    unproductive = sum(weight for words, weight in UNPRODUCTIVE_INDICATORS.values() for word in words if word in text_lower)
+    word_count = len(text.split())
+    if word_count < 5:
+        unproductive += 1
+    if productive > 0 and ("?" in text or "!" in text):
+        productive += 1
+    return productive, unproductive, word_count
+
+
+def _reference_label(text):
+    productive, unproductive, word_count = _reference_scores(text)
+    if productive > unproductive:
+        return "produtivo"
+    if unproductive > productive:
+        return "improdutivo"
+    return "produtivo" if word_count > 20 else "improdutivo"
+
+
+CORPUS = EDGE_CASES + _eval_texts()
+
+
+@pytest.mark.parametrize("text", CORPUS)
+def test_score_text_matches_substring_reference(text):
+    score = keyword_matcher.score_text(text)
+    productive, unproductive, word_count = _reference_scores(text)
+    assert (score.productive, score.unproductive, score.word_count) == (productive, unproductive, word_count)
+    assert score.label == _reference_label(text)
+
+
+@pytest.mark.parametrize("text", CORPUS)
+def test_find_keywords_matches_substring_reference(text):
+    text_lower = text.lower()
+    assert keyword_matcher.find_keywords(text_lower) == {word for word in VOCABULARY if word in text_lower}
+
+
+def test_batch_matches_single_text_path():
+    labels, confidences = keyword_matcher.classify_batch_with_confidence(CORPUS)
+    scores = keyword_matcher.score_batch(CORPUS)
+    for i, text in enumerate(CORPUS):
+        single = keyword_matcher.score_text(text)
+        assert tuple(scores[i]) == (single.productive, single.unproductive)
+        assert labels[i] == single.label
+        assert confidences[i] == pytest.approx(single.confidence)
+
+
+def test_empty_batch():
+    labels, confidences = keyword_matcher.classify_batch_with_confidence([])
+    assert labels == [] and len(confidences) == 0
+
+
+def test_probabilities_sum_to_one_and_favor_label():
+    for text in CORPUS:
+        score = keyword_matcher.score_text(text)
+        probabilities = score.probabilities()
+        assert sum(probabilities.values()) == pytest.approx(1.0, abs=1e-3)
+        assert max(probabilities, key=probabilities.get) == score.label
+
+
+def test_insight_keywords_keep_list_order():
+    matches = keyword_matcher.find_keywords("prazo urgente do projeto, por favor")
+    insights = keyword_matcher.insight_keywords(matches)
+    assert insights["palavras_produtivo"] == [w for w in INSIGHT_KEYWORDS["palavras_produtivo"] if w in matches]
+    assert insights["urgencia_alta"] == ["urgente"]
+    assert insights["tom_cordial"] == ["por favor"]
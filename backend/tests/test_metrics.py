@@ -0,0 +1,100 @@
+import pytest
+
+from src.services.metrics import Histogram, MetricsRegistry
+
+
+def _lines(registry):
+    return registry.render_prometheus().splitlines()
+
+
+def test_histogram_buckets_are_cumulative_with_inf():
+    registry = MetricsRegistry(prefix="t")
+    for seconds in (0.0001, 0.003, 0.003, 120.0):
+        registry.observe("classification", seconds)
+    lines = _lines(registry)
+    assert lines[:2] == [
+        "# HELP t_stage_latency_seconds Latência de cada etapa do processamento.",
+        "# TYPE t_stage_latency_seconds histogram",
+    ]
+    buckets = {
+        line.split('le="')[1].split('"')[0]: int(line.rsplit(" ", 1)[1])
+        for line in lines if line.startswith("t_stage_latency_seconds_bucket")
+    }
+    # Limite inclusivo: 0.0001 cai no primeiro bucket
+    assert buckets["0.0001"] == 1 and buckets["0.0025"] == 1 and buckets["0.005"] == 3
+    assert buckets["60.0"] == 3 and buckets["+Inf"] == 4
+    counts = list(buckets.values())
+    assert counts == sorted(counts)
+    assert 't_stage_latency_seconds_count{stage="classification"} 4' in lines
+    total = next(line for line in lines if line.startswith("t_stage_latency_seconds_sum"))
+    assert float(total.rsplit(" ", 1)[1]) == pytest.approx(120.0061)
+
+
+def test_counters_and_label_escaping():
+    registry = MetricsRegistry(prefix="t")
+    registry.inc("categories_total", category="produtivo")
+    registry.inc("categories_total", 2, category="produtivo")
+    registry.inc("custom_total", 0.5, subject='a "b"\\c\nd')
+    lines = _lines(registry)
+    assert "# TYPE t_categories_total counter" in lines
+    assert 't_categories_total{category="produtivo"} 3' in lines
+    assert "# HELP t_custom_total custom_total" in lines
+    assert 't_custom_total{subject="a \\"b\\"\\\\c\\nd"} 0.5' in lines
+
+
+def test_gauges_with_labels_skip_none_and_broken_collectors():
+    registry = MetricsRegistry(prefix="t")
+    registry.register_gauge("queue_depth", "Fila.", lambda: 3)
+    registry.register_gauge("executor_busy", "Ocupação.", lambda: {"io": 1, "pdf": None}, label="executor")
+    registry.register_gauge("absent", "Sem valor.", lambda: None)
+    registry.register_gauge("broken", "Com defeito.", lambda: 1 / 0)
+    lines = _lines(registry)
+    assert lines == [
+        "# HELP t_executor_busy Ocupação.",
+        "# TYPE t_executor_busy gauge",
+        't_executor_busy{executor="io"} 1',
+        "# HELP t_queue_depth Fila.",
+        "# TYPE t_queue_depth gauge",
+        "t_queue_depth 3",
+    ]
+    assert registry.snapshot()["gauges"] == {"executor_busy": {"io": 1}, "queue_depth": 3}
+
+
+def test_request_metrics_in_snapshot():
+    registry = MetricsRegistry(prefix="t")
+    registry.observe_request("/api/v1/analyze", "POST", 200, 0.2)
+    registry.observe_request("/api/v1/analyze", "POST", 503, 0.01)
+    request = registry.snapshot()["requests"]["/api/v1/analyze"]
+    assert request["count"] == 2 and request["by_status"] == {"200": 1, "503": 1}
+
+
+def test_drain_and_merge_move_observations_between_registries():
+    worker, parent = MetricsRegistry(prefix="t"), MetricsRegistry(prefix="t")
+    worker.observe("generation", 0.5)
+    worker.inc("generations_total", strategy="beam4")
+    parent.observe("generation", 2.0)
+    parent.merge(worker.drain())
+
+    assert worker.snapshot()["stages"] == {} and worker.snapshot()["counters"] == {}
+    stage = parent.snapshot()["stages"]["generation"]
+    assert stage["count"] == 2 and stage["max_ms"] == 2000.0
+    assert parent.counter_values("generations_total", "strategy") == {"beam4": 1}
+
+
+def test_disabled_registry_records_nothing():
+    registry = MetricsRegistry(prefix="t", enabled=False)
+    with registry.timer("upload"):
+        pass
+    registry.inc("categories_total", category="produtivo")
+    registry.merge({"histograms": [(("stage_latency_seconds", (("stage", "x"),)), [1] * 19, 1.0, 1.0)], "counters": []})
+    assert registry.render_prometheus() == "\n"
+
+
+def test_histogram_quantiles_are_bounded_by_max():
+    histogram = Histogram()
+    for _ in range(99):
+        histogram.observe(0.001)
+    histogram.observe(0.04)
+    summary = histogram.summary()
+    assert summary["p50_ms"] <= 1.0
+    assert summary["p99_ms"] <= 1.0 < summary["max_ms"] == 40.0
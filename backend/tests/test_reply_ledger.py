@@ -0,0 +1,114 @@
+import sqlite3
+
+import pytest
+
+from src.services import reply_ledger
+from src.services.reply_ledger import ReplyLedger
+
+ACCOUNT = "eu@exemplo.com"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(reply_ledger.time, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def ledger(tmp_path, clock):
+    return ReplyLedger(str(tmp_path / "replies.db"), claim_ttl=30, prune_interval=60)
+
+
+def _rows(ledger):
+    return ledger._conn.execute("SELECT idempotency_key, status FROM replies ORDER BY idempotency_key").fetchall()
+
+
+def test_claim_then_sent_is_duplicate(ledger):
+    assert ledger.claim(ACCOUNT, "k", "<m1>", ttl=100) == ("claimed", None, "<m1>")
+    assert ledger.claim(ACCOUNT, "k", "<m2>", ttl=100) == ("in_progress", None, "<m1>")
+    ledger.mark_sent(ACCOUNT, "k", "gmail-1", ttl=100)
+    assert ledger.claim(ACCOUNT, "k", "<m3>", ttl=100) == ("sent", "gmail-1", "<m1>")
+    # A chave é por conta
+    assert ledger.claim("outra@exemplo.com", "k", "<m4>", ttl=100)[0] == "claimed"
+
+
+def test_abandoned_claim_is_resumed_with_original_message_id(ledger, clock):
+    ledger.claim(ACCOUNT, "k", "<m1>", ttl=100)
+    clock.now += 29
+    assert ledger.claim(ACCOUNT, "k", "<m2>", ttl=100)[0] == "in_progress"
+    clock.now += 2
+    assert ledger.claim(ACCOUNT, "k", "<m2>", ttl=100) == ("resumed", None, "<m1>")
+    # A retomada renova a reserva
+    assert ledger.claim(ACCOUNT, "k", "<m3>", ttl=100)[0] == "in_progress"
+
+
+def test_unknown_blocks_resend_until_expiry(ledger, clock):
+    ledger.claim(ACCOUNT, "k", "<m1>", ttl=100)
+    ledger.mark_unknown(ACCOUNT, "k", ttl=50)
+    assert ledger.claim(ACCOUNT, "k", "<m2>", ttl=100) == ("unknown", None, "<m1>")
+    clock.now += 50
+    assert ledger.claim(ACCOUNT, "k", "<m2>", ttl=100) == ("claimed", None, "<m2>")
+
+
+def test_sent_key_expires_after_ttl(ledger, clock):
+    ledger.claim(ACCOUNT, "k", "<m1>", ttl=100)
+    ledger.mark_sent(ACCOUNT, "k", "gmail-1", ttl=10)
+    clock.now += 9
+    assert ledger.claim(ACCOUNT, "k", "<m2>", ttl=100)[0] == "sent"
+    clock.now += 1
+    assert ledger.claim(ACCOUNT, "k", "<m2>", ttl=100) == ("claimed", None, "<m2>")
+
+
+def test_expired_sending_claim_is_not_taken_over_early(ledger, clock):
+    ledger.claim(ACCOUNT, "k", "<m1>", ttl=5)
+    clock.now += 10  # expirada, mas ainda dentro de claim_ttl
+    assert ledger.claim(ACCOUNT, "k", "<m2>", ttl=100)[0] == "in_progress"
+
+
+def test_release_frees_key_but_not_sent_rows(ledger):
+    ledger.claim(ACCOUNT, "a", "<m1>", ttl=100)
+    ledger.release(ACCOUNT, "a")
+    assert ledger.claim(ACCOUNT, "a", "<m2>", ttl=100) == ("claimed", None, "<m2>")
+    ledger.mark_sent(ACCOUNT, "a", "gmail-1", ttl=100)
+    ledger.release(ACCOUNT, "a")
+    assert ledger.claim(ACCOUNT, "a", "<m3>", ttl=100)[0] == "sent"
+
+
+def test_prune_deletes_expired_rows_on_interval(ledger, clock):
+    ledger.claim(ACCOUNT, "sent", "<m1>", ttl=100)
+    ledger.mark_sent(ACCOUNT, "sent", "gmail-1", ttl=10)
+    ledger.claim(ACCOUNT, "sending", "<m2>", ttl=10)
+    ledger.claim(ACCOUNT, "live", "<m3>", ttl=1000)
+    ledger.mark_sent(ACCOUNT, "live", "gmail-3", ttl=1000)
+
+    clock.now += 20
+    ledger.claim(ACCOUNT, "x", "<m4>", ttl=1000)  # dentro do intervalo: sem limpeza
+    assert len(_rows(ledger)) == 4
+    clock.now += 60
+    ledger.claim(ACCOUNT, "y", "<m5>", ttl=1000)
+    # A reserva vencida e abandonada também sai
+    assert _rows(ledger) == [("live", "sent"), ("x", "sending"), ("y", "sending")]
+
+
+def test_migrates_ledger_without_expiry(tmp_path, clock):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE replies (account TEXT NOT NULL, idempotency_key TEXT NOT NULL, status TEXT NOT NULL, "
+        "message_id TEXT, gmail_id TEXT, updated_at REAL NOT NULL, PRIMARY KEY (account, idempotency_key))"
+    )
+    conn.execute("INSERT INTO replies VALUES (?, 'k', 'sent', '<m1>', 'gmail-1', ?)", (ACCOUNT, clock.now - 1))
+    conn.commit()
+    conn.close()
+
+    ledger = ReplyLedger(path, claim_ttl=30)
+    assert ledger.claim(ACCOUNT, "k", "<m2>", ttl=100) == ("claimed", None, "<m2>")
@@ -0,0 +1,84 @@
+import json
+import os
+
+import pytest
+
+from src.services.response_templates import DEFAULT_TEMPLATES_PATH, TemplateRegistry, compile_template
+
+
+def _write(path, catalog, mtime_ns):
+    path.write_text(json.dumps(catalog, ensure_ascii=False), encoding="utf-8")
+    # Data de modificação explícita: escritas seguidas podem cair no mesmo tique
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def _catalog(text):
+    return {"improdutivo": {"padrao": [text]}, "produtivo": {"formal": [f"Prezado(a)[[ {{sender_name}}]], {text}"]}}
+
+
+@pytest.fixture
+def catalog_path(tmp_path):
+    path = tmp_path / "templates.json"
+    _write(path, _catalog("obrigado."), 1_000_000_000)
+    return path
+
+
+def test_optional_segments_need_all_their_placeholders():
+    template = compile_template("Olá[[ {sender_name}]]![[ Sobre {subject} de {company}.]] {{ok}}")
+    assert template.render({}) == "Olá! {ok}"
+    assert template.render({"sender_name": "Ana"}) == "Olá Ana! {ok}"
+    assert template.render({"sender_name": "Ana", "subject": "o contrato"}) == "Olá Ana! {ok}"
+    assert template.render({"subject": "o contrato", "company": "ACME"}) == "Olá! Sobre o contrato de ACME. {ok}"
+    # Valor vazio conta como ausente
+    assert template.render({"sender_name": ""}) == "Olá! {ok}"
+
+
+def test_required_placeholder_without_value_is_blank():
+    assert compile_template("Oi {sender_name}, tudo bem?").render({}) == "Oi , tudo bem?"
+
+
+def test_fallbacks_by_category_and_style(catalog_path):
+    registry = TemplateRegistry(str(catalog_path), selection="hash")
+    assert registry.render("Produtivo", "formal", {"sender_name": "Ana"}) == "Prezado(a) Ana, obrigado."
+    assert registry.render("produtivo", "informal") == "obrigado."
+    assert registry.render("desconhecida", "formal") == "obrigado."
+
+
+def test_hot_reload_on_mtime_change(catalog_path):
+    registry = TemplateRegistry(str(catalog_path), check_interval=0)
+    assert registry.render("improdutivo", "padrao") == "obrigado."
+    _write(catalog_path, _catalog("valeu!"), 2_000_000_000)
+    assert registry.render("improdutivo", "padrao") == "valeu!"
+    assert registry.reloads == 2 and registry.last_error is None
+    assert not registry.reload()  # sem mudança, nada a fazer
+
+
+def test_check_interval_limits_stat_calls(catalog_path):
+    registry = TemplateRegistry(str(catalog_path), check_interval=3600)
+    registry.render("improdutivo", "padrao")
+    _write(catalog_path, _catalog("valeu!"), 2_000_000_000)
+    assert registry.render("improdutivo", "padrao") == "obrigado."
+
+
+@pytest.mark.parametrize("content", ["{ inválido", json.dumps({"produtivo": {"padrao": ["só produtivo"]}}),
+                                     json.dumps(_catalog("{sender_name"))])
+def test_invalid_catalog_keeps_last_good_version(catalog_path, content):
+    registry = TemplateRegistry(str(catalog_path), check_interval=0)
+    catalog_path.write_text(content, encoding="utf-8")
+    os.utime(catalog_path, ns=(2_000_000_000, 2_000_000_000))
+    assert registry.render("improdutivo", "padrao") == "obrigado."
+    assert registry.last_error
+    # O arquivo corrigido volta a ser carregado
+    _write(catalog_path, _catalog("valeu!"), 3_000_000_000)
+    assert registry.render("improdutivo", "padrao") == "valeu!" and registry.last_error is None
+
+
+def test_invalid_catalog_at_startup_raises(tmp_path):
+    path = tmp_path / "templates.json"
+    path.write_text("[]", encoding="utf-8")
+    with pytest.raises(ValueError):
+        TemplateRegistry(str(path))
+
+
+def test_default_catalog_compiles():
+    assert TemplateRegistry(DEFAULT_TEMPLATES_PATH).stats()["templates"] > 0
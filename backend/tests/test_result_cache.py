@@ -0,0 +1,91 @@
+from src.services import result_cache
+from src.services.result_cache import MemoryCache, ResultCache, make_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_make_key_separates_parts():
+    assert make_key("ns", "ab", "c") != make_key("ns", "a", "bc")
+    assert make_key("ns", "a") != make_key("outro", "a")
+    assert make_key("ns", None) == make_key("ns", "")
+
+
+def test_memory_cache_expires_after_ttl(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(result_cache.time, "monotonic", clock)
+    cache = MemoryCache(max_entries=4, ttl_seconds=10)
+    cache.set("a", 1)
+
+    clock.now += 9.9
+    assert cache.get("a") == (True, 1)
+    clock.now += 0.2
+    assert cache.get("a") == (False, None)
+    # A entrada expirada sai do cache na leitura
+    assert len(cache) == 0
+
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == (True, 1)  # "b" passa a ser o menos usado
+    cache.set("c", 3)
+
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, 1)
+    assert cache.get("c") == (True, 3)
+    assert len(cache) == 2
+
+
+def test_memory_cache_set_refreshes_existing_key():
+    cache = MemoryCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.set("a", 10)
+    cache.set("c", 3)
+
+    assert cache.get("a") == (True, 10)
+    assert cache.get("b") == (False, None)
+
+
+def test_result_cache_promotes_disk_hits_and_counts(tmp_path):
+    path = str(tmp_path / "cache.db")
+    ResultCache(sqlite_path=path).set("k", {"category": "produtivo"})
+
+    cache = ResultCache(sqlite_path=path)
+    assert cache.get("classify", "k") == (True, {"category": "produtivo"})
+    assert cache.get("classify", "k") == (True, {"category": "produtivo"})
+    assert cache.get("classify", "outra") == (False, None)
+
+    counters = cache.stats()["namespaces"]["classify"]
+    assert counters["hits"] == 2
+    assert counters["disk_hits"] == 1
+    assert counters["misses"] == 1
+    assert len(cache.memory) == 1
+
+
+def test_disabled_result_cache_stores_nothing():
+    cache = ResultCache(enabled=False)
+    cache.set("k", 1)
+    assert cache.get("classify", "k") == (False, None)
+    assert cache.stats()["namespaces"] == {}
+
+
+def test_memory_cache_reports_evicted_values(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(result_cache.time, "monotonic", clock)
+    evicted = []
+    cache = MemoryCache(max_entries=2, ttl_seconds=10, on_evict=evicted.append)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.set("c", 3)  # LRU
+    cache.set("c", 4)  # substituição
+    clock.now += 11
+    cache.get("b")  # expiração
+    assert evicted == [1, 3, 2]
@@ -0,0 +1,74 @@
+from src.services.text_prep import ELLIPSIS, count_tokens, head_tail_truncate, prepare_for_model, split_windows
+
+
+class WordTokenizer:
+    """
+    Tokenizador de teste: um token por palavra.
+    """
+
+    def __call__(self, text, add_special_tokens=True):
+        ids = text.split()
+        if add_special_tokens:
+            ids = ["<s>"] + ids + ["</s>"]
+        return {"input_ids": ids}
+
+    def decode(self, ids, skip_special_tokens=False):
+        return " ".join(ids)
+
+
+tokenizer = WordTokenizer()
+
+
+def _words(n):
+    return " ".join(f"w{i}" for i in range(n))
+
+
+def test_count_tokens_ignores_special_tokens():
+    assert count_tokens(tokenizer, _words(7)) == 7
+    assert count_tokens(tokenizer, "") == 0
+
+
+def test_text_within_budget_is_untouched():
+    text = _words(10)
+    prepared = head_tail_truncate(tokenizer, text, 10)
+    assert prepared == (text, 10, 10, False)
+
+
+def test_non_positive_budget_disables_truncation():
+    text = _words(50)
+    assert not head_tail_truncate(tokenizer, text, 0).truncated
+
+
+def test_head_tail_keeps_start_and_end():
+    prepared = head_tail_truncate(tokenizer, _words(100), 10)
+    head, tail = prepared.text.split(ELLIPSIS)
+    assert head == _words(6)
+    assert tail == " ".join(f"w{i}" for i in range(96, 100))
+    assert (prepared.tokens, prepared.original_tokens, prepared.truncated) == (10, 100, True)
+
+
+def test_prepare_for_model_applies_budget():
+    prepared = prepare_for_model(tokenizer, _words(40), 20, "teste")
+    assert prepared.truncated and prepared.tokens == 20
+
+
+def test_short_text_is_a_single_window():
+    text = _words(5)
+    assert split_windows(tokenizer, text, 8, overlap_tokens=2) == [(0, text, 0, 5)]
+
+
+def test_windows_cover_text_with_overlap():
+    windows = split_windows(tokenizer, _words(20), 8, overlap_tokens=3)
+    assert [(w.start_token, w.end_token) for w in windows] == [(0, 8), (5, 13), (10, 18), (15, 20)]
+    assert [w.index for w in windows] == [0, 1, 2, 3]
+    assert windows[1].text == " ".join(f"w{i}" for i in range(5, 13))
+
+
+def test_overlap_not_smaller_than_window_still_advances():
+    windows = split_windows(tokenizer, _words(4), 2, overlap_tokens=5)
+    assert [(w.start_token, w.end_token) for w in windows] == [(0, 2), (1, 3), (2, 4)]
+
+
+def test_max_windows_limits_the_split():
+    windows = split_windows(tokenizer, _words(100), 10, max_windows=3)
+    assert len(windows) == 3 and windows[-1].end_token == 30
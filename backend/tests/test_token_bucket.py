@@ -0,0 +1,67 @@
+import threading
+
+import pytest
+
+from src.services import reply_dispatcher
+from src.services.reply_dispatcher import TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(reply_dispatcher.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(reply_dispatcher.time, "sleep", clock.sleep)
+    return clock
+
+
+def test_burst_is_free_then_paced_by_rate(clock):
+    bucket = TokenBucket(rate=2.0, capacity=3)
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.acquire() == pytest.approx(0.5)
+    assert bucket.acquire() == pytest.approx(0.5)
+    assert clock.now == pytest.approx(101.0)
+
+
+def test_tokens_refill_up_to_capacity(clock):
+    bucket = TokenBucket(rate=1.0, capacity=2)
+    bucket.acquire()
+    bucket.acquire()
+    clock.now += 60
+    assert [bucket.acquire() for _ in range(2)] == [0.0, 0.0]
+    assert bucket.acquire() == pytest.approx(1.0)
+
+
+def test_capacity_below_one_still_allows_a_token(clock):
+    bucket = TokenBucket(rate=1.0, capacity=0)
+    assert bucket.capacity == 1.0 and bucket.acquire() == 0.0
+
+
+def test_zero_rate_disables_limit(clock):
+    bucket = TokenBucket(rate=0, capacity=1)
+    assert [bucket.acquire() for _ in range(10)] == [0.0] * 10
+    assert clock.sleeps == []
+
+
+def test_concurrent_acquire_never_exceeds_rate():
+    bucket = TokenBucket(rate=50.0, capacity=1)
+    start = reply_dispatcher.time.monotonic()
+    threads = [threading.Thread(target=bucket.acquire) for _ in range(11)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # A primeira ficha é imediata; as outras 10 saem a 50/s
+    assert reply_dispatcher.time.monotonic() - start >= 0.19